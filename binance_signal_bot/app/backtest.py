@@ -0,0 +1,262 @@
+# Offline, vectorized backtest of rules.should_signal over local kline files.
+#
+#   python backtest.py "BTCUSDT-5m-2024-*.csv" --opts options.json
+#
+# Every rule becomes a boolean column over the whole 5m history; 15m/1h
+# values are joined as-of the last higher-timeframe bar closed by the end of
+# each 5m bar (no lookahead, where the live scan sees the forming bar).
+import argparse, glob, json, os
+from typing import Dict, Any, List, Tuple
+import numpy as np
+import pandas as pd
+import yaml
+from candles import TF_MS, resample_klines
+from kucoin_client import KLINE_COLS
+from rules import adjust_tps
+
+def load_klines(paths: List[str]) -> np.ndarray:
+    # Binance kline dumps (data.binance.vision CSV, with or without header) or
+    # JSON arrays as returned by /api/v3/klines -> (n, 6) float64 in the
+    # fetch_candles column order, sorted and de-duplicated by open time
+    parts = []
+    for p in paths:
+        if p.endswith(".json"):
+            with open(p, "r", encoding="utf-8") as f:
+                raw = np.array([k[:6] for k in json.load(f)], dtype=np.float64)
+        else:
+            raw = pd.read_csv(p, header=None, usecols=range(6)).apply(pd.to_numeric, errors="coerce").dropna().to_numpy(np.float64)
+        if len(raw):
+            parts.append(raw[:, KLINE_COLS])
+    if not parts:
+        return np.empty((0, 6))
+    a = np.concatenate(parts)
+    # newer spot dumps use microsecond timestamps
+    a[a[:, 0] > 1e14, 0] //= 1000
+    a = a[np.argsort(a[:, 0], kind="stable")]
+    keep = np.r_[True, a[1:, 0] != a[:-1, 0]]
+    return a[keep]
+
+class Columns:
+    # Indicator columns for one timeframe's bars, memoized by (name, params)
+    # so sweeps that share an EMA length or MACD setup compute it once
+    def __init__(self, bars: np.ndarray, tf: str):
+        self.tf = tf
+        self.time = bars[:, 0]; self.open = bars[:, 1]; self.close = bars[:, 2]
+        self.high = bars[:, 3]; self.low = bars[:, 4]; self.volume = bars[:, 5]
+        self._memo: Dict[Tuple, Any] = {}
+
+    def __len__(self):
+        return len(self.time)
+
+    def _get(self, key: Tuple, fn):
+        v = self._memo.get(key)
+        if v is None:
+            v = self._memo[key] = fn()
+        return v
+
+    def ema(self, n: int) -> np.ndarray:
+        # as ta.trend.EMAIndicator
+        return self._get(("ema", n), lambda: pd.Series(self.close).ewm(span=n, min_periods=n, adjust=False).mean().to_numpy())
+
+    def macd(self, fast: int, slow: int, sign: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        def calc():
+            m = self.ema(fast) - self.ema(slow)
+            s = pd.Series(m).ewm(span=sign, min_periods=sign, adjust=False).mean().to_numpy()
+            return m, s, m - s
+        return self._get(("macd", fast, slow, sign), calc)
+
+    def rsi(self, n: int) -> np.ndarray:
+        def calc():
+            d = pd.Series(self.close).diff()
+            up = d.where(d > 0, 0.0).ewm(alpha=1 / n, min_periods=n, adjust=False).mean()
+            dn = (-d.where(d < 0, 0.0)).ewm(alpha=1 / n, min_periods=n, adjust=False).mean()
+            return np.where(dn == 0, 100, 100 - (100 / (1 + up / dn))).astype(np.float64)
+        return self._get(("rsi", n), calc)
+
+    def atr(self, n: int = 14) -> np.ndarray:
+        # ta's Wilder ATR (0 before the first full window) without its Python loop
+        def calc():
+            pc = np.r_[np.nan, self.close[:-1]]
+            tr = np.fmax(self.high - self.low, np.fmax(np.abs(self.high - pc), np.abs(self.low - pc)))
+            out = np.zeros(len(tr))
+            if len(tr) >= n:
+                seed = np.r_[tr[:n].mean(), tr[n:]]
+                out[n - 1:] = pd.Series(seed).ewm(alpha=1 / n, adjust=False).mean().to_numpy()
+            return out
+        return self._get(("atr", n), calc)
+
+    def vwap(self, window: int) -> Tuple[np.ndarray, np.ndarray]:
+        # VWAP cumulative from the start of a `window`-bar history, as the live
+        # scan sees it, and its previous value within that same history
+        def calc():
+            pv = pd.Series(self.close * self.volume); v = pd.Series(self.volume)
+            spv = pv.rolling(window, min_periods=1).sum().to_numpy(); sv = v.rolling(window, min_periods=1).sum().to_numpy()
+            with np.errstate(divide="ignore", invalid="ignore"):
+                cur = np.where(sv != 0, spv / sv, np.nan)
+                prv = np.where(sv - self.volume != 0, (spv - pv.to_numpy()) / (sv - self.volume), np.nan)
+            prv[0] = np.nan
+            return cur, prv
+        return self._get(("vwap", window), calc)
+
+    def rvol(self, window: int = 20) -> np.ndarray:
+        # features.rolling_rvol for every bar
+        def calc():
+            sma = pd.Series(self.volume).rolling(window).mean().to_numpy()
+            with np.errstate(divide="ignore", invalid="ignore"):
+                r = self.volume / sma
+            return np.where(np.isfinite(r) & (self.volume != 0) & (sma != 0), r, 0.0)
+        return self._get(("rvol", window), calc)
+
+    def rolling_max_high(self, n: int) -> np.ndarray:
+        return self._get(("hmax", n), lambda: pd.Series(self.high).rolling(n, min_periods=1).max().to_numpy())
+
+    def rolling_min_low(self, n: int) -> np.ndarray:
+        return self._get(("lmin", n), lambda: pd.Series(self.low).rolling(n, min_periods=1).min().to_numpy())
+
+    def asof(self, close_times: np.ndarray) -> np.ndarray:
+        # index of the last bar closed at or before each close time, -1 if none
+        return np.searchsorted(self.time + TF_MS[self.tf], close_times, side="right") - 1
+
+def _take(values: np.ndarray, idx: np.ndarray) -> np.ndarray:
+    out = values[np.maximum(idx, 0)].astype(np.float64)
+    out[idx < 0] = np.nan
+    return out
+
+def rule_columns(c5: Columns, c15: Columns, c1h: Columns, cfg: Dict[str, Any], opts: Dict[str, Any], vwap_window: int = 300) -> Dict[str, np.ndarray]:
+    # rules.should_signal evaluated at every 5m bar
+    close = c5.close
+    i15 = c15.asof(c5.time + TF_MS[c5.tf]); i1h = c1h.asof(c5.time + TF_MS[c5.tf])
+    with np.errstate(invalid="ignore"):
+        # bias_ok
+        rsi1h = _take(c1h.rsi(int(opts.get("rsi_length",14))), i1h)
+        ema20_1h = _take(c1h.ema(20), i1h); ema50_1h = _take(c1h.ema(50), i1h)
+        close15 = _take(c15.close, i15); ema200_15 = _take(c15.ema(200), i15)
+        rsi_low = rsi1h < int(opts.get("bias_rsi_min", 50))
+        if bool(opts.get("bias_allow_price_above_ema200_15m", True)):
+            low_branch = close15 >= ema200_15
+        else:
+            low_branch = np.zeros(len(close), dtype=bool)
+        high_branch = (ema20_1h >= ema50_1h) if bool(opts.get("bias_need_ema_order", True)) else np.ones(len(close), dtype=bool)
+        bias = np.where(rsi_low, low_branch, high_branch) & (i15 >= 0) & (i1h >= 0)
+
+        # anti_noise_checks
+        atr = np.nan_to_num(c5.atr(14), nan=0.0)
+        body = np.abs(close - c5.open)
+        too_big = (atr > 0) & (body > float(opts.get("breakout_body_max_atr_mult", 1.8)) * atr)
+        ema200 = c5.ema(200)
+        dist = np.abs(close - ema200) / ema200 * 100
+        too_close = (ema200 > 0) & (dist < float(opts.get("ema200_5m_min_distance_pct", 0.2)))
+        anti = ~too_big & ~too_close
+
+        # compute_confirmations
+        c1 = close >= c5.ema(20)
+        vwap, vwap_prev = c5.vwap(vwap_window)
+        c2 = (close >= vwap) & (vwap - vwap_prev > 0)
+        macd, sig, hist = c5.macd(int(opts.get("macd_fast",12)), int(opts.get("macd_slow",26)), int(opts.get("macd_signal",9)))
+        dh = np.r_[np.nan, np.diff(hist)]
+        d1 = np.nan_to_num(dh, nan=0.0) > 0
+        d2 = np.r_[False, d1[:-1]]
+        rising = (d1 & d2) if int(opts.get("macd_hist_rising_bars_min", 2)) >= 2 else d1
+        cross = (macd >= sig) & np.r_[False, macd[:-1] < sig[:-1]]
+        c3 = rising | (bool(opts.get("macd_cross_up_allowed", True)) & cross)
+        rvol15 = np.nan_to_num(_take(c15.rvol(20), i15), nan=0.0)
+        c4 = rvol15 >= float(opts.get("rvol15m_min", 1.6))
+        c5_ = close >= c5.rolling_max_high(int(opts.get("breakout_lookback_bars", 10)))
+        count = c1.astype(np.int8) + c2 + c3 + c4 + c5_
+
+        # make_sl_tp
+        vw = np.where(np.isnan(vwap), close, vwap)
+        sl = np.maximum(np.minimum(vw - 0.5 * atr, c5.rolling_min_low(10) - 0.5 * atr), 0.0)
+
+    ok = bias & anti & (count >= int(cfg["trigger"]["confirmations_needed"]))
+    return {"bias": bias, "anti_noise": anti, "ema20": c1, "vwap": c2, "macd": c3, "rvol15": c4, "breakout": c5_,
+            "count": count, "ok": ok, "sl": sl, "rvol15m": rvol15}
+
+def simulate(c5: Columns, cols: Dict[str, np.ndarray], cfg: Dict[str, Any], opts: Dict[str, Any], horizon_bars: int = 288) -> List[Dict[str, Any]]:
+    # scan_symbol's min_confirms/cooldown gate over the candidate bars, then
+    # TP/SL outcome of each sent signal from the following bars
+    min_conf = max(3, int(opts.get("min_confirms", 3)))
+    cooldown_ms = int(opts.get("cooldown_minutes", 20)) * 60_000
+    tp_mult = np.array(adjust_tps(1.0, cfg["exits"]["tp_levels_pct"], opts))
+    bar_ms = TF_MS[c5.tf]
+    cand = np.flatnonzero(cols["ok"] & (cols["count"] >= min_conf))
+    out = []
+    last_ts = -np.inf; last_conf = 0
+    n = len(c5)
+    for i in cand:
+        now = c5.time[i] + bar_ms
+        conf = int(cols["count"][i])
+        if not (now - last_ts >= cooldown_ms or conf > last_conf):
+            continue
+        last_ts = now; last_conf = conf
+        entry = float(c5.close[i]); sl = float(cols["sl"][i]); tps = entry * tp_mult
+        hi = c5.high[i + 1:min(n, i + 1 + horizon_bars)]; lo = c5.low[i + 1:min(n, i + 1 + horizon_bars)]
+        sl_hits = np.flatnonzero(lo <= sl)
+        first_sl = int(sl_hits[0]) if len(sl_hits) else len(lo)
+        rec = {"time": int(c5.time[i]), "confirms": conf, "entry": entry, "sl": sl, "tps": tps.tolist()}
+        for k, tp in enumerate(tps, 1):
+            hits = np.flatnonzero(hi >= tp)
+            first = int(hits[0]) if len(hits) else len(hi)
+            # a bar touching both counts as the stop (conservative)
+            rec[f"tp{k}"] = first < first_sl
+            rec[f"tp{k}_bars"] = first + 1 if first < first_sl else None
+        rec["sl_hit"] = first_sl < len(lo) and not rec["tp1"]
+        rec["open"] = not rec["tp1"] and not rec["sl_hit"]
+        out.append(rec)
+    return out
+
+def summarize(trades: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def rates(ts):
+        n = len(ts)
+        if not n:
+            return {"signals": 0}
+        return {"signals": n,
+                "tp1": sum(t["tp1"] for t in ts) / n, "tp2": sum(t["tp2"] for t in ts) / n,
+                "tp3": sum(t["tp3"] for t in ts) / n, "sl": sum(t["sl_hit"] for t in ts) / n,
+                "open": sum(t["open"] for t in ts) / n}
+    res = rates(trades)
+    res["by_confirms"] = {str(c): rates([t for t in trades if t["confirms"] == c]) for c in sorted({t["confirms"] for t in trades})}
+    return res
+
+def prepare(bars5: np.ndarray, bars15: np.ndarray = None, bars1h: np.ndarray = None, cfg: Dict[str, Any] = None) -> Tuple[Columns, Columns, Columns]:
+    tfs = cfg["timeframes"]
+    if bars15 is None or len(bars15) == 0:
+        bars15 = resample_klines(bars5, tfs["trigger_tf"], tfs["setup_tf"])
+    if bars1h is None or len(bars1h) == 0:
+        bars1h = resample_klines(bars5, tfs["trigger_tf"], tfs["bias_tf"])
+    return Columns(bars5, tfs["trigger_tf"]), Columns(bars15, tfs["setup_tf"]), Columns(bars1h, tfs["bias_tf"])
+
+def run_backtest(bars5: np.ndarray, cfg: Dict[str, Any], opts: Dict[str, Any], bars15: np.ndarray = None, bars1h: np.ndarray = None, horizon_bars: int = 288) -> Dict[str, Any]:
+    c5, c15, c1h = prepare(bars5, bars15, bars1h, cfg)
+    cols = rule_columns(c5, c15, c1h, cfg, opts)
+    trades = simulate(c5, cols, cfg, opts, horizon_bars)
+    res = summarize(trades)
+    res["bars"] = len(c5)
+    return res
+
+def load_cfg(path: str = None) -> Dict[str, Any]:
+    with open(path or os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.yaml"), "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+def main():
+    ap = argparse.ArgumentParser(description="Vectorized backtest of the signal rules over local 5m klines")
+    ap.add_argument("klines5", nargs="+", help="5m kline files (CSV dumps or JSON); globs allowed")
+    ap.add_argument("--klines15", nargs="*", default=[], help="15m files; resampled from 5m if omitted")
+    ap.add_argument("--klines1h", nargs="*", default=[], help="1h files; resampled from 5m if omitted")
+    ap.add_argument("--opts", help="options JSON (e.g. a copy of /data/options.json)")
+    ap.add_argument("--config", help="config.yaml")
+    ap.add_argument("--horizon", type=int, default=288, help="bars to follow each signal")
+    a = ap.parse_args()
+    expand = lambda ps: sorted(p for x in ps for p in (glob.glob(x) or [x]))
+    opts = {}
+    if a.opts:
+        with open(a.opts, "r", encoding="utf-8") as f:
+            opts = json.load(f)
+    cfg = load_cfg(a.config)
+    res = run_backtest(load_klines(expand(a.klines5)), cfg, opts,
+                       load_klines(expand(a.klines15)) if a.klines15 else None,
+                       load_klines(expand(a.klines1h)) if a.klines1h else None, a.horizon)
+    print(json.dumps(res, indent=2))
+
+if __name__ == "__main__":
+    main()
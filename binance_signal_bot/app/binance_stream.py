@@ -0,0 +1,234 @@
+import asyncio, json
+from typing import Dict, Any, List, Callable, Awaitable, Optional, Set, Tuple
+import websockets
+from kucoin_client import KucoinClient, TF_MAP
+from candles import CandleCache
+
+BN_WS = "wss://stream.binance.com:9443"
+
+# Binance allows 1024 streams per connection and 5 incoming messages per second
+MAX_STREAMS = 1024
+SUBSCRIBE_CHUNK = 200
+
+class _Conn:
+    # one websocket and the symbols subscribed on it
+    def __init__(self, symbols: List[str]):
+        self.symbols = symbols
+        self.ws = None
+        self.connected = False
+        self.task: Optional[asyncio.Task] = None
+
+class BinanceStream:
+    # Combined <symbol>@kline_<tf> + <symbol>@bookTicker ingestion. Klines are
+    # merged into the CandleCache, best bid/ask kept in `level1` in the
+    # fetch_level1 shape. Symbols are split over as many connections as the
+    # 1024-stream limit needs. A closed trigger_tf bar queues the symbol for
+    # on_close(symbol), run by `workers` tasks so the readers never wait on it.
+    def __init__(self, ku: KucoinClient, cache: CandleCache, symbols: List[str], tfs: List[str], trigger_tf: str,
+                 on_close: Callable[[str], Awaitable[None]], ws_url: str = BN_WS, workers: int = 8):
+        self.ku = ku
+        self.cache = cache
+        self.symbols = list(symbols)
+        self.tfs = list(tfs)
+        self.trigger_tf = trigger_tf
+        self.on_close = on_close
+        self.ws_url = ws_url.rstrip("/")
+        self.workers = max(1, workers)
+        self.level1: Dict[str, Dict[str, Any]] = {}
+        # symbols per connection: klines for each tf plus bookTicker
+        self.per_conn = max(1, MAX_STREAMS // (len(self.tfs) + 1))
+        self._conns: List[_Conn] = []
+        self._by_stream_sym = {KucoinClient._to_binance(s): s for s in self.symbols}
+        self._tf_by_interval = {TF_MAP.get(tf, tf): tf for tf in self.tfs}
+        self._req_id = 0
+        self._running = False
+        self._closes: asyncio.Queue = asyncio.Queue()
+        # symbols queued or being evaluated; their klines wait in _held
+        # (latest row per bar) until on_close returns
+        self._pending: Set[str] = set()
+        self._again: Set[str] = set()
+        self._held: Dict[Tuple[str, str], Dict[int, List[Any]]] = {}
+
+    @property
+    def connected(self) -> bool:
+        return bool(self._conns) and all(c.connected for c in self._conns)
+
+    def streams(self, symbols: List[str] = None) -> List[str]:
+        out = []
+        for s in (self.symbols if symbols is None else symbols):
+            b = KucoinClient._to_binance(s).lower()
+            out += [f"{b}@kline_{TF_MAP.get(tf, tf)}" for tf in self.tfs]
+            out.append(f"{b}@bookTicker")
+        return out
+
+    async def backfill(self, symbols: List[str] = None):
+        # REST catch-up for whatever closed while we were not connected
+        for s in (self.symbols if symbols is None else symbols):
+            for tf in self.tfs:
+                try:
+                    await self.cache.refresh(s, tf, backfill=True)
+                    self.cache.live.add((s, tf))
+                except Exception:
+                    self.cache.live.discard((s, tf))
+
+    async def _subscribe(self, ws, streams: List[str], method: str = "SUBSCRIBE"):
+        for i in range(0, len(streams), SUBSCRIBE_CHUNK):
+            self._req_id += 1
+            await ws.send(json.dumps({"method": method, "params": streams[i:i+SUBSCRIBE_CHUNK], "id": self._req_id}))
+            await asyncio.sleep(0.25)
+
+    def _open(self, symbols: List[str]) -> _Conn:
+        conn = _Conn(symbols)
+        self._conns.append(conn)
+        if self._running:
+            conn.task = asyncio.create_task(self._run_conn(conn))
+        return conn
+
+    async def set_symbols(self, symbols: List[str]):
+        # Universe change: (un)subscribe the difference on the connection that
+        # holds each symbol; only new symbols are backfilled
+        old = set(self.symbols); keep = set(symbols)
+        added = [s for s in symbols if s not in old]
+        removed = [s for s in self.symbols if s not in keep]
+        self.symbols = list(symbols)
+        self._by_stream_sym = {KucoinClient._to_binance(s): s for s in self.symbols}
+        for s in removed:
+            self.level1.pop(s, None)
+            for tf in self.tfs:
+                self.cache.live.discard((s, tf))
+                self._held.pop((s, tf), None)
+        if not self._conns:
+            # not running yet: run() splits self.symbols
+            return
+        for conn in self._conns:
+            gone = [s for s in conn.symbols if s not in keep]
+            if not gone:
+                continue
+            conn.symbols = [s for s in conn.symbols if s in keep]
+            await self._change(conn, gone, "UNSUBSCRIBE")
+        # fill connections with room first, open new ones for the rest
+        for conn in self._conns:
+            if not added:
+                break
+            room = self.per_conn - len(conn.symbols)
+            if room > 0:
+                take, added = added[:room], added[room:]
+                conn.symbols += take
+                await self._change(conn, take, "SUBSCRIBE")
+        for i in range(0, len(added), self.per_conn):
+            # a new connection subscribes and backfills its symbols itself
+            self._open(added[i:i+self.per_conn])
+
+    async def _change(self, conn: _Conn, symbols: List[str], method: str):
+        ws = conn.ws
+        if ws is None or not conn.connected:
+            # resubscribed with conn.symbols on reconnect
+            return
+        try:
+            await self._subscribe(ws, self.streams(symbols), method)
+            if method == "SUBSCRIBE":
+                await self.backfill(symbols)
+        except Exception:
+            # the reader loop notices a dead socket and reconnects with the full set
+            pass
+
+    async def handle(self, raw) -> None:
+        msg = json.loads(raw)
+        data = msg.get("data", msg)
+        if not isinstance(data, dict):
+            return
+        ev = data.get("e")
+        if ev == "kline":
+            sym = self._by_stream_sym.get(data.get("s", ""))
+            k = data.get("k") or {}
+            tf = self._tf_by_interval.get(k.get("i"))
+            if sym is None or tf is None:
+                return
+            # same row layout as KucoinClient.fetch_candles
+            row = [k["t"], k["o"], k["c"], k["h"], k["l"], k["v"]]
+            closed = bool(k.get("x")) and tf == self.trigger_tf
+            if sym in self._pending:
+                # the rules for the bar that just closed must not see the
+                # next one; every kline is the whole bar, so the latest row
+                # of each bar is enough
+                self._held.setdefault((sym, tf), {})[k["t"]] = row
+                if closed:
+                    self._again.add(sym)
+                return
+            self.cache.apply(sym, tf, row)
+            if closed:
+                self._pending.add(sym)
+                self._closes.put_nowait(sym)
+        elif "b" in data and "a" in data and "s" in data:
+            # bookTicker frames carry no "e" field
+            sym = self._by_stream_sym.get(data["s"])
+            if sym is not None:
+                self.level1[sym] = {"bestBid": data["b"], "bestAsk": data["a"]}
+
+    async def _closer(self):
+        while True:
+            sym = await self._closes.get()
+            try:
+                await self.on_close(sym)
+            except Exception:
+                pass
+            self._pending.discard(sym)
+            for tf in self.tfs:
+                held = self._held.pop((sym, tf), None)
+                for t in sorted(held or ()):
+                    self.cache.apply(sym, tf, held[t])
+            if sym in self._again:
+                # another bar closed while this one was evaluated
+                self._again.discard(sym)
+                if KucoinClient._to_binance(sym) in self._by_stream_sym:
+                    self._pending.add(sym)
+                    self._closes.put_nowait(sym)
+
+    async def _run_conn(self, conn: _Conn):
+        backoff = 1
+        while True:
+            try:
+                async with websockets.connect(f"{self.ws_url}/stream", ping_interval=20, max_queue=None) as ws:
+                    conn.ws = ws
+                    await self._subscribe(ws, self.streams(conn.symbols))
+                    # frames that arrive during the backfill wait in the socket
+                    # buffer and are merged on top of it afterwards
+                    await self.backfill(conn.symbols)
+                    conn.connected = True
+                    backoff = 1
+                    async for raw in ws:
+                        try:
+                            await self.handle(raw)
+                        except Exception:
+                            continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass
+            conn.connected = False
+            conn.ws = None
+            # fall back to REST refreshes until we are back
+            for s in conn.symbols:
+                self.level1.pop(s, None)
+                for tf in self.tfs:
+                    self.cache.live.discard((s, tf))
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+    async def run(self):
+        self._running = True
+        closers = [asyncio.create_task(self._closer()) for _ in range(self.workers)]
+        if not self._conns:
+            for i in range(0, len(self.symbols), self.per_conn):
+                self._open(self.symbols[i:i+self.per_conn])
+        for c in self._conns:
+            if c.task is None:
+                c.task = asyncio.create_task(self._run_conn(c))
+        try:
+            # connections opened later by set_symbols add their own tasks
+            while True:
+                await asyncio.sleep(3600)
+        finally:
+            self._running = False
+            for t in closers + [c.task for c in self._conns if c.task is not None]:
+                t.cancel()
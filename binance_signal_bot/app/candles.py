@@ -0,0 +1,132 @@
+from typing import Dict, Any, List, Tuple, Set
+import numpy as np
+from kucoin_client import KucoinClient
+from store import CandleStore
+
+HISTORY_BARS = 300
+
+EMPTY = np.empty((0, 6))
+
+TF_MS = {"1m": 60_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000, "1h": 3_600_000, "4h": 14_400_000}
+
+def resample_klines(rows: np.ndarray, base_tf: str, tf: str) -> np.ndarray:
+    # Aggregate base_tf rows into tf bars aligned to epoch boundaries, as
+    # Binance does for its own intervals. A bucket that does not start at its
+    # boundary (start of history) or has a hole is dropped, since it would
+    # not match the exchange bar; the last bucket may be forming.
+    rows = np.asarray(rows, dtype=np.float64)
+    if len(rows) == 0:
+        return EMPTY
+    step = TF_MS[tf]; base = TF_MS[base_tf]
+    t = rows[:, 0].astype(np.int64); b = t - t % step
+    new_grp = np.empty(len(t), dtype=bool); new_grp[0] = True
+    np.not_equal(b[1:], b[:-1], out=new_grp[1:])
+    starts = np.flatnonzero(new_grp)
+    ends = np.r_[starts[1:], len(t)] - 1
+    bad = t[starts] != b[starts]
+    hole = np.r_[False, np.diff(t) != base] & ~new_grp
+    if hole.any():
+        bad[np.cumsum(new_grp)[hole] - 1] = True
+    out = np.column_stack([b[starts].astype(np.float64), rows[starts, 1], rows[ends, 2],
+                           np.maximum.reduceat(rows[:, 3], starts), np.minimum.reduceat(rows[:, 4], starts),
+                           np.add.reduceat(rows[:, 5], starts)])
+    return out[~bad]
+
+class CandleCache:
+    # Per-(symbol, timeframe) klines as float64 arrays in the fetch_candles
+    # column order: [time, open, close, high, low, volume]
+    def __init__(self, ku: KucoinClient, history: int = HISTORY_BARS, derive: Dict[str, str] = None, store: CandleStore = None):
+        self.ku = ku
+        self.history = history
+        # optional on-disk copy of closed bars for warm restarts
+        self.store = store
+        # tf -> base tf built locally by resample_klines once seeded from REST
+        self.derive = dict(derive or {})
+        self._bars: Dict[Tuple[str, str], np.ndarray] = {}
+        # keys kept current by a live stream (see binance_stream); refresh()
+        # serves them from memory instead of asking REST
+        self.live: Set[Tuple[str, str]] = set()
+
+    def bars(self, symbol: str, tf: str) -> np.ndarray:
+        return self._bars.get((symbol, tf), EMPTY)
+
+    def drop(self, symbol: str):
+        for key in [k for k in self._bars if k[0] == symbol]:
+            del self._bars[key]
+            self.live.discard(key)
+        if self.store is not None:
+            self.store.drop(symbol)
+
+    def _persist(self, symbol: str, tf: str, bars: np.ndarray):
+        if self.store is None or tf not in TF_MS:
+            return
+        try:
+            self.store.append(symbol, tf, bars, TF_MS[tf])
+        except OSError:
+            pass
+
+    def apply(self, symbol: str, tf: str, row: List[Any]) -> bool:
+        # Merge one streamed kline; returns False if the key is not seeded yet
+        key = (symbol, tf)
+        bars = self._bars.get(key)
+        if bars is None or len(bars) == 0:
+            return False
+        row = np.asarray(row, dtype=np.float64)
+        if row[0] == bars[-1, 0]:
+            bars[-1] = row
+        elif row[0] > bars[-1, 0]:
+            self._bars[key] = np.vstack([bars[-(self.history - 1):], row])
+            # the previous bar just closed
+            self._persist(symbol, tf, bars[-1:])
+        return True
+
+    async def refresh(self, symbol: str, tf: str, backfill: bool = False) -> np.ndarray:
+        key = (symbol, tf)
+        bars = self._bars.get(key)
+        seeded = bars is not None and len(bars) > 0
+        if seeded and key in self.live and not backfill:
+            return bars
+        if seeded and tf in self.derive:
+            derived = self._derive(symbol, tf, bars)
+            if derived is not None:
+                self._bars[key] = derived
+                self._persist(symbol, tf, derived)
+                return derived
+        if not seeded and self.store is not None:
+            # warm start: read what is on disk, then backfill only the gap
+            try:
+                bars = self.store.load(symbol, tf, self.history)
+            except (OSError, ValueError):
+                bars = None
+            seeded = bars is not None and len(bars) > 0
+        if not seeded:
+            bars = await self.ku.fetch_candles(symbol, tf=tf, limit=self.history)
+        else:
+            # startTime = last cached open time: the still-forming bar comes back
+            # revised, followed by anything that opened since
+            new = await self.ku.fetch_candles(symbol, tf=tf, limit=self.history, start_time=int(bars[-1, 0]))
+            if len(new) >= self.history:
+                # the gap is wider than the history (long downtime, stale disk
+                # copy): start over from the latest bars
+                bars = await self.ku.fetch_candles(symbol, tf=tf, limit=self.history)
+            elif len(new):
+                i = np.searchsorted(bars[:, 0], new[0, 0])
+                bars = np.concatenate([bars[:i], new])
+        bars = bars[-self.history:]
+        self._bars[key] = bars
+        self._persist(symbol, tf, bars)
+        return bars
+
+    def _derive(self, symbol: str, tf: str, bars: np.ndarray):
+        # Rebuild the recent tf bars from the base series; the deep history
+        # the slow EMAs need stays as seeded from REST. None means "use REST".
+        base_tf = self.derive[tf]
+        agg = resample_klines(self.bars(symbol, base_tf), base_tf, tf)
+        if len(agg) == 0:
+            return None
+        first = agg[0, 0]
+        if bars[-1, 0] + TF_MS[tf] < first:
+            # the base history no longer reaches back to our last bar
+            return None
+        i = np.searchsorted(bars[:, 0], first)
+        return np.concatenate([bars[:i], agg])[-self.history:]
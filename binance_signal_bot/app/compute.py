@@ -0,0 +1,81 @@
+import asyncio
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Any, List, Sequence, Tuple
+import numpy as np
+from features import ohlcv_df, add_indicators
+from rules import should_signal
+
+ROW = 6  # time, open, close, high, low, volume (fetch_candles column order)
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # Map a block the parent created and unlinks, without registering it with
+    # the resource tracker: a registration from the child would outlive an
+    # evaluate() cancelled mid-flight and be reported (and unlinked again) as
+    # leaked. Spawned workers share the parent's tracker, so unregistering
+    # after the fact would drop the parent's own entry instead.
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # 3.13+
+    except TypeError:
+        pass
+    register = resource_tracker.register
+    resource_tracker.register = lambda *a: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+def _evaluate_shm(name: str, layout: List[Tuple[int, int]], cfg: Dict[str, Any], opts: Dict[str, Any]) -> Dict[str, Any]:
+    # Runs in a pool process: map the block, build the trigger/setup/bias frames
+    # and evaluate the rules. Only the small result dict is pickled back.
+    shm = _attach(name)
+    try:
+        dfs = []
+        for off, n in layout:
+            view = np.ndarray((n, ROW), dtype=np.float64, buffer=shm.buf, offset=off)
+            # ohlcv_df copies the columns out, so the view can go before close()
+            dfs.append(add_indicators(ohlcv_df(view), opts))
+            del view
+    finally:
+        shm.close()
+    df5, df15, df1h = dfs
+    if df5.empty or df15.empty or df1h.empty:
+        return {"ok": False, "why": "insufficient data"}
+    return should_signal(df1h, df15, df5, cfg, opts)
+
+def _warm():
+    # imports pandas/ta in the child ahead of the first scan
+    return True
+
+class ComputePool:
+    # Process pool for the CPU-bound indicator + rule stage. The candle arrays
+    # of one symbol are written into a single shared memory block instead of
+    # pickling DataFrames; the event loop only copies bytes and awaits.
+    def __init__(self, workers: int):
+        self.workers = max(1, int(workers))
+        # spawn: children must not inherit the running event loop or sockets
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=mp.get_context("spawn"))
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self._pool, _warm) for _ in range(self.workers)))
+
+    async def evaluate(self, bars: Sequence[np.ndarray], cfg: Dict[str, Any], opts: Dict[str, Any]) -> Dict[str, Any]:
+        # bars: trigger_tf, setup_tf, bias_tf arrays
+        arrays = [np.ascontiguousarray(b, dtype=np.float64).reshape(-1, ROW) for b in bars]
+        shm = shared_memory.SharedMemory(create=True, size=max(8, sum(a.nbytes for a in arrays)))
+        try:
+            layout = []; off = 0
+            for a in arrays:
+                np.ndarray(a.shape, dtype=np.float64, buffer=shm.buf, offset=off)[:] = a
+                layout.append((off, len(a)))
+                off += a.nbytes
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, _evaluate_shm, shm.name, layout, cfg, opts)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
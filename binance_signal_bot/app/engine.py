@@ -0,0 +1,264 @@
+from typing import Dict, Any, Tuple
+from collections import deque
+import math
+import numpy as np
+import pandas as pd
+from market import Ring, Window, MarketFrame
+from rules import lookback_bars
+
+NAN = float("nan")
+
+COLUMNS = ["time","open","high","low","close","volume"]
+# per-bar values stored as is; EMAs and VWAP are derived per frame
+_DATA = ["open","high","low","close","volume","macd","macd_signal","macd_hist","rsi","atr"]
+
+class _EMA:
+    # ewm(span=period, adjust=False, min_periods=period), as ta's EMAIndicator
+    __slots__ = ("period","alpha","value","n")
+
+    def __init__(self, period: int, alpha: float = None):
+        self.period = period
+        self.alpha = alpha if alpha is not None else 2.0 / (period + 1)
+        self.value = NAN; self.n = 0
+
+    def update(self, x: float) -> float:
+        self.n += 1
+        self.value = x if self.n == 1 else self.alpha * x + (1.0 - self.alpha) * self.value
+        return self.value if self.n >= self.period else NAN
+
+    def copy(self) -> "_EMA":
+        e = _EMA(self.period, self.alpha); e.value = self.value; e.n = self.n
+        return e
+
+class _State:
+    __slots__ = ("params","emas","macd_fast","macd_slow","macd_sig","rsi_up","rsi_dn","rsi_len",
+                 "prev_close","atr","atr_n","tr_sum","vwap_win","pv_sum","v_sum","last_time","tail","ring","window","evicted")
+
+    def __init__(self, params: Tuple, dtype=None):
+        efasts, mf, ms, sig, rsi_len, self.vwap_win, tail = params
+        self.params = params
+        self.emas = {p: _EMA(p) for p in efasts}
+        self.macd_fast = _EMA(mf); self.macd_slow = _EMA(ms); self.macd_sig = _EMA(sig)
+        self.rsi_len = rsi_len
+        self.rsi_up = _EMA(rsi_len, 1.0 / rsi_len); self.rsi_dn = _EMA(rsi_len, 1.0 / rsi_len)
+        self.prev_close = NAN
+        self.atr = 0.0; self.atr_n = 0; self.tr_sum = 0.0
+        self.pv_sum = 0.0; self.v_sum = 0.0
+        self.last_time = None
+        self.evicted = None
+        # The last `tail` bars (time, _DATA...) are all a frame shows. Only
+        # (pv, v, close, unmasked EMAs) go back the whole VWAP window, in
+        # float64: they are subtracted back out, and restate the EMAs. With
+        # a dtype the bar rows live in a preallocated Ring instead of tuples.
+        size = max(tail, self.vwap_win)
+        if dtype is None:
+            self.tail = deque(maxlen=tail); self.ring = None
+            self.window = deque(maxlen=size)
+        else:
+            self.tail = None
+            self.ring = Ring(tail, len(_DATA), dtype)
+            self.window = Window(size, 3 + len(self.emas))
+
+    def count(self) -> int:
+        # bars in the VWAP window so far
+        return min(len(self.window), self.vwap_win)
+
+    def snapshot(self) -> "_State":
+        # everything but the bar rows, so a revision of the last bar stays O(1)
+        s = _State.__new__(_State)
+        s.params = self.params
+        s.emas = {p: e.copy() for p, e in self.emas.items()}
+        s.macd_fast = self.macd_fast.copy(); s.macd_slow = self.macd_slow.copy(); s.macd_sig = self.macd_sig.copy()
+        s.rsi_len = self.rsi_len
+        s.rsi_up = self.rsi_up.copy(); s.rsi_dn = self.rsi_dn.copy()
+        s.prev_close = self.prev_close
+        s.atr = self.atr; s.atr_n = self.atr_n; s.tr_sum = self.tr_sum
+        s.vwap_win = self.vwap_win; s.pv_sum = self.pv_sum; s.v_sum = self.v_sum
+        s.last_time = self.last_time
+        s.tail = None; s.ring = None; s.window = None; s.evicted = None
+        return s
+
+    def rollback(self, snap: "_State"):
+        # undo the last push() using the snapshot taken right before it
+        tail = self.tail; ring = self.ring; window = self.window; evicted = self.evicted
+        for name in _State.__slots__:
+            setattr(self, name, getattr(snap, name))
+        self.tail = tail; self.ring = ring; self.window = window; self.evicted = None
+        if ring is not None:
+            ring.unpush(evicted[0])
+            window.unpush(evicted[1])
+            return
+        for rows, old in zip((tail, window), evicted):
+            rows.pop()
+            if old is not None:
+                rows.appendleft(old)
+
+    def push(self, t: int, o: float, c: float, h: float, l: float, v: float):
+        for p in sorted(self.emas):
+            self.emas[p].update(c)
+        f = self.macd_fast.update(c); s = self.macd_slow.update(c)
+        macd = f - s
+        if math.isnan(macd):
+            sig = NAN
+        else:
+            sig = self.macd_sig.update(macd)
+        # RSI: diff of the very first bar counts as 0 for both directions
+        d = 0.0 if math.isnan(self.prev_close) else c - self.prev_close
+        up = self.rsi_up.update(d if d > 0 else 0.0); dn = self.rsi_dn.update(-d if d < 0 else 0.0)
+        if math.isnan(dn):
+            rsi = NAN
+        elif dn == 0:
+            rsi = 100.0
+        else:
+            rsi = 100.0 - 100.0 / (1.0 + up / dn)
+        # ATR (Wilder), 0 until the first full window, as ta's AverageTrueRange
+        tr = h - l if math.isnan(self.prev_close) else max(h - l, abs(h - self.prev_close), abs(l - self.prev_close))
+        self.atr_n += 1
+        if self.atr_n < 14:
+            self.tr_sum += tr
+        elif self.atr_n == 14:
+            self.atr = (self.tr_sum + tr) / 14.0
+        else:
+            self.atr = (self.atr * 13.0 + tr) / 14.0
+        # VWAP sums over the last vwap_win bars (the window add_indicators sees);
+        # the unmasked EMA values let frame() restate the EMAs for that window
+        pv = c * v
+        if len(self.window) >= self.vwap_win:
+            old = self.window[-self.vwap_win]
+            self.pv_sum -= old[0]; self.v_sum -= old[1]
+        self.pv_sum += pv; self.v_sum += v
+        self.prev_close = c
+        self.last_time = t
+        row = (o, h, l, c, v, macd, sig, macd - sig, rsi, self.atr)
+        exact = (pv, v, c) + tuple(self.emas[p].value for p in sorted(self.emas))
+        if self.ring is not None:
+            self.evicted = (self.ring.push(t, row), self.window.push(exact))
+            return
+        self.evicted = tuple(rows[0] if len(rows) == rows.maxlen else None for rows in (self.tail, self.window))
+        self.tail.append((t,) + row)
+        self.window.append(exact)
+
+def _window_emas(periods: Tuple[int, ...], x0: float, e0: np.ndarray, raw: np.ndarray, k: np.ndarray) -> Dict[str, np.ndarray]:
+    # The state carries one EMA since the first bar it saw; add_indicators
+    # seeds each EMA at the first bar of its window instead. Both follow the
+    # same recurrence afterwards, so they differ by (1-a)^k * (x0 - e0),
+    # where x0/e0 are close and EMA at the window start and k counts bars
+    # since it. min_periods applies within the window, as in ta.
+    out = {}
+    for j, p in enumerate(periods):
+        a = 2.0 / (p + 1)
+        col = raw[:, j] + (1.0 - a) ** k * (x0 - e0[j])
+        col[k + 1 < p] = NAN
+        out[f"ema{p}"] = col
+    return out
+
+class IndicatorEngine:
+    # Running indicator state per (symbol, timeframe). Each new or revised bar
+    # costs O(1). Frames match add_indicators() over the same window of
+    # vwap_window bars: EMAs and VWAP exactly (up to rounding); MACD, RSI
+    # and ATR keep their state across the window, which moves them by less
+    # than 1e-6 relative once the window has slid (their seed has decayed
+    # for vwap_window - tail bars by then).
+    # compact=True keeps the rows in preallocated ring buffers (float32 with
+    # dtype=np.float32) and frame() returns a MarketFrame of views instead
+    # of building a DataFrame per call.
+    def __init__(self, vwap_window: int = 300, tail: int = 60, compact: bool = False, dtype=np.float64):
+        self.vwap_window = vwap_window
+        # a frame never reaches back past the window add_indicators would see
+        self.tail = min(tail, vwap_window)
+        self.dtype = dtype if compact else None
+        self._cols: Dict[Tuple, Dict[str, int]] = {}
+        self._state: Dict[Tuple[str, str], _State] = {}
+        self._prev: Dict[Tuple[str, str], _State] = {}
+
+    def _params(self, opts: Dict[str, Any]) -> Tuple:
+        emas = {int(opts.get("ema_fast",20)), int(opts.get("ema_mid",50)), int(opts.get("ema_slow",200)), 20, 50, 200}
+        # frames grow with breakout_lookback_bars (+2 rows for the VWAP and
+        # MACD diffs), up to the whole window
+        rows = min(max(self.tail, lookback_bars(opts) + 2), self.vwap_window)
+        return (tuple(sorted(emas)), int(opts.get("macd_fast",12)), int(opts.get("macd_slow",26)),
+                int(opts.get("macd_signal",9)), int(opts.get("rsi_length",14)), self.vwap_window, rows)
+
+    def drop(self, symbol: str):
+        for key in [k for k in self._state if k[0] == symbol]:
+            self._state.pop(key, None); self._prev.pop(key, None)
+
+    def update(self, symbol: str, tf: str, klines: np.ndarray, opts: Dict[str, Any]) -> pd.DataFrame:
+        key = (symbol, tf)
+        params = self._params(opts)
+        st = self._state.get(key)
+        if klines is None or len(klines) == 0:
+            return self.frame(symbol, tf)
+        klines = np.asarray(klines, dtype=np.float64)
+        start = 0
+        if st is not None and st.params == params and st.last_time is not None:
+            # anything before the last processed bar is unchanged
+            i = int(np.searchsorted(klines[:, 0], st.last_time))
+            if i < len(klines) and klines[i, 0] == st.last_time:
+                # the last processed bar may have been revised: replay it
+                st.rollback(self._prev[key])
+                start = i
+            else:
+                st = None
+        else:
+            st = None
+        if st is None:
+            st = _State(params, self.dtype)
+            start = 0
+        rows = klines[start:].tolist()
+        last = len(rows) - 1
+        for i, k in enumerate(rows):
+            if i == last:
+                self._prev[key] = st.snapshot()
+            st.push(int(k[0]), k[1], k[2], k[3], k[4], k[5])
+        self._state[key] = st
+        return self.frame(symbol, tf)
+
+    def _columns(self, st: _State) -> Dict[str, int]:
+        cols = self._cols.get(st.params)
+        if cols is None:
+            cols = self._cols[st.params] = {n: i for i, n in enumerate(_DATA)}
+        return cols
+
+    def _derived(self, st: _State, exact: np.ndarray, start: np.ndarray) -> Dict[str, np.ndarray]:
+        # VWAP and EMAs of the frame rows. exact: (pv, v, close, raw EMAs...)
+        # of the frame rows, start: the same for the first bar of the window
+        n = len(exact)
+        # VWAP is cumulative from the start of the current window, so earlier
+        # rows are derived back from the running sums
+        pv, v = exact[:, 0], exact[:, 1]
+        pv = st.pv_sum - (np.cumsum(pv[::-1])[::-1] - pv)
+        vv = st.v_sum - (np.cumsum(v[::-1])[::-1] - v)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out = {"vwap": np.where(vv == 0, np.nan, pv / np.where(vv == 0, 1.0, vv))}
+        window = st.count()
+        k = np.arange(window - n, window, dtype=np.float64)
+        out.update(_window_emas(tuple(sorted(st.emas)), start[2], start[3:], exact[:, 3:], k))
+        return out
+
+    def _view(self, st: _State) -> MarketFrame:
+        times, data = st.ring.last()
+        derived = {}
+        if len(times):
+            derived = self._derived(st, st.window.last(len(times)), st.window[-st.count()])
+        return MarketFrame(self._columns(st), times, data, derived)
+
+    def frame(self, symbol: str, tf: str):
+        st = self._state.get((symbol, tf))
+        if self.dtype is not None:
+            if st is None:
+                return MarketFrame({}, np.empty(0, dtype=np.int64), np.empty((0, 0)))
+            return self._view(st)
+        if st is None or not st.tail:
+            return pd.DataFrame(columns=COLUMNS)
+        a = np.array(st.tail, dtype=np.float64)
+        n = len(a)
+        exact = np.array([st.window[i] for i in range(-n, 0)], dtype=np.float64)
+        start = np.array(st.window[-st.count()], dtype=np.float64)
+        df = pd.DataFrame(a[:, 1:], columns=_DATA)
+        df.insert(0, "time", pd.to_datetime(a[:, 0].astype(np.int64), unit="ms"))
+        derived = self._derived(st, exact, start)
+        for p in sorted(st.emas):
+            df.insert(df.columns.get_loc("macd"), f"ema{p}", derived[f"ema{p}"])
+        df["vwap"] = derived["vwap"]
+        return df
@@ -5,17 +5,16 @@ from ta.trend import EMAIndicator, MACD
 from ta.momentum import RSIIndicator
 from ta.volatility import AverageTrueRange
 
-def ohlcv_df(klines: List[List[Any]]) -> pd.DataFrame:
-    if not klines:
+def ohlcv_df(klines) -> pd.DataFrame:
+    # klines: (n, 6) array or rows of [time, open, close, high, low, volume]
+    if klines is None or len(klines) == 0:
         return pd.DataFrame(columns=["time","open","high","low","close","volume"])
-    rows = []
-    for k in klines:
-        t = int(float(k[0]))
-        rows.append({"time": pd.to_datetime(t, unit="ms"),
-                     "open": float(k[1]), "close": float(k[2]),
-                     "high": float(k[3]), "low": float(k[4]),
-                     "volume": float(k[5])})
-    return pd.DataFrame(rows).sort_values("time").reset_index(drop=True)
+    a = np.asarray(klines, dtype=np.float64)
+    t = a[:, 0]
+    if len(t) > 1 and not (t[1:] >= t[:-1]).all():
+        a = a[np.argsort(t, kind="stable")]
+    return pd.DataFrame({"time": pd.to_datetime(a[:, 0].astype(np.int64), unit="ms"),
+                         "open": a[:, 1], "close": a[:, 2], "high": a[:, 3], "low": a[:, 4], "volume": a[:, 5]})
 
 def add_indicators(df: pd.DataFrame, opts: Dict[str, Any]) -> pd.DataFrame:
     if df.empty:
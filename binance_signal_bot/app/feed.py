@@ -0,0 +1,134 @@
+import asyncio, json, re, time
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+_ONLY = re.compile(r"only (\d+) confirmations")
+
+# results that say nothing new about a symbol
+QUIET = ("unchanged", "batched", "close pending")
+
+class LiveFeed:
+    # Live state for the web UI, pushed as Server-Sent Events.
+    # The scanner only writes into plain dicts (no awaits, no I/O); run()
+    # wakes every `interval` seconds, coalesces what changed into a single
+    # delta frame, encodes it once and hands the same string to every
+    # viewer. A viewer whose queue is full gets a fresh snapshot instead of
+    # the deltas it missed, so slow clients never hold the scanner back.
+    def __init__(self, interval: float = 0.5, queue_size: int = 32, recent: int = 50):
+        self.interval = interval
+        self.queue_size = queue_size
+        self.version = 0
+        self.scan: Dict[str, Any] = {"running": False, "done": 0, "total": 0, "started": None, "seconds": None}
+        self.symbols: Dict[str, Dict[str, Any]] = {}
+        self.signals: deque = deque(maxlen=recent)
+        self._next_signal = 1
+        self._subs: List[asyncio.Queue] = []
+        self._scan_dirty = False
+        self._sym_dirty: set = set()
+        self._removed: set = set()
+        self._new_signals: List[Dict[str, Any]] = []
+
+    # --- writers (called from the scan loop) ---
+
+    def scan_start(self, symbols: List[str]):
+        gone = set(self.symbols) - set(symbols)
+        for sym in gone:
+            del self.symbols[sym]
+        self._removed |= gone
+        self._sym_dirty -= gone
+        self.scan.update(running=True, done=0, total=len(symbols), started=time.time())
+        self._scan_dirty = True
+
+    def scan_step(self):
+        self.scan["done"] += 1
+        self._scan_dirty = True
+
+    def scan_end(self, seconds: float):
+        self.scan.update(running=False, done=self.scan["total"], seconds=round(seconds, 3))
+        self._scan_dirty = True
+
+    def symbol(self, sym: str, res: Dict[str, Any]):
+        why = res.get("why")
+        if why in QUIET:
+            return
+        if res.get("ok"):
+            confirms = int(res.get("confirms", len(res.get("reasons", []))))
+        else:
+            m = _ONLY.match(why or "")
+            confirms = int(m.group(1)) if m else None
+        self.symbols[sym] = {"c": confirms, "ok": bool(res.get("ok")), "why": why, "t": int(time.time())}
+        self._sym_dirty.add(sym)
+        self._removed.discard(sym)
+
+    def signal(self, sym: str, confirms: int, entry: float, sl: float, tps: List[float]):
+        rec = {"id": self._next_signal, "symbol": sym, "c": int(confirms), "entry": entry, "sl": sl,
+               "tps": [float(x) for x in tps], "t": int(time.time())}
+        self._next_signal += 1
+        self.signals.append(rec)
+        self._new_signals.append(rec)
+
+    # --- readers ---
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"v": self.version, "scan": dict(self.scan), "symbols": dict(self.symbols), "signals": list(self.signals)}
+
+    @staticmethod
+    def _frame(event: str, data: Dict[str, Any]) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+    def _take_delta(self) -> Optional[Dict[str, Any]]:
+        if not (self._scan_dirty or self._sym_dirty or self._removed or self._new_signals):
+            return None
+        self.version += 1
+        delta: Dict[str, Any] = {"v": self.version}
+        if self._scan_dirty:
+            delta["scan"] = dict(self.scan)
+        if self._sym_dirty:
+            delta["symbols"] = {s: self.symbols[s] for s in self._sym_dirty}
+        if self._removed:
+            delta["removed"] = sorted(self._removed)
+        if self._new_signals:
+            delta["signals"] = self._new_signals
+        self._scan_dirty = False
+        self._sym_dirty = set()
+        self._removed = set()
+        self._new_signals = []
+        return delta
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            delta = self._take_delta()
+            if delta is None or not self._subs:
+                continue
+            frame = self._frame("delta", delta)
+            snap = None
+            for q in self._subs:
+                if q.full():
+                    # too far behind: drop its backlog and resync from state
+                    while not q.empty():
+                        q.get_nowait()
+                    if snap is None:
+                        snap = self._frame("snapshot", self.snapshot())
+                    q.put_nowait(snap)
+                else:
+                    q.put_nowait(frame)
+
+    async def events(self, keepalive: float = 15.0):
+        # Snapshot first, then deltas; a comment line keeps proxies from
+        # closing an idle connection
+        q: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subs.append(q)
+        try:
+            yield "retry: 3000\n" + self._frame("snapshot", self.snapshot())
+            while True:
+                try:
+                    yield await asyncio.wait_for(q.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            self._subs.remove(q)
+
+    @property
+    def viewers(self) -> int:
+        return len(self._subs)
@@ -1,14 +1,79 @@
+import asyncio, time
 import httpx
-from typing import Dict, Any, List
+import numpy as np
+from typing import Dict, Any, List, Optional
+from metrics import STAGE_SECONDS
 
 BN_PUBLIC = "https://api.binance.com"
 
 # Map to Binance intervals 1:1
 TF_MAP = {"5m":"5m","15m":"15m","1h":"1h"}
 
+# Request weights of the endpoints we use (Binance docs)
+WEIGHTS = {"/api/v3/time": 1, "/api/v3/ticker/24hr": 80, "/api/v3/klines": 2, "/api/v3/ticker/bookTicker": 2}
+
+# Binance kline: [openTime, open, high, low, close, volume, closeTime, ...];
+# features.ohlcv_df expects [time, open, close, high, low, volume]
+KLINE_COLS = [0, 1, 4, 2, 3, 5]
+
+def parse_klines(data: List[List[Any]]) -> np.ndarray:
+    # One C-level str->float pass into a (n, 6) float64 array; open times in
+    # ms stay exact in float64
+    if not data:
+        return np.empty((0, 6))
+    return np.array([k[:6] for k in data], dtype=np.float64)[:, KLINE_COLS]
+
 class KucoinClient:  # kept name for compatibility
-    def __init__(self):
+    def __init__(self, weight_limit: int = 6000, weight_budget: float = 0.8, base_url: str = BN_PUBLIC):
         self._http = httpx.AsyncClient(timeout=15)
+        self.base_url = base_url.rstrip("/")
+        # IP weight limit per minute and the share of it we allow ourselves
+        self.weight_limit = weight_limit
+        self.weight_budget = weight_budget
+        self.used_weight = 0
+        self._weight_minute = 0
+        self._blocked_until = 0.0
+
+    def _reserve(self, weight: int) -> float:
+        # Returns how long to wait before a request of `weight` may go out
+        now = time.time()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        minute = int(now // 60)
+        if minute != self._weight_minute:
+            self._weight_minute = minute; self.used_weight = 0
+        if self.used_weight + weight > self.weight_limit * self.weight_budget:
+            return (minute + 1) * 60 - now + 0.05
+        self.used_weight += weight
+        return 0.0
+
+    async def _get(self, path: str, params: Dict[str, Any] = None, retries: int = 2) -> httpx.Response:
+        weight = WEIGHTS.get(path, 1)
+        while True:
+            wait = self._reserve(weight)
+            while wait > 0:
+                await asyncio.sleep(wait)
+                wait = self._reserve(weight)
+            r = await self._http.get(f"{self.base_url}{path}", params=params)
+            used = r.headers.get("X-MBX-USED-WEIGHT-1M")
+            if used is not None:
+                try:
+                    # server count is authoritative, but keep reservations of in-flight requests
+                    self.used_weight = max(self.used_weight, int(used))
+                except ValueError:
+                    pass
+            if r.status_code in (418, 429):
+                try:
+                    retry_after = float(r.headers.get("Retry-After", "60"))
+                except ValueError:
+                    retry_after = 60.0
+                self._blocked_until = max(self._blocked_until, time.time() + retry_after)
+                # 418 is an IP ban: do not keep hammering
+                if r.status_code == 429 and retries > 0:
+                    retries -= 1
+                    continue
+            r.raise_for_status()
+            return r
 
     @staticmethod
     def _to_dash(sym: str) -> str:
@@ -23,46 +88,44 @@ class KucoinClient:  # kept name for compatibility
         # "SOL-USDT" -> "SOLUSDT"
         return sym_dash.replace("-", "")
 
-    async def fetch_all_tickers(self) -> Dict[str, Any]:
-        # Binance 24hr tickers for all symbols
-        r = await self._http.get(f"{BN_PUBLIC}/api/v3/ticker/24hr")
-        r.raise_for_status()
+    async def fetch_all_tickers(self, quote: str = "USDT") -> Dict[str, Any]:
+        # Binance 24hr tickers for all symbols; MINI drops the bid/ask/weighted
+        # fields we never read and roughly halves the ~2000-entry payload
+        r = await self._get("/api/v3/ticker/24hr", params={"type": "MINI"})
         arr = r.json()
         # Build KuCoin-like shape used by the app
         tickers = []
+        n = len(quote)
         for t in arr:
             sym = t.get("symbol","")
-            if not sym.endswith("USDT"):
+            if not sym.endswith(quote):
                 continue
-            try:
-                vol_quote = float(t.get("quoteVolume", "0"))
-            except Exception:
-                vol_quote = 0.0
-            tickers.append({"symbol": self._to_dash(sym), "volValue": str(vol_quote)})
+            tickers.append({"symbol": f"{sym[:-n]}-{quote}", "volValue": t.get("quoteVolume", "0")})
         return {"data": {"ticker": tickers}}
 
-    async def fetch_candles(self, symbol: str, tf: str, limit: int = 300) -> List[List[Any]]:
+    async def fetch_candles(self, symbol: str, tf: str, limit: int = 300, start_time: Optional[int] = None) -> np.ndarray:
         # Convert to Binance symbol
         bsym = self._to_binance(symbol)
         interval = TF_MAP.get(tf, tf)
         params = {"symbol": bsym, "interval": interval, "limit": limit}
-        r = await self._http.get(f"{BN_PUBLIC}/api/v3/klines", params=params)
-        r.raise_for_status()
-        data = r.json()
-        # Reformat to the order used by features.ohlcv_df:
-        # [time, open, close, high, low, volume]
-        out = []
-        for k in data:
-            # Binance kline: [openTime, open, high, low, close, volume, closeTime, ...]
-            open_time = k[0]
-            open_p = k[1]; high = k[2]; low = k[3]; close = k[4]; vol = k[5]
-            out.append([open_time, open_p, close, high, low, vol])
+        if start_time is not None:
+            # only candles with openTime >= start_time
+            params["startTime"] = int(start_time)
+        t0 = time.perf_counter()
+        r = await self._get("/api/v3/klines", params=params)
+        t1 = time.perf_counter()
+        out = parse_klines(r.json())
+        STAGE_SECONDS.observe(t1 - t0, "fetch", tf)
+        STAGE_SECONDS.observe(time.perf_counter() - t1, "parse", tf)
         return out
 
+    async def server_time(self) -> int:
+        r = await self._get("/api/v3/time")
+        return int(r.json()["serverTime"])
+
     async def fetch_level1(self, symbol: str) -> Dict[str, Any]:
         bsym = self._to_binance(symbol)
-        r = await self._http.get(f"{BN_PUBLIC}/api/v3/ticker/bookTicker", params={"symbol": bsym})
-        r.raise_for_status()
+        r = await self._get("/api/v3/ticker/bookTicker", params={"symbol": bsym})
         d = r.json()
         return {
             "bestBid": d.get("bidPrice", "0"),
@@ -1,12 +1,27 @@
-import asyncio, os, time, json, re
+import asyncio, os, time, json, re, hmac, secrets, sqlite3
 from typing import Dict, Any, List
 import yaml
 import pandas as pd
-from fastapi import FastAPI
-from kucoin_client import KucoinClient
-from features import ohlcv_df, add_indicators
-from rules import should_signal
+import numpy as np
+from kucoin_client import KucoinClient, BN_PUBLIC
+from candles import CandleCache, TF_MS
+from store import CandleStore, STORE_DIR
+from signals_db import SignalStore, SIGNALS_DB
+from engine import IndicatorEngine
+from binance_stream import BinanceStream, BN_WS
+from universe import SymbolUniverse, build_symbol_universe
+from rules import adjust_tps
+from rules_batch import RuleBatch
 from notifier import TelegramNotifier
+from compute import ComputePool
+from scan import fetch_bars, make_engine, evaluate_symbol, CLOSE_RETRIES
+from scheduler import CloseScheduler, DirtyTracker
+from feed import LiveFeed
+from shard import ShardCoordinator, SECRET_HEADER, heartbeat_seconds
+from profiler import SamplingProfiler, FlightRecorder
+from options import OptionsStore, UNIVERSE_KEYS, changed_keys
+import metrics
+from metrics import STAGE_SECONDS, SCAN_SECONDS, SYMBOL_ERRORS, SYMBOLS_SKIPPED, LOOP_ERRORS
 
 import os as _os
 import httpx as _httpx
@@ -51,7 +66,21 @@ STATE = {
 
 RUNTIME_PATH = "/data/runtime.json"
 
-app = FastAPI()
+# options.json + user_config.json, re-read only when the files change
+OPTIONS = OptionsStore()
+
+# live state for the web UI (/api/stream)
+FEED = LiveFeed()
+
+# admin: sampling profiler armed per scan cycle, and the slow-scan flight recorder
+PROFILER = SamplingProfiler()
+RECORDER = FlightRecorder()
+STAGE_SECONDS.listeners.append(RECORDER.on_stage)
+
+def loop_error(where: str, e: BaseException):
+    # a loop caught e and keeps going: log, count and keep the trace
+    LOOP_ERRORS.inc(where, type(e).__name__)
+    RECORDER.error(where, e)
 
 def load_cfg() -> Dict[str, Any]:
 
@@ -68,11 +97,20 @@ def load_cfg() -> Dict[str, Any]:
     return cfg
 
 def get_addon_options() -> Dict[str, Any]:
-    opts_path = "/data/options.json"
-    if os.path.exists(opts_path):
-        with open(opts_path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
+    # /data/options.json alone (what the Supervisor holds)
+    return OPTIONS.addon()
+
+NOTIFIERS: Dict[tuple, TelegramNotifier] = {}
+
+def get_notifier(opts: Dict[str, Any]) -> TelegramNotifier:
+    # one notifier (pooled client, send queue, rate limits) per bot+chat
+    key = (str(opts.get("telegram_token","")).strip(), str(opts.get("telegram_chat_id","")).strip())
+    tg = NOTIFIERS.get(key)
+    if tg is None:
+        tg = NOTIFIERS[key] = TelegramNotifier(key[0], key[1])
+    # live option: the queue worker reads it for every message
+    tg.coalesce = bool(opts.get("telegram_coalesce", False))
+    return tg
 
 def confirms_emoji(confirms: int) -> str:
     return "🟢" if confirms==5 else ("🟡" if confirms==4 else ("🟠" if confirms==3 else ("🔴" if confirms==2 else "⚪")))
@@ -96,30 +134,14 @@ def write_json(path, data):
     except Exception:
         return False
 
-def read_json(path, default):
-    try:
-        if os.path.exists(path):
-            with open(path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-    except Exception:
-        pass
-    return default
-
 def merge_dicts(a: dict, b: dict) -> dict:
     c = dict(a or {})
     c.update(b or {})
     return c
 
-def merged_options():
-    opts = get_addon_options()
-    user = read_json('/data/user_config.json', {})
-    return merge_dicts(opts, user)
-
 async def persist_options(new_vals: dict):
-    # Update user_config.json
-    user = read_json('/data/user_config.json', {})
-    user = merge_dicts(user, new_vals or {})
-    write_json('/data/user_config.json', user)
+    # Update user_config.json (the running scanner picks it up before its next pass)
+    OPTIONS.update_user(new_vals or {})
     # Also update Supervisor options (HA UI)
     opts = get_addon_options()
     opts = merge_dicts(opts, new_vals or {})
@@ -133,18 +155,6 @@ def save_runtime_min_confirms(val:int):
     except Exception:
         pass
 
-def adjust_tps(entry: float, raw_levels, opts: Dict[str, Any], spread_bps: float=None):
-    fee = int(opts.get("taker_fee_bps",10))
-    buffer = int(opts.get("roundtrip_extra_buffer_bps",5))
-    min_net = int(opts.get("min_net_profit_bps",10))
-    cost_bps = 2*fee + (int(spread_bps) if spread_bps is not None else buffer)
-    min_pct = (cost_bps + min_net) / 10000.0
-    result = []
-    for lvl in raw_levels:
-        pct = max(float(lvl), min_pct)
-        result.append(entry*(1.0+pct))
-    return result
-
 def format_signal(sym: str, res: Dict[str, Any], confirms: int, adjusted_tps):
     entry = res["entry"]; sl = res["sl"]
     emoji = confirms_emoji(confirms)
@@ -155,158 +165,389 @@ def format_signal(sym: str, res: Dict[str, Any], confirms: int, adjusted_tps):
             f"TP1:  {adjusted_tps[0]:.6f}\nTP2:  {adjusted_tps[1]:.6f}\nTP3:  {adjusted_tps[2]:.6f}\n"
             f"Причины: {reasons}")
 
-async def build_symbol_universe(ku: KucoinClient, quote: str, top_n: int, min_vol24: float):
-    data = await ku.fetch_all_tickers()
-    arr = data.get("data", {}).get("ticker", [])
-    rows = []
-    for t in arr:
-        sym = t.get("symbol", "")
-        if not sym.endswith(f"-{quote}"):
-            continue
-        try:
-            vol_usd = float(t.get("volValue", "0"))
-        except Exception:
-            vol_usd = 0.0
-        rows.append((sym, vol_usd))
-    rows.sort(key=lambda x: x[1], reverse=True)
-    rows = [s for s,v in rows if v >= min_vol24][:top_n]
-    return rows
-
-async def fetch_df(ku: KucoinClient, symbol: str, tf: str, opts: Dict[str, Any]):
-    kl = await ku.fetch_candles(symbol, tf=tf, limit=300)
-    df = ohlcv_df(kl)
-    df = add_indicators(df, opts)
-    return df
-
-async def scan_once(tg: TelegramNotifier, ku: KucoinClient, cfg: Dict[str, Any], opts: Dict[str, Any]):
-    # Fixed universe: ETH, BTC, SOL, BNB, XRP (USDT pairs)
-    symbols = ["BTC-USDT","ETH-USDT","SOL-USDT","BNB-USDT","XRP-USDT"]
-    STATE["symbols"] = symbols[:]
+# Fixed universe: ETH, BTC, SOL, BNB, XRP (USDT pairs)
+FIXED_SYMBOLS = ["BTC-USDT","ETH-USDT","SOL-USDT","BNB-USDT","XRP-USDT"]
+
+async def scan_symbol(sym: str, tg: TelegramNotifier, ku: KucoinClient, cfg: Dict[str, Any], opts: Dict[str, Any], cache: CandleCache = None, engine: IndicatorEngine = None, stream: BinanceStream = None, pool: ComputePool = None,
+                      tracker: DirtyTracker = None, closed_before: int = None, batch: RuleBatch = None) -> Dict[str, Any]:
+    res = await evaluate_symbol(sym, ku, cfg, opts, cache, engine, pool, tracker, closed_before, batch)
+    FEED.symbol(sym, res)
+    await notify_signal(sym, res, tg, ku, cfg, opts, stream)
+    return res
+
+async def notify_signal(sym: str, res: Dict[str, Any], tg: TelegramNotifier, ku: KucoinClient, cfg: Dict[str, Any], opts: Dict[str, Any], stream: BinanceStream = None):
     cooldown = int(opts.get("cooldown_minutes", 20)) * 60
     min_conf = STATE["runtime"]["min_confirms"]
 
-    for sym in symbols:
+    if res.get("ok"):
+        confirms = int(res.get("confirms", len(res.get("reasons", []))))
+        if confirms < max(3, min_conf):
+            return
+
+        spread_bps = None
+        if bool(opts.get("use_level1_spread", False)):
+            try:
+                lvl1 = stream.level1.get(sym) if stream is not None else None
+                if not lvl1:
+                    lvl1 = await ku.fetch_level1(sym)
+                best_ask = float(lvl1.get("bestAsk", 0)); best_bid = float(lvl1.get("bestBid", 0))
+                if best_ask > 0 and best_bid > 0:
+                    spread_bps = int(((best_ask - best_bid) / best_bid) * 10000)
+            except Exception:
+                spread_bps = None
+
+        entry = float(res["entry"])
+        adjusted_tps = adjust_tps(entry, cfg["exits"]["tp_levels_pct"], opts, spread_bps)
+
+        now = time.time()
+        last = STATE["last_signal_ts"].get(sym, 0)
+        last_confirms = STATE["last_confirms"].get(sym, 0)
+
+        if now - last >= cooldown or confirms > last_confirms:
+            msg = format_signal(sym, res, confirms, adjusted_tps)
+            tg.enqueue(msg)
+            STATE["last_signal_ts"][sym] = now
+            STATE["last_confirms"][sym] = confirms
+            STATE["signals_sent"] += 1
+            metrics.SIGNALS_SENT.inc()
+            FEED.signal(sym, confirms, entry, float(res["sl"]), adjusted_tps)
+            history = STATE.get("signal_store")
+            if history is not None:
+                try:
+                    history.record(sym, res, confirms, adjusted_tps)
+                except sqlite3.Error:
+                    pass
+
+async def track_signals(ku: KucoinClient, cache: CandleCache, tf: str):
+    # Advance open signals over the trigger_tf bars that closed since the
+    # last check: from the cache when it reaches back far enough, else REST
+    history = STATE.get("signal_store")
+    if history is None:
+        return
+    step = TF_MS[tf]
+    for sym in history.open_symbols():
         try:
-            df5  = await fetch_df(ku, sym, tf=cfg["timeframes"]["trigger_tf"], opts=opts)
-            df15 = await fetch_df(ku, sym, tf=cfg["timeframes"]["setup_tf"],  opts=opts)
-            df1h = await fetch_df(ku, sym, tf=cfg["timeframes"]["bias_tf"],   opts=opts)
-            if df5.empty or df15.empty or df1h.empty:
-                continue
-
-            res = should_signal(df1h, df15, df5, cfg, opts)
-            if res.get("ok"):
-                confirms = int(res.get("confirms", len(res.get("reasons", []))))
-                if confirms < max(3, min_conf):
-                    continue
+            since = history.oldest_check(sym)
+            bars = cache.bars(sym, tf) if cache is not None else np.empty((0, 6))
+            if len(bars) == 0 or bars[0, 0] > since + step:
+                bars = await ku.fetch_candles(sym, tf=tf, limit=1000, start_time=since + step)
+            history.update(sym, bars)
+        except Exception as e:
+            SYMBOL_ERRORS.inc(sym, type(e).__name__)
+
+async def scan_once(tg: TelegramNotifier, ku: KucoinClient, cfg: Dict[str, Any], opts: Dict[str, Any], cache: CandleCache = None, engine: IndicatorEngine = None, universe: SymbolUniverse = None, pool: ComputePool = None,
+                    tracker: DirtyTracker = None, closed_before: int = None):
+    symbols = await universe.get() if universe is not None else FIXED_SYMBOLS
+    STATE["symbols"] = symbols[:]
 
-                spread_bps = None
-                if bool(opts.get("use_level1_spread", False)):
-                    try:
-                        lvl1 = await ku.fetch_level1(sym)
-                        best_ask = float(lvl1.get("bestAsk", 0)); best_bid = float(lvl1.get("bestBid", 0))
-                        if best_ask > 0 and best_bid > 0:
-                            spread_bps = int(((best_ask - best_bid) / best_bid) * 10000)
-                    except Exception:
-                        spread_bps = None
-
-                entry = float(res["entry"])
-                adjusted_tps = adjust_tps(entry, cfg["exits"]["tp_levels_pct"], opts, spread_bps)
-
-                now = time.time()
-                last = STATE["last_signal_ts"].get(sym, 0)
-                last_confirms = STATE["last_confirms"].get(sym, 0)
-
-                if now - last >= cooldown or confirms > last_confirms:
-                    msg = format_signal(sym, res, confirms, adjusted_tps)
-                    await tg.send(msg)
-                    STATE["last_signal_ts"][sym] = now
-                    STATE["last_confirms"][sym] = confirms
-                    STATE["signals_sent"] += 1
-        except Exception:
-            continue
+    # bounded concurrency; 1 scans symbol by symbol
+    sem = asyncio.Semaphore(max(1, int(opts.get("scan_concurrency", 8))))
+    pending: List[str] = []
+    batch = RuleBatch(symbols, opts) if pool is None and bool(opts.get("batch_rules", False)) else None
+
+    async def one(sym: str):
+        t_queued = time.perf_counter()
+        async with sem:
+            t_sym = time.perf_counter()
+            span = RECORDER.begin(t_sym - t_queued)
+            why = None
+            try:
+                res = await scan_symbol(sym, tg, ku, cfg, opts, cache, engine, pool=pool, tracker=tracker, closed_before=closed_before, batch=batch)
+                why = res.get("why") or "ok"
+                if why == "close pending":
+                    pending.append(sym)
+                    return
+            except Exception as e:
+                why = f"error: {type(e).__name__}"
+                SYMBOL_ERRORS.inc(sym, type(e).__name__)
+                if tracker is not None:
+                    tracker.forget(sym)
+            finally:
+                RECORDER.end(sym, span, time.perf_counter() - t_sym, why)
+            FEED.scan_step()
+
+    t = time.perf_counter()
+    FEED.scan_start(symbols)
+    RECORDER.cycle_start(len(symbols))
+    PROFILER.cycle_start()
+    await asyncio.gather(*(one(sym) for sym in symbols))
+    # the exchange can publish a closed bar a moment late: retry just those
+    for _ in range(CLOSE_RETRIES):
+        if not pending:
+            break
+        await asyncio.sleep(1)
+        retry, pending[:] = pending[:], []
+        await asyncio.gather(*(one(sym) for sym in retry))
+    if batch is not None:
+        t_rules = time.perf_counter()
+        results = batch.evaluate(cfg, opts)
+        STAGE_SECONDS.observe(time.perf_counter() - t_rules, "rules", "batch")
+        for sym in symbols:
+            if batch.filled[batch.index[sym]]:
+                FEED.symbol(sym, results[sym])
+                try:
+                    await notify_signal(sym, results[sym], tg, ku, cfg, opts)
+                except Exception as e:
+                    SYMBOL_ERRORS.inc(sym, type(e).__name__)
+    elapsed = time.perf_counter() - t
+    SCAN_SECONDS.observe(elapsed)
+    FEED.scan_end(elapsed)
+    PROFILER.cycle_end()
+    reason = RECORDER.cycle_end(elapsed)
+    if reason:
+        await RECORDER.dump(reason)
+
+def swap_options(opts: Dict[str, Any], ku: KucoinClient, universe: SymbolUniverse = None, tracker: DirtyTracker = None, sched: CloseScheduler = None) -> Dict[str, Any]:
+    # Between passes: take the current options snapshot and apply what can
+    # change live. Indicator lengths need nothing here: IndicatorEngine keys
+    # each (symbol, tf) state by its parameters and rebuilds just the states
+    # whose parameters changed, from the bars already in the cache.
+    new = OPTIONS.get()
+    if new is opts:
+        return opts
+    changed = changed_keys(opts, new)
+    if not changed:
+        return new
+    if "min_confirms" in changed and new.get("min_confirms") in (3, 4, 5):
+        STATE["runtime"]["min_confirms"] = int(new["min_confirms"])
+    if "binance_weight_limit_1m" in changed:
+        ku.weight_limit = int(new.get("binance_weight_limit_1m", 6000))
+    if universe is not None and changed & UNIVERSE_KEYS:
+        universe.configure(new)
+    if sched is not None and "close_grace_seconds" in changed:
+        sched.grace = float(new.get("close_grace_seconds", 1.5))
+    if tracker is not None:
+        # same candles, different thresholds: evaluate everything once
+        tracker.clear()
+    STATE["restart_required"] = OPTIONS.restart_required(new)
+    STATE["options_version"] = OPTIONS.version
+    return new
 
 async def worker_loop():
-    opts = get_addon_options()
+    opts = OPTIONS.get()
+    STATE["options_version"] = OPTIONS.version
     cfg = load_cfg()
     STATE["cfg"] = cfg
     def_val = int(opts.get("min_confirms", 3))
     STATE["runtime"]["min_confirms"] = load_runtime_min_confirms(def_val)
 
-    tg = TelegramNotifier(opts.get("telegram_token",""), opts.get("telegram_chat_id",""))
-    ku = KucoinClient()
+    tg = get_notifier(opts)
+    RECORDER.configure(int(opts.get("flight_cycles", 5)), float(opts.get("scan_budget_seconds", 45)))
+    ku = KucoinClient(weight_limit=int(opts.get("binance_weight_limit_1m", 6000)),
+                      base_url=opts.get("binance_rest_url") or BN_PUBLIC)
+    metrics.USED_WEIGHT.set_function(lambda: ku.used_weight)
+    metrics.WEIGHT_LIMIT.set_function(lambda: ku.weight_limit * ku.weight_budget)
+    metrics.BLOCKED_SECONDS.set_function(lambda: max(0.0, ku._blocked_until - time.time()))
+    tfs = cfg["timeframes"]
+    derive = {tfs["setup_tf"]: tfs["trigger_tf"], tfs["bias_tf"]: tfs["trigger_tf"]} if bool(opts.get("derive_higher_tfs", True)) else None
+    store = None
+    if bool(opts.get("candle_store", True)):
+        try:
+            store = CandleStore(STORE_DIR)
+        except OSError:
+            store = None
+    cache = CandleCache(ku, derive=derive, store=store)
+    if bool(opts.get("signal_history", True)):
+        try:
+            STATE["signal_store"] = SignalStore(SIGNALS_DB, step_ms=TF_MS[tfs["trigger_tf"]])
+        except (sqlite3.Error, OSError):
+            STATE["signal_store"] = None
+    engine = make_engine(opts, cache.history)
+    universe = None
+    if bool(opts.get("dynamic_universe", False)):
+        universe = SymbolUniverse(ku, opts)
+
+        def on_universe_change(added, removed):
+            # entering symbols are seeded lazily by their first refresh
+            for sym in removed:
+                cache.drop(sym)
+                if engine is not None:
+                    engine.drop(sym)
+        universe.listeners.append(on_universe_change)
+    sharded = str(opts.get("shard_mode", "off")).lower() == "coordinator"
+    pool = None
+    workers = int(opts.get("compute_workers", 0))
+    if workers < 0:
+        workers = os.cpu_count() or 1
+    if workers > 0 and not sharded:
+        # stateless recompute in the pool replaces the in-loop engine
+        pool = ComputePool(workers)
+        await pool.start()
 
     await tg.send("✅ Binance Spot Signal Bot запущен")
 
+    STATE["scan_mode"] = "coordinator" if sharded else str(opts.get("data_source", "rest")).lower()
+    if sharded:
+        await coordinator_loop(tg, ku, cfg, opts, cache, universe)
+        return
+
+    if str(opts.get("data_source", "rest")).lower() == "ws":
+        await stream_loop(tg, ku, cfg, opts, cache, engine, universe, pool)
+        return
+
+    if str(opts.get("schedule", "interval")).lower() == "close":
+        # one pass right after each trigger_tf close; unchanged symbols are skipped
+        sched = CloseScheduler(ku, tfs["trigger_tf"], grace=float(opts.get("close_grace_seconds", 1.5)))
+        tracker = DirtyTracker()
+        while True:
+            try:
+                boundary = await sched.wait_close()
+                opts = swap_options(opts, ku, universe, tracker, sched)
+                tg = get_notifier(opts)
+                await scan_once(tg, ku, cfg, opts, cache, engine, universe, pool, tracker, boundary)
+                await track_signals(ku, cache, tfs["trigger_tf"])
+            except Exception as e:
+                loop_error("scan", e)
+                await asyncio.sleep(10)
+
     while True:
         try:
-            await scan_once(tg, ku, cfg, opts)
+            opts = swap_options(opts, ku, universe)
+            tg = get_notifier(opts)
+            await scan_once(tg, ku, cfg, opts, cache, engine, universe, pool)
+            await track_signals(ku, cache, tfs["trigger_tf"])
             await asyncio.sleep(60)
-        except Exception:
+        except Exception as e:
+            loop_error("scan", e)
             await asyncio.sleep(10)
 
+async def coordinator_loop(tg: TelegramNotifier, ku: KucoinClient, cfg: Dict[str, Any], opts: Dict[str, Any], cache: CandleCache, universe: SymbolUniverse = None):
+    # Shard workers (shard.py) scan their part of the universe and post
+    # results to /api/shard/results; cooldowns, Telegram and the signal
+    # history stay here
+    coord = ShardCoordinator(timeout=float(opts.get("shard_timeout_seconds", 60)))
+    STATE["shards"] = ctx = {"coord": coord, "secret": str(opts.get("shard_secret", "")), "tg": tg, "ku": ku, "cfg": cfg, "opts": opts}
+    tfs = cfg["timeframes"]
+    while True:
+        try:
+            opts = ctx["opts"] = swap_options(ctx["opts"], ku, universe)
+            ctx["tg"] = get_notifier(opts)
+            symbols = await universe.get() if universe is not None else FIXED_SYMBOLS
+            coord.symbols = symbols[:]
+            STATE["symbols"] = symbols[:]
+            await track_signals(ku, cache, tfs["trigger_tf"])
+        except Exception as e:
+            loop_error("coordinator", e)
+        await asyncio.sleep(60)
+
+async def stream_loop(tg: TelegramNotifier, ku: KucoinClient, cfg: Dict[str, Any], opts: Dict[str, Any], cache: CandleCache, engine: IndicatorEngine = None, universe: SymbolUniverse = None, pool: ComputePool = None):
+    # Rules run as soon as a trigger_tf candle closes on the stream
+    symbols = await universe.get() if universe is not None else FIXED_SYMBOLS
+    STATE["symbols"] = symbols[:]
+    tfs = cfg["timeframes"]
+    stream = None
+
+    async def on_close(sym: str):
+        try:
+            await scan_symbol(sym, tg, ku, cfg, opts, cache, engine, stream, pool)
+        except Exception as e:
+            SYMBOL_ERRORS.inc(sym, type(e).__name__)
+
+    # derived timeframes come from the streamed trigger_tf bars
+    stream_tfs = [tfs["trigger_tf"]] + [tf for tf in (tfs["setup_tf"], tfs["bias_tf"]) if tf not in cache.derive]
+    stream = BinanceStream(ku, cache, symbols, stream_tfs, tfs["trigger_tf"],
+                           on_close, ws_url=opts.get("binance_ws_url") or BN_WS,
+                           workers=int(opts.get("scan_concurrency", 8)))
+
+    async def follow_universe():
+        while True:
+            await asyncio.sleep(60)
+            try:
+                current = await universe.get()
+                if current != stream.symbols:
+                    await stream.set_symbols(current)
+                    STATE["symbols"] = current[:]
+            except Exception as e:
+                loop_error("universe", e)
+
+    async def follow_signals():
+        nonlocal opts, tg
+        while True:
+            await asyncio.sleep(60)
+            try:
+                # on_close reads opts/tg from here, so a swap applies to the next close
+                opts = swap_options(opts, ku, universe)
+                tg = get_notifier(opts)
+                await track_signals(ku, cache, tfs["trigger_tf"])
+            except Exception as e:
+                loop_error("signals", e)
+
+    if universe is not None:
+        asyncio.create_task(follow_universe())
+    asyncio.create_task(follow_signals())
+    await stream.run()
+
+async def handle_command(tg: TelegramNotifier, opts: Dict[str, Any], text: str):
+    low = text.lower().strip()
+    if low == "/ping":
+        await tg.send("pong")
+    elif low == "/status":
+        tracked = len(STATE.get("symbols", []))
+        sent = STATE.get("signals_sent", 0)
+        uptime = int(time.time() - STATE.get("started_ts", time.time()))
+        await tg.send(
+            "📊 Status\n"
+            f"Tracked: {tracked}\nSignals sent: {sent}\nUptime: {uptime}s\n"
+            f"min_confirms: {STATE['runtime']['min_confirms']}\n"
+            f"EMA: {opts.get('ema_fast',20)}/{opts.get('ema_mid',50)}/{opts.get('ema_slow',200)}; "
+            f"RSI: {opts.get('rsi_length',14)}; MACD: {opts.get('macd_fast',12)}/{opts.get('macd_slow',26)}/{opts.get('macd_signal',9)}; "
+            f"RVOL15m_min: {opts.get('rvol15m_min',1.6)}"
+        )
+    elif low.startswith("/min"):
+        m = re.findall(r"/min\s+(\d+)", low)
+        if m:
+            val = int(m[0])
+            if val in (3,4,5):
+                STATE["runtime"]["min_confirms"] = val
+                save_runtime_min_confirms(val)
+                await tg.send(f"✅ min_confirms установлен: {val}")
+            else:
+                await tg.send("Укажи 3, 4 или 5: /min 4")
+        else:
+            await tg.send("Использование: /min 3|4|5")
+
+async def handle_update(tg: TelegramNotifier, opts: Dict[str, Any], upd: Dict[str, Any]):
+    text = tg.parse_command(upd)
+    if text:
+        await handle_command(tg, opts, text)
+
+WEBHOOK_PATH = "/telegram/webhook"
+WEBHOOK_TASKS = set()
+
 async def commands_loop():
-    opts = get_addon_options()
-    tg = TelegramNotifier(opts.get("telegram_token",""), opts.get("telegram_chat_id",""))
+    opts = OPTIONS.get()
+    tg = get_notifier(opts)
+    base_url = str(opts.get("telegram_webhook_url", "") or "").strip().rstrip("/")
+    if base_url:
+        # webhook mode: Telegram pushes updates to telegram_webhook() below
+        secret = str(opts.get("telegram_webhook_secret", "") or "") or secrets.token_urlsafe(32)
+        STATE["webhook"] = {"tg": tg, "secret": secret}
+        if await tg.set_webhook(base_url + WEBHOOK_PATH, secret):
+            return
+        STATE.pop("webhook", None)
+    # polling fallback; a webhook left over from an earlier run blocks getUpdates
+    await tg.delete_webhook()
     while True:
+        t = time.monotonic()
         try:
-            updates = await tg.get_updates()
-            for upd in updates:
-                text = tg.parse_command(upd)
-                if not text:
-                    continue
-                low = text.lower().strip()
-                if low == "/ping":
-                    await tg.send("pong")
-                elif low == "/status":
-                    tracked = len(STATE.get("symbols", []))
-                    sent = STATE.get("signals_sent", 0)
-                    uptime = int(time.time() - STATE.get("started_ts", time.time()))
-                    await tg.send(
-                        "📊 Status\n"
-                        f"Tracked: {tracked}\nSignals sent: {sent}\nUptime: {uptime}s\n"
-                        f"min_confirms: {STATE['runtime']['min_confirms']}\n"
-                        f"EMA: {opts.get('ema_fast',20)}/{opts.get('ema_mid',50)}/{opts.get('ema_slow',200)}; "
-                        f"RSI: {opts.get('rsi_length',14)}; MACD: {opts.get('macd_fast',12)}/{opts.get('macd_slow',26)}/{opts.get('macd_signal',9)}; "
-                        f"RVOL15m_min: {opts.get('rvol15m_min',1.6)}"
-                    )
-                elif low.startswith("/min"):
-                    m = re.findall(r"/min\s+(\d+)", low)
-                    if m:
-                        val = int(m[0])
-                        if val in (3,4,5):
-                            STATE["runtime"]["min_confirms"] = val
-                            save_runtime_min_confirms(val)
-                            await tg.send(f"✅ min_confirms установлен: {val}")
-                        else:
-                            await tg.send("Укажи 3, 4 или 5: /min 4")
-                    else:
-                        await tg.send("Использование: /min 3|4|5")
-        except Exception:
-            pass
-        await asyncio.sleep(5)
+            for upd in await tg.get_updates():
+                await handle_update(tg, OPTIONS.get(), upd)
+        except Exception as e:
+            loop_error("commands", e)
+        # getUpdates long-polls; only back off when it returned at once (error)
+        if time.monotonic() - t < 1:
+            await asyncio.sleep(5)
 
 from fastapi import FastAPI
 app = FastAPI()
 
 
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response, JSONResponse, StreamingResponse
 from fastapi import Request
 
-def read_json(path, default):
-    try:
-        if os.path.exists(path):
-            with open(path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-    except Exception:
-        pass
-    return default
-
 def merged_options():
-    opts = get_addon_options()
-    user = read_json('/data/user_config.json', {})
-    merged = opts.copy()
-    merged.update(user)
-    return merged
+    # Supervisor options with the UI overrides on top (see OptionsStore)
+    return OPTIONS.get()
 
 @app.get("/", response_class=HTMLResponse)
 def ui_root():
@@ -325,8 +566,7 @@ async def api_set_options(req: Request):
 
 @app.get("/api/ping")
 async def api_ping():
-    tg_opts = merged_options()
-    tg = TelegramNotifier(tg_opts.get("telegram_token",""), tg_opts.get("telegram_chat_id",""))
+    tg = get_notifier(merged_options())
     await tg.send("pong")
     return {"ok": True}
 
@@ -337,8 +577,7 @@ async def api_set_min(val: int):
     STATE['runtime']['min_confirms'] = val
     save_runtime_min_confirms(val)
     await persist_options({'min_confirms': val})
-    tg_opts = merged_options()
-    tg = TelegramNotifier(tg_opts.get('telegram_token',''), tg_opts.get('telegram_chat_id',''))
+    tg = get_notifier(merged_options())
     await tg.send(f"✅ min_confirms set to {val} (via UI)")
     return {"ok": True, "min": val}
 
@@ -346,7 +585,134 @@ async def api_set_min(val: int):
 async def on_startup():
     asyncio.create_task(worker_loop())
     asyncio.create_task(commands_loop())
+    asyncio.create_task(metrics.monitor_loop_lag())
+    asyncio.create_task(FEED.run())
 
 @app.get("/health")
 def health():
-    return {"ok": True, "signals_sent": STATE["signals_sent"], "tracked_symbols": len(STATE.get("symbols", [])), "min_confirms": STATE["runtime"]["min_confirms"]}
+    return {"ok": True, "signals_sent": STATE["signals_sent"], "tracked_symbols": len(STATE.get("symbols", [])), "min_confirms": STATE["runtime"]["min_confirms"],
+            "options_version": STATE.get("options_version", 0), "restart_required": STATE.get("restart_required", [])}
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    # on the loop, so no scan adds a label set while render() walks them
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.post(WEBHOOK_PATH)
+async def telegram_webhook(req: Request):
+    hook = STATE.get("webhook")
+    if not hook:
+        return JSONResponse({"ok": False}, status_code=503)
+    token = req.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+    if not hmac.compare_digest(token.encode(), hook["secret"].encode()):
+        return JSONResponse({"ok": False}, status_code=403)
+    try:
+        upd = await req.json()
+    except Exception:
+        return {"ok": True}
+    tg = hook["tg"]
+    if not tg.seen_update(upd):
+        # answer Telegram right away; the reply goes out through sendMessage
+        task = asyncio.create_task(handle_update(tg, OPTIONS.get(), upd))
+        WEBHOOK_TASKS.add(task)
+        task.add_done_callback(WEBHOOK_TASKS.discard)
+    return {"ok": True}
+
+def shard_context(req: Request):
+    # None when the request may not talk to the coordinator
+    ctx = STATE.get("shards")
+    if not ctx or not ctx["secret"]:
+        return None
+    token = req.headers.get(SECRET_HEADER, "")
+    if not hmac.compare_digest(token.encode(), ctx["secret"].encode()):
+        return None
+    return ctx
+
+@app.get("/api/shard/assignment")
+async def api_shard_assignment(shard: str, req: Request):
+    # async like api_shard_results: ring changes and lookups stay on the loop
+    ctx = shard_context(req)
+    if ctx is None:
+        return JSONResponse({"ok": False}, status_code=403)
+    coord = ctx["coord"]
+    symbols = coord.heartbeat(shard)
+    # shards never see the Telegram credentials
+    opts = {k: v for k, v in ctx["opts"].items() if not k.startswith(("telegram_", "shard_"))}
+    return {"version": coord.version, "symbols": symbols, "cfg": ctx["cfg"], "opts": opts,
+            "heartbeat": heartbeat_seconds(coord.timeout)}
+
+@app.post("/api/shard/results")
+async def api_shard_results(req: Request):
+    ctx = shard_context(req)
+    if ctx is None:
+        return JSONResponse({"ok": False}, status_code=403)
+    data = await req.json()
+    shard, coord = data.get("shard", ""), ctx["coord"]
+    accepted = 0
+    for item in data.get("items", []):
+        sym, res = item.get("symbol"), item.get("res") or {}
+        if not coord.owns(shard, sym):
+            # the symbol moved after a ring change; its new owner reports it
+            SYMBOLS_SKIPPED.inc("not owner")
+            continue
+        FEED.symbol(sym, res)
+        try:
+            await notify_signal(sym, res, ctx["tg"], ctx["ku"], ctx["cfg"], ctx["opts"])
+            accepted += 1
+        except Exception as e:
+            SYMBOL_ERRORS.inc(sym, type(e).__name__)
+    return {"ok": True, "accepted": accepted}
+
+@app.get("/api/shards")
+async def api_shards():
+    ctx = STATE.get("shards")
+    return ctx["coord"].status() if ctx else {"version": 0, "symbols": 0, "shards": {}}
+
+@app.get("/api/signals")
+def api_signals(symbol: str = None, status: str = None, before_id: int = None, limit: int = 50):
+    history = STATE.get("signal_store")
+    if history is None:
+        return {"items": [], "next_before_id": None}
+    return history.page(symbol=symbol, status=status, before_id=before_id, limit=limit)
+
+@app.get("/api/signals/stats")
+def api_signal_stats(by: str = "symbol"):
+    history = STATE.get("signal_store")
+    if history is None:
+        return {"by": by, "rows": []}
+    return {"by": by, "rows": history.stats(by)}
+
+@app.get("/api/stream")
+async def api_stream():
+    # Server-Sent Events: a snapshot, then deltas (see feed.LiveFeed)
+    return StreamingResponse(FEED.events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/api/admin/profile")
+async def api_profile_start(cycles: int = 1, interval_ms: float = 5.0, seconds: float = 0.0):
+    # async on purpose: arm() records the calling thread, i.e. the event loop
+    if seconds <= 0 and STATE.get("scan_mode", "rest") != "rest":
+        # ws and coordinator mode have no scan cycles to count
+        return JSONResponse(dict(PROFILER.status(), ok=False, error="no scan cycles in this mode, pass seconds"), status_code=400)
+    if not PROFILER.arm(cycles, interval_ms / 1000.0, seconds):
+        return JSONResponse(dict(PROFILER.status(), ok=False), status_code=409)
+    return dict(PROFILER.status(), ok=True)
+
+@app.get("/api/admin/profile")
+def api_profile_result(format: str = "folded"):
+    # folded: flamegraph.pl / speedscope input; tree: d3-flame-graph JSON
+    if PROFILER.state != "done":
+        return JSONResponse(PROFILER.status(), status_code=202)
+    if format == "tree":
+        return PROFILER.tree()
+    return Response(content=PROFILER.folded(), media_type="text/plain")
+
+@app.get("/api/admin/flight")
+async def api_flight():
+    # the recorder is only touched on the loop
+    return RECORDER.snapshot()
+
+@app.post("/api/admin/flight/dump")
+async def api_flight_dump():
+    path = await RECORDER.dump("manual")
+    return {"ok": path is not None, "path": path}
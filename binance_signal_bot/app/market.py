@@ -0,0 +1,188 @@
+from typing import Dict, Optional, Sequence
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+NAN = float("nan")
+
+class Ring:
+    # Fixed-capacity ring of bars over preallocated arrays. Every row is
+    # written twice (slot i and i + capacity), so the newest n rows are
+    # always one contiguous slice and reads are views, never copies.
+    # `data` may be float32; `times` (ms) stay int64.
+    __slots__ = ("cap", "head", "count", "times", "data")
+
+    def __init__(self, capacity: int, ncols: int, dtype=np.float64):
+        self.cap = capacity
+        self.head = 0
+        self.count = 0
+        self.times = np.zeros(2 * capacity, dtype=np.int64)
+        self.data = np.full((2 * capacity, ncols), np.nan, dtype=dtype)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _write(self, slot: int, t: int, vals: Sequence[float]):
+        for s in (slot, slot + self.cap):
+            self.times[s] = t
+            self.data[s] = vals
+
+    def push(self, t: int, vals: Sequence[float]) -> Optional[tuple]:
+        # Appends a row; returns the evicted oldest row when full (for unpush)
+        evicted = None
+        if self.count == self.cap:
+            h = self.head
+            evicted = (int(self.times[h]), self.data[h].copy())
+            self._write(h, t, vals)
+            self.head = (h + 1) % self.cap
+        else:
+            self._write((self.head + self.count) % self.cap, t, vals)
+            self.count += 1
+        return evicted
+
+    def unpush(self, evicted: Optional[tuple]):
+        # undo the last push(); `evicted` is what that push returned
+        self.count -= 1
+        if evicted is not None:
+            self.head = (self.head - 1) % self.cap
+            self._write(self.head, *evicted)
+            self.count += 1
+
+    def last(self, n: int = None):
+        # (times, data) views of the newest n rows, oldest first
+        n = self.count if n is None else min(n, self.count)
+        lo, hi = self.head + self.count - n, self.head + self.count
+        return self.times[lo:hi], self.data[lo:hi]
+
+    @property
+    def nbytes(self) -> int:
+        return self.times.nbytes + self.data.nbytes
+
+class Window:
+    # Plain float64 ring (one copy per row) for the running-sum terms that
+    # span a longer window than the Ring rows: read by index, or copied out.
+    __slots__ = ("cap", "head", "count", "rows")
+
+    def __init__(self, capacity: int, ncols: int):
+        self.cap = capacity
+        self.head = 0
+        self.count = 0
+        self.rows = np.zeros((capacity, ncols), dtype=np.float64)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        # i < 0 counts from the newest row, as in a list
+        if i < 0:
+            i += self.count
+        return self.rows[(self.head + i) % self.cap]
+
+    def push(self, vals: Sequence[float]) -> Optional[np.ndarray]:
+        evicted = None
+        if self.count == self.cap:
+            evicted = self.rows[self.head].copy()
+            self.rows[self.head] = vals
+            self.head = (self.head + 1) % self.cap
+        else:
+            self.rows[(self.head + self.count) % self.cap] = vals
+            self.count += 1
+        return evicted
+
+    def unpush(self, evicted: Optional[np.ndarray]):
+        self.count -= 1
+        if evicted is not None:
+            self.head = (self.head - 1) % self.cap
+            self.rows[self.head] = evicted
+            self.count += 1
+
+    def last(self, n: int) -> np.ndarray:
+        # copy of the newest n rows, oldest first
+        n = min(n, self.count)
+        return self.rows[(self.head + np.arange(self.count - n, self.count)) % self.cap]
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows.nbytes
+
+class Column(np.ndarray):
+    # The part of the pandas Series API rules.py uses, on a plain array view
+    @property
+    def iloc(self) -> "Column":
+        return self
+
+    def to_numpy(self, dtype=None) -> np.ndarray:
+        return np.asarray(self, dtype=dtype)
+
+    def diff(self) -> "Column":
+        a = np.asarray(self, dtype=np.float64)
+        out = np.empty(len(a))
+        if len(a):
+            out[0] = NAN
+            np.subtract(a[1:], a[:-1], out=out[1:])
+        return out.view(Column)
+
+    def fillna(self, value: float) -> "Column":
+        a = np.asarray(self)
+        return np.where(np.isnan(a), value, a).view(Column)
+
+    def rolling(self, window: int) -> "_Rolling":
+        return _Rolling(np.asarray(self, dtype=np.float64), window)
+
+    # NaN-skipping, like pandas
+    def max(self, *args, **kwargs):
+        a = np.asarray(self)
+        a = a[~np.isnan(a)]
+        return a.max() if len(a) else NAN
+
+    def min(self, *args, **kwargs):
+        a = np.asarray(self)
+        a = a[~np.isnan(a)]
+        return a.min() if len(a) else NAN
+
+class _Rolling:
+    __slots__ = ("a", "window")
+
+    def __init__(self, a: np.ndarray, window: int):
+        self.a = a
+        self.window = window
+
+    def mean(self) -> Column:
+        out = np.full(len(self.a), NAN)
+        if len(self.a) >= self.window:
+            out[self.window - 1:] = sliding_window_view(self.a, self.window).mean(axis=1)
+        return out.view(Column)
+
+class MarketFrame:
+    # Read-only stand-in for the indicator DataFrame the rules take: columns
+    # are views into an IndicatorEngine ring, so a scan allocates almost
+    # nothing per symbol. "time" is open time in ms; `derived` holds the
+    # columns computed per frame (EMAs, VWAP), like IndicatorEngine.frame().
+    __slots__ = ("_cols", "_times", "_data", "_derived")
+
+    def __init__(self, cols: Dict[str, int], times: np.ndarray, data: np.ndarray, derived: Dict[str, np.ndarray] = None):
+        self._cols = cols
+        self._times = times
+        self._data = data
+        self._derived = derived or {}
+
+    @property
+    def empty(self) -> bool:
+        return len(self._times) == 0
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+    @property
+    def columns(self):
+        return ["time"] + list(self._cols) + list(self._derived)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._cols or name in self._derived or name == "time"
+
+    def __getitem__(self, name: str) -> Column:
+        if name == "time":
+            return self._times.view(Column)
+        col = self._derived.get(name)
+        if col is not None:
+            return col.view(Column)
+        return self._data[:, self._cols[name]].view(Column)
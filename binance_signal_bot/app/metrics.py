@@ -0,0 +1,146 @@
+import asyncio, bisect, time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Minimal Prometheus text exposition (format 0.0.4). Observations are a dict
+# lookup plus a bisect, so they are cheap enough for the per-symbol hot path.
+# Nothing is locked: observe() and render() are meant to run on the event
+# loop thread; render() still iterates over copies so a label set added
+# from another thread cannot break a scrape.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REGISTRY: List["_Metric"] = []
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _num(v: float) -> str:
+    return repr(float(v)) if v == v else "NaN"
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, doc, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, n: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + n
+
+    def render(self) -> List[str]:
+        out = self.header()
+        for k, v in list(self._values.items()):
+            out.append(f"{self.name}{_labels(self.labelnames, k)} {_num(v)}")
+        return out
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, doc, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._fn: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, *labels: str):
+        self._values[labels] = value
+
+    def set_function(self, fn: Callable[[], float]):
+        # read at scrape time, so the hot path pays nothing
+        self._fn = fn
+
+    def render(self) -> List[str]:
+        out = self.header()
+        if self._fn is not None:
+            try:
+                out.append(f"{self.name} {_num(self._fn())}")
+            except Exception:
+                pass
+        for k, v in list(self._values.items()):
+            out.append(f"{self.name}{_labels(self.labelnames, k)} {_num(v)}")
+        return out
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        # callbacks (value, labels) run on every observation, e.g. the flight recorder
+        self.listeners: List[Callable[[float, Tuple[str, ...]], None]] = []
+
+    def observe(self, value: float, *labels: str):
+        s = self._series.get(labels)
+        if s is None:
+            s = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        s[bisect.bisect_left(self.buckets, value)] += 1
+        s[-1] += value
+        for fn in self.listeners:
+            fn(value, labels)
+
+    def render(self) -> List[str]:
+        out = self.header()
+        for k, s in list(self._series.items()):
+            s = s[:]
+            acc = 0
+            for b, c in zip(self.buckets, s):
+                acc += c
+                le = 'le="%s"' % b
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, k, le)} {acc}")
+            acc += s[len(self.buckets)]
+            le = 'le="+Inf"'
+            out.append(f"{self.name}_bucket{_labels(self.labelnames, k, le)} {acc}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, k)} {_num(s[-1])}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, k)} {acc}")
+        return out
+
+def render() -> str:
+    lines: List[str] = []
+    for m in REGISTRY:
+        lines += m.render()
+    return "\n".join(lines) + "\n"
+
+SCAN_SECONDS = Histogram("bot_scan_cycle_seconds", "Duration of a full scan over the symbol universe.",
+                         buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0))
+STAGE_SECONDS = Histogram("bot_stage_seconds", "Per-symbol stage latency (fetch, parse, indicators, rules, compute, telegram).",
+                          ("stage", "tf"))
+SYMBOL_ERRORS = Counter("bot_symbol_errors_total", "Exceptions raised while scanning a symbol.", ("symbol", "error"))
+LOOP_ERRORS = Counter("bot_loop_errors_total", "Exceptions caught by the scan and background loops.", ("loop", "error"))
+SYMBOLS_SKIPPED = Counter("bot_symbols_skipped_total", "Symbol evaluations skipped by the scheduler.", ("reason",))
+SIGNALS_SENT = Counter("bot_signals_sent_total", "Signals queued for Telegram.")
+USED_WEIGHT = Gauge("bot_binance_used_weight_1m", "Binance request weight used in the current minute.")
+WEIGHT_LIMIT = Gauge("bot_binance_weight_budget_1m", "Request weight the client allows itself per minute.")
+BLOCKED_SECONDS = Gauge("bot_binance_blocked_seconds", "Seconds left on a Binance 418/429 back-off.")
+LOOP_LAG = Histogram("bot_event_loop_lag_seconds", "How late the event loop wakes a periodic sleeper.",
+                     buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+LOOP_LAG_LAST = Gauge("bot_event_loop_lag_last_seconds", "Most recent event loop lag sample.")
+
+async def monitor_loop_lag(interval: float = 0.5):
+    # A sleeper that wakes late means something blocked the loop for that long
+    while True:
+        t = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - t - interval)
+        LOOP_LAG.observe(lag)
+        LOOP_LAG_LAST.set(lag)
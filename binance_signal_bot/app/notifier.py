@@ -1,43 +1,155 @@
-import asyncio
+import asyncio, time
+from collections import deque
 import httpx
 from typing import Optional, List, Dict, Any
+from metrics import STAGE_SECONDS
+
+# Telegram Bot API limits: about one message per second to the same chat and
+# 30 per second overall; messages are capped at 4096 characters
+PER_CHAT_INTERVAL = 1.0
+GLOBAL_PER_SEC = 30
+MAX_TEXT = 4096
+COALESCE_WINDOW = 1.0
 
 class TelegramNotifier:
-    def __init__(self, token: str, chat_id: str):
+    def __init__(self, token: str, chat_id: str, coalesce: bool = False):
         self.token = token.strip()
         self.chat_id = str(chat_id).strip() if chat_id is not None else ""
         self.base = f"https://api.telegram.org/bot{self.token}" if self.token else None
         self._last_update_id = 0
+        # one pooled client for the notifier's lifetime (keep-alive, no new TLS per call)
+        self._http: Optional[httpx.AsyncClient] = None
+        # queued delivery so a slow Telegram API never stalls the scan
+        self.coalesce = coalesce
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._chat_last: Dict[str, float] = {}
+        self._sent_ts: deque = deque()
 
-    async def send(self, text: str) -> Optional[dict]:
-        if not self.base or not self.chat_id:
-            return None
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(timeout=15, limits=httpx.Limits(max_keepalive_connections=4, max_connections=8))
+        return self._http
+
+    async def _throttle(self, chat_id: str):
+        while True:
+            now = time.monotonic()
+            while self._sent_ts and now - self._sent_ts[0] >= 1.0:
+                self._sent_ts.popleft()
+            wait = 0.0
+            if len(self._sent_ts) >= GLOBAL_PER_SEC:
+                wait = 1.0 - (now - self._sent_ts[0])
+            wait = max(wait, self._chat_last.get(chat_id, 0.0) + PER_CHAT_INTERVAL - now)
+            if wait <= 0:
+                self._sent_ts.append(now); self._chat_last[chat_id] = now
+                return
+            await asyncio.sleep(wait)
+
+    async def _post(self, text: str, chat_id: str, retries: int = 5) -> Optional[dict]:
         url = f"{self.base}/sendMessage"
-        payload = {"chat_id": self.chat_id, "text": text}
-        async with httpx.AsyncClient(timeout=10) as client:
-            r = await client.post(url, json=payload)
+        payload = {"chat_id": chat_id, "text": text}
+        while True:
+            await self._throttle(chat_id)
+            r = await self._client().post(url, json=payload)
             try:
-                return r.json()
+                data = r.json()
             except Exception:
                 return None
+            if r.status_code == 429 and retries > 0:
+                retries -= 1
+                retry_after = (data.get("parameters") or {}).get("retry_after", 1)
+                await asyncio.sleep(float(retry_after))
+                continue
+            return data
+
+    async def send(self, text: str) -> Optional[dict]:
+        if not self.base or not self.chat_id:
+            return None
+        t = time.perf_counter()
+        try:
+            return await self._post(text, self.chat_id)
+        except Exception:
+            return None
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - t, "telegram", "")
+
+    def enqueue(self, text: str):
+        # Fire-and-forget delivery through the background queue
+        if not self.base or not self.chat_id:
+            return
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._deliver())
+        self._queue.put_nowait(text)
+
+    async def _deliver(self):
+        while True:
+            text = await self._queue.get()
+            if self.coalesce:
+                # give the rest of the scan a moment, then merge whatever piled up
+                await asyncio.sleep(COALESCE_WINDOW)
+                while not self._queue.empty():
+                    nxt = self._queue.get_nowait()
+                    if len(text) + 2 + len(nxt) > MAX_TEXT:
+                        await self.send(text)
+                        text = nxt
+                    else:
+                        text = f"{text}\n\n{nxt}"
+            await self.send(text)
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+        if self._http is not None:
+            await self._http.aclose()
 
     async def get_updates(self) -> List[Dict[str, Any]]:
         if not self.base:
             return []
         params = {"timeout": 10, "offset": self._last_update_id + 1}
         url = f"{self.base}/getUpdates"
-        async with httpx.AsyncClient(timeout=15) as client:
-            try:
-                r = await client.get(url, params=params)
-                data = r.json()
-                if not data.get("ok"):
-                    return []
-                updates = data.get("result", [])
-                if updates:
-                    self._last_update_id = max(u.get("update_id", 0) for u in updates)
-                return updates
-            except Exception:
+        try:
+            r = await self._client().get(url, params=params, timeout=15)
+            data = r.json()
+            if not data.get("ok"):
                 return []
+            updates = data.get("result", [])
+            if updates:
+                self._last_update_id = max(u.get("update_id", 0) for u in updates)
+            return updates
+        except Exception:
+            return []
+
+    async def set_webhook(self, url: str, secret: str) -> bool:
+        # Telegram then POSTs updates to `url` with the secret in the
+        # X-Telegram-Bot-Api-Secret-Token header; getUpdates stops working
+        if not self.base:
+            return False
+        payload = {"url": url, "secret_token": secret, "allowed_updates": ["message", "edited_message"],
+                   "drop_pending_updates": False}
+        try:
+            r = await self._client().post(f"{self.base}/setWebhook", json=payload)
+            return bool(r.json().get("ok"))
+        except Exception:
+            return False
+
+    async def delete_webhook(self) -> bool:
+        if not self.base:
+            return False
+        try:
+            r = await self._client().post(f"{self.base}/deleteWebhook", json={"drop_pending_updates": False})
+            return bool(r.json().get("ok"))
+        except Exception:
+            return False
+
+    def seen_update(self, upd: Dict[str, Any]) -> bool:
+        # Telegram re-delivers an update until it gets a 2xx; ids only grow
+        uid = int(upd.get("update_id", 0))
+        if uid and uid <= self._last_update_id:
+            return True
+        self._last_update_id = max(self._last_update_id, uid)
+        return False
 
     @staticmethod
     def parse_command(upd: Dict[str, Any]) -> Optional[str]:
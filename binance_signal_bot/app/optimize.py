@@ -0,0 +1,222 @@
+# Parallel parameter sweep of the strategy options over local klines.
+#
+#   python optimize.py "data/*USDT-5m-2024-*.csv" --space space.json --workers 8 \
+#       --checkpoint sweep.jsonl --mode random --samples 500
+#
+# Files are grouped per symbol by the name prefix before the first "-"
+# (BTCUSDT-5m-2024-01.csv -> BTCUSDT). Each worker process loads the data once
+# and keeps backtest.Columns per symbol, so indicator columns shared by many
+# combinations (same RSI or MACD lengths under different thresholds) are
+# computed once per process. Combinations are ordered by their indicator
+# parameters before chunking so that chunks reuse the memo. Finished
+# combinations are appended to the checkpoint JSONL, and a rerun skips them.
+# The checkpoint's first line fingerprints the run (data files, --opts,
+# --horizon, config); a checkpoint from a different run is refused.
+import argparse, glob, hashlib, json, os, random, sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Any, List, Tuple
+import numpy as np
+from backtest import load_klines, load_cfg, prepare, rule_columns, simulate
+
+# Options that change an indicator column (everything else is a threshold)
+INDICATOR_KEYS = ("rsi_length", "macd_fast", "macd_slow", "macd_signal", "breakout_lookback_bars")
+
+# ema_fast/mid/slow are not listed: the rules read ema20/ema50/ema200 only
+DEFAULT_SPACE = {
+    "rsi_length": [14],
+    "macd_fast": [12], "macd_slow": [26], "macd_signal": [9],
+    "rvol15m_min": [1.2, 1.4, 1.6, 2.0],
+    "breakout_lookback_bars": [5, 10, 20],
+    "breakout_body_max_atr_mult": [1.2, 1.8, 2.5],
+    "ema200_5m_min_distance_pct": [0.0, 0.2, 0.5],
+    "tp_levels_pct": [[0.004, 0.008, 0.012], [0.006, 0.012, 0.02]],
+}
+
+_DATA: Dict[str, Tuple] = {}
+_CFG: Dict[str, Any] = {}
+_BASE: Dict[str, Any] = {}
+
+def group_files(patterns: List[str]) -> Dict[str, List[str]]:
+    paths = sorted(p for x in patterns for p in (glob.glob(x) or [x]))
+    groups: Dict[str, List[str]] = {}
+    for p in paths:
+        groups.setdefault(os.path.basename(p).split("-")[0].split(".")[0], []).append(p)
+    return groups
+
+def combo_id(params: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+def run_fingerprint(groups: Dict[str, List[str]], cfg_path: str, base_opts: Dict[str, Any], horizon_bars: int) -> Dict[str, Any]:
+    # everything besides the swept params that changes a result
+    files = []
+    for p in sorted(p for paths in groups.values() for p in paths):
+        st = os.stat(p)
+        files.append([os.path.abspath(p), st.st_size, st.st_mtime_ns])
+    with open(cfg_path, "rb") as f:
+        cfg_hash = hashlib.sha1(f.read()).hexdigest()
+    run = {"files": files, "base_opts": base_opts, "horizon": horizon_bars, "cfg": cfg_hash}
+    return {"fingerprint": hashlib.sha1(json.dumps(run, sort_keys=True).encode()).hexdigest()[:16], "run": run}
+
+def combos(space: Dict[str, List[Any]], mode: str, samples: int, seed: int) -> List[Dict[str, Any]]:
+    keys = sorted(space)
+    total = 1
+    for k in keys:
+        total *= len(space[k])
+    if mode == "grid" or samples >= total:
+        idx = range(total)
+    else:
+        idx = sorted(random.Random(seed).sample(range(total), samples))
+    out = []
+    for n in idx:
+        params = {}
+        for k in reversed(keys):
+            n, r = divmod(n, len(space[k]))
+            params[k] = space[k][r]
+        out.append({k: params[k] for k in keys})
+    # neighbours share indicator parameters, so a chunk hits the worker's memo
+    out.sort(key=lambda p: json.dumps([p.get(k) for k in INDICATOR_KEYS]))
+    return out
+
+def _init(groups: Dict[str, List[str]], cfg_path: str, base_opts: Dict[str, Any]):
+    _CFG.update(load_cfg(cfg_path))
+    _BASE.update(base_opts)
+    for sym, paths in groups.items():
+        c5, c15, c1h = prepare(load_klines(paths), cfg=_CFG)
+        _DATA[sym] = (c5, c15, c1h)
+
+def trade_returns(c5, trades: List[Dict[str, Any]], horizon_bars: int) -> np.ndarray:
+    # Exit at TP1, at the stop, or at the close after horizon_bars if neither hit
+    out = np.empty(len(trades))
+    for j, t in enumerate(trades):
+        entry = t["entry"]
+        if t["tp1"]:
+            px = t["tps"][0]
+        elif t["sl_hit"]:
+            px = t["sl"]
+        else:
+            i = int(np.searchsorted(c5.time, t["time"]))
+            px = float(c5.close[min(len(c5) - 1, i + horizon_bars)])
+        out[j] = px / entry - 1.0
+    return out
+
+def evaluate(params: Dict[str, Any], horizon_bars: int) -> Dict[str, Any]:
+    opts = dict(_BASE)
+    cfg = _CFG
+    for k, v in params.items():
+        if k == "tp_levels_pct":
+            cfg = dict(_CFG, exits=dict(_CFG["exits"], tp_levels_pct=list(v)))
+        else:
+            opts[k] = v
+    fee = 2 * float(opts.get("taker_fee_bps", 10)) / 10000.0
+    rets, tp1, sl, per_symbol = [], 0, 0, {}
+    for sym, (c5, c15, c1h) in _DATA.items():
+        cols = rule_columns(c5, c15, c1h, cfg, opts)
+        trades = simulate(c5, cols, cfg, opts, horizon_bars)
+        r = trade_returns(c5, trades, horizon_bars) - fee
+        rets.append(r)
+        tp1 += sum(t["tp1"] for t in trades); sl += sum(t["sl_hit"] for t in trades)
+        per_symbol[sym] = len(trades)
+    r = np.concatenate(rets) if rets else np.empty(0)
+    n = len(r)
+    return {"id": combo_id(params), "params": params, "signals": n,
+            "hit_rate": tp1 / n if n else 0.0, "sl_rate": sl / n if n else 0.0,
+            "expectancy_bps": float(r.mean() * 10000) if n else 0.0,
+            "total_bps": float(r.sum() * 10000), "per_symbol": per_symbol}
+
+def evaluate_chunk(chunk: List[Dict[str, Any]], horizon_bars: int) -> List[Dict[str, Any]]:
+    return [evaluate(p, horizon_bars) for p in chunk]
+
+def load_checkpoint(path: str, fingerprint: str) -> Dict[str, Dict[str, Any]]:
+    # None when the file holds results of another run (or has no header)
+    done = {}
+    if not path or not os.path.exists(path) or os.path.getsize(path) == 0:
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            header = json.loads(f.readline())
+        except ValueError:
+            return None
+        if not isinstance(header, dict) or header.get("fingerprint") != fingerprint:
+            return None
+        for line in f:
+            try:
+                rec = json.loads(line)
+                done[rec["id"]] = rec
+            except (ValueError, KeyError):
+                # torn last line from an interrupted run
+                continue
+    return done
+
+def rank(results: List[Dict[str, Any]], min_signals: int) -> List[Dict[str, Any]]:
+    ok = [r for r in results if r["signals"] >= min_signals]
+    return sorted(ok, key=lambda r: (r["expectancy_bps"], r["hit_rate"], r["signals"]), reverse=True)
+
+def main():
+    ap = argparse.ArgumentParser(description="Parallel sweep of strategy options over local 5m klines")
+    ap.add_argument("klines5", nargs="+", help="5m kline files, grouped per symbol by name prefix; globs allowed")
+    ap.add_argument("--space", help="JSON {option: [values...]}; tp_levels_pct takes lists")
+    ap.add_argument("--opts", help="base options JSON the sweep overrides")
+    ap.add_argument("--config", help="config.yaml")
+    ap.add_argument("--mode", choices=("grid", "random"), default="grid")
+    ap.add_argument("--samples", type=int, default=200, help="combinations drawn in random mode")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--chunk", type=int, default=8, help="combinations per task")
+    ap.add_argument("--horizon", type=int, default=288, help="bars to follow each signal")
+    ap.add_argument("--checkpoint", default="sweep.jsonl")
+    ap.add_argument("--min-signals", type=int, default=20)
+    ap.add_argument("--top", type=int, default=15)
+    a = ap.parse_args()
+
+    space = DEFAULT_SPACE
+    if a.space:
+        with open(a.space, "r", encoding="utf-8") as f:
+            space = json.load(f)
+    base_opts = {}
+    if a.opts:
+        with open(a.opts, "r", encoding="utf-8") as f:
+            base_opts = json.load(f)
+    groups = group_files(a.klines5)
+    cfg_path = a.config or os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.yaml")
+
+    todo_all = combos(space, a.mode, a.samples, a.seed)
+    fp = run_fingerprint(groups, cfg_path, base_opts, a.horizon)
+    done = load_checkpoint(a.checkpoint, fp["fingerprint"])
+    if done is None:
+        sys.exit(f"{a.checkpoint} was written by a run with other data, --opts, --horizon or config; "
+                 "pass another --checkpoint or delete it")
+    todo = [p for p in todo_all if combo_id(p) not in done]
+    print(f"{len(groups)} symbols, {len(todo_all)} combinations, {len(todo_all) - len(todo)} from checkpoint, {a.workers} workers")
+
+    results = [done[combo_id(p)] for p in todo_all if combo_id(p) in done]
+    if todo:
+        chunks = [todo[i:i + a.chunk] for i in range(0, len(todo), a.chunk)]
+        with ProcessPoolExecutor(max_workers=max(1, a.workers), initializer=_init,
+                                 initargs=(groups, cfg_path, base_opts)) as ex, \
+                open(a.checkpoint, "a", encoding="utf-8") as ck:
+            if ck.tell() == 0:
+                ck.write(json.dumps(fp) + "\n")
+            else:
+                with open(a.checkpoint, "rb") as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        # interrupted mid-line: start the next record on its own line
+                        ck.write("\n")
+            futs = [ex.submit(evaluate_chunk, c, a.horizon) for c in chunks]
+            for n, fut in enumerate(as_completed(futs), 1):
+                for rec in fut.result():
+                    ck.write(json.dumps(rec) + "\n")
+                    results.append(rec)
+                ck.flush()
+                print(f"\r{len(results)}/{len(todo_all)}", end="", flush=True)
+        print()
+
+    best = rank(results, a.min_signals)
+    print(f"{'exp bps':>8} {'hit':>6} {'sl':>6} {'signals':>8}  params")
+    for r in best[:a.top]:
+        print(f"{r['expectancy_bps']:>8.1f} {r['hit_rate']:>6.1%} {r['sl_rate']:>6.1%} {r['signals']:>8}  {json.dumps(r['params'])}")
+    if best:
+        print("best options:", json.dumps(best[0]["params"]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import json, os, threading, time
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+OPTIONS_PATH = "/data/options.json"        # written by the Supervisor
+USER_PATH = "/data/user_config.json"       # written by the web UI
+
+# Options whose change only takes effect after a restart (they pick the
+# loop, the process layout or the data path at startup)
+RESTART_KEYS = {"data_source", "compute_workers", "schedule", "shard_mode", "shard_secret", "shard_timeout_seconds",
+                "derive_higher_tfs", "candle_store", "signal_history", "incremental_indicators", "dynamic_universe",
+                "compact_state", "state_float32",
+                "binance_rest_url", "binance_ws_url", "telegram_webhook_url", "telegram_webhook_secret"}
+UNIVERSE_KEYS = {"symbols_quote", "top_n_by_volume", "min_vol_24h_usd", "universe_refresh_minutes"}
+
+def changed_keys(old: Dict[str, Any], new: Dict[str, Any]) -> Set[str]:
+    return {k for k in set(old) | set(new) if old.get(k) != new.get(k)}
+
+def _read(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+class OptionsStore:
+    # One parsed copy of options.json merged with user_config.json (the UI
+    # wins). Files are re-read only when their mtime or size changes, and
+    # at most every `check_every` seconds. Each change builds a new dict and
+    # bumps `version`; a snapshot handed out is never mutated, so a scan
+    # that grabbed one keeps a consistent view until it asks again.
+    def __init__(self, addon_path: str = OPTIONS_PATH, user_path: str = USER_PATH, check_every: float = 1.0):
+        self.paths = (addon_path, user_path)
+        self.check_every = check_every
+        self.version = 0
+        self._lock = threading.Lock()
+        self._stamps: Tuple = (None, None)
+        self._checked = 0.0
+        self._addon: Dict[str, Any] = {}
+        self._user: Dict[str, Any] = {}
+        self._merged: Dict[str, Any] = {}
+        self.refresh(force=True)
+        # what the process started with, for restart_required()
+        self.started = self._merged
+
+    @staticmethod
+    def _stamp(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(path)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def refresh(self, force: bool = False) -> bool:
+        # True if a new snapshot was swapped in
+        now = time.monotonic()
+        if not force and now - self._checked < self.check_every:
+            return False
+        with self._lock:
+            self._checked = now
+            stamps = tuple(self._stamp(p) for p in self.paths)
+            if not force and stamps == self._stamps:
+                return False
+            self._stamps = stamps
+            addon, user = (_read(p) if s is not None else {} for p, s in zip(self.paths, stamps))
+            merged = dict(addon)
+            merged.update(user)
+            self._addon, self._user = addon, user
+            changed = changed_keys(self._merged, merged)
+            if not changed and self.version:
+                return False
+            self._merged = merged
+            self.version += 1
+        return True
+
+    def get(self) -> Dict[str, Any]:
+        # merged snapshot; treat as read-only
+        self.refresh()
+        return self._merged
+
+    def restart_required(self, opts: Dict[str, Any] = None) -> List[str]:
+        # restart keys where `opts` (default: the current snapshot) differs
+        # from the startup options; reverting one takes it off the list again
+        return sorted(changed_keys(self.started, self.get() if opts is None else opts) & RESTART_KEYS)
+
+    def addon(self) -> Dict[str, Any]:
+        self.refresh()
+        return self._addon
+
+    def user(self) -> Dict[str, Any]:
+        self.refresh()
+        return self._user
+
+    def update_user(self, vals: Dict[str, Any]) -> bool:
+        # merge into user_config.json (write + rename) and swap right away
+        user = dict(self.user())
+        user.update(vals or {})
+        path = self.paths[1]
+        tmp = path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(user, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, path)
+        except OSError:
+            return False
+        self.refresh(force=True)
+        return True
@@ -0,0 +1,209 @@
+import asyncio, contextvars, json, os, sys, threading, time, traceback
+from collections import Counter, deque
+from typing import Dict, Any, List, Optional, Tuple
+
+FLIGHT_DIR = "/data/flight"
+# dumps kept in FLIGHT_DIR (oldest deleted first)
+FLIGHT_KEEP = 20
+
+# per-symbol span of the evaluation running in the current task
+_SPAN: contextvars.ContextVar = contextvars.ContextVar("flight_span", default=None)
+
+class SamplingProfiler:
+    # Samples the event loop thread's Python stack from a side thread every
+    # `interval` seconds and counts identical stacks. Armed from the admin
+    # endpoint for the next N scan cycles (rest mode) or a fixed number of
+    # seconds (any mode); nothing runs while it is idle. Processes of the compute pool
+    # are not sampled, their time shows up as pool waits.
+    def __init__(self):
+        self.state = "idle"          # idle | armed | running | done
+        self.cycles_left = 0
+        self.interval = 0.005
+        self.started = None
+        self.finished = None
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self._tid = None
+        self._deadline = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def arm(self, cycles: int = 1, interval: float = 0.005, seconds: float = 0.0, max_seconds: float = 900.0) -> bool:
+        # must be called on the event loop thread: that is the thread sampled
+        if self.state == "running":
+            return False
+        self.interval = max(0.001, interval)
+        self.cycles_left = max(1, int(cycles))
+        self.stacks = Counter()
+        self.samples = 0
+        self.finished = None
+        self._tid = threading.get_ident()
+        self._deadline = time.monotonic() + (seconds if seconds > 0 else max_seconds)
+        self.state = "armed"
+        if seconds > 0:
+            self._start()
+        return True
+
+    def _start(self):
+        self.state = "running"
+        self.started = time.time()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def _finish(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        self.finished = time.time()
+        self.state = "done"
+
+    def cycle_start(self):
+        if self.state == "armed":
+            self._start()
+
+    def cycle_end(self):
+        if self.state == "running":
+            self.cycles_left -= 1
+            if self.cycles_left <= 0:
+                self._finish()
+
+    def _run(self):
+        codes: Dict[Any, str] = {}
+        while not self._stop.wait(self.interval):
+            if time.monotonic() > self._deadline:
+                self._finish()
+                return
+            frame = sys._current_frames().get(self._tid)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                name = codes.get(code)
+                if name is None:
+                    name = codes[code] = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+                stack.append(name)
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[tuple(stack)] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        # flamegraph.pl / speedscope "collapsed" format: frames;joined;by;semicolons count
+        return "".join(f"{';'.join(s)} {n}\n" for s, n in self.stacks.most_common())
+
+    def tree(self) -> Dict[str, Any]:
+        # d3-flame-graph JSON: {name, value, children}, value in samples
+        root = {"name": "root", "value": 0, "children": {}}
+        for stack, n in self.stacks.items():
+            node = root
+            node["value"] += n
+            for name in stack:
+                node = node["children"].setdefault(name, {"name": name, "value": 0, "children": {}})
+                node["value"] += n
+
+        def fix(node):
+            node["children"] = sorted((fix(c) for c in node["children"].values()), key=lambda c: -c["value"])
+            return node
+        return fix(root)
+
+    def status(self) -> Dict[str, Any]:
+        return {"state": self.state, "cycles_left": self.cycles_left, "interval_ms": self.interval * 1000,
+                "samples": self.samples, "started": self.started, "finished": self.finished}
+
+class FlightRecorder:
+    # Ring buffer of the last `keep` scan cycles with a per-symbol timing
+    # breakdown (queue wait, wall time and the STAGE_SECONDS stages seen
+    # inside that symbol's evaluation). A cycle over `budget` seconds dumps
+    # the whole buffer to FLIGHT_DIR, so the dump shows the cycles leading
+    # up to it too. Cycles exist in rest mode only (ws and coordinator mode
+    # have no scan pass); errors are kept in every mode. All methods but
+    # the file write run on the event loop thread.
+    def __init__(self, keep: int = 5, budget: float = 45.0, out_dir: str = FLIGHT_DIR):
+        self.budget = budget
+        self.out_dir = out_dir
+        self.cycles: deque = deque(maxlen=keep)
+        self.errors: deque = deque(maxlen=20)
+        self.last_dump: Optional[str] = None
+        self._cycle: Optional[Dict[str, Any]] = None
+
+    def configure(self, keep: int, budget: float):
+        if keep != self.cycles.maxlen:
+            self.cycles = deque(self.cycles, maxlen=max(1, keep))
+        self.budget = budget
+
+    def on_stage(self, value: float, labels: Tuple[str, ...]):
+        # STAGE_SECONDS listener
+        if self._cycle is None:
+            return
+        key = ":".join(x for x in labels if x)
+        span = _SPAN.get()
+        stages = span if span is not None else self._cycle["stages"]
+        stages[key] = stages.get(key, 0.0) + value
+        if span is not None:
+            total = self._cycle["stages"]
+            total[key] = total.get(key, 0.0) + value
+
+    def cycle_start(self, symbols: int):
+        self._cycle = {"ts": time.time(), "symbols_total": symbols, "seconds": None, "stages": {}, "symbols": {}}
+
+    def begin(self, queued: float) -> Dict[str, float]:
+        # called inside the symbol's own task; stages observed below land here
+        span = {"queued": queued}
+        _SPAN.set(span)
+        return span
+
+    def end(self, symbol: str, span: Dict[str, float], wall: float, why: str):
+        if self._cycle is None:
+            return
+        rec = {k: round(v * 1000, 2) for k, v in span.items()}
+        rec["wall"] = round(wall * 1000, 2)
+        rec["why"] = why
+        self._cycle["symbols"][symbol] = rec
+
+    def cycle_end(self, seconds: float) -> Optional[str]:
+        # the reason to dump, if the cycle went over budget
+        cyc, self._cycle = self._cycle, None
+        if cyc is None:
+            return None
+        cyc["seconds"] = round(seconds, 3)
+        cyc["stages"] = {k: round(v * 1000, 2) for k, v in cyc["stages"].items()}
+        self.cycles.append(cyc)
+        if self.budget > 0 and seconds > self.budget:
+            return f"cycle took {seconds:.1f}s > budget {self.budget:.1f}s"
+        return None
+
+    def error(self, where: str, exc: BaseException):
+        self.errors.append({"ts": time.time(), "where": where, "error": type(exc).__name__,
+                            "trace": "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))[-4000:]})
+        # the add-on log is stderr
+        print(f"[{where}] {type(exc).__name__}: {exc}", file=sys.stderr, flush=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        # finished cycles are never changed again, so shallow copies will do
+        return {"budget_seconds": self.budget, "cycles": [dict(c) for c in self.cycles], "errors": list(self.errors),
+                "last_dump": self.last_dump}
+
+    def _write(self, data: Dict[str, Any]) -> str:
+        # blocking; runs in a worker thread
+        os.makedirs(self.out_dir, exist_ok=True)
+        now = time.time()
+        path = os.path.join(self.out_dir, time.strftime("flight-%Y%m%d-%H%M%S", time.localtime(now)) + f"{now % 1:.3f}"[1:] + ".json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        old = sorted(x for x in os.listdir(self.out_dir) if x.startswith("flight-"))
+        for x in old[:-FLIGHT_KEEP]:
+            os.remove(os.path.join(self.out_dir, x))
+        return path
+
+    async def dump(self, reason: str) -> Optional[str]:
+        data = dict(self.snapshot(), reason=reason)
+        # slowest symbols first so the file reads top-down
+        for cyc in data["cycles"]:
+            cyc["slowest"] = sorted(cyc["symbols"], key=lambda s: -cyc["symbols"][s]["wall"])[:20]
+        try:
+            path = await asyncio.to_thread(self._write, data)
+        except OSError:
+            return None
+        self.last_dump = path
+        return path
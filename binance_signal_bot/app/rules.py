@@ -2,6 +2,11 @@ from typing import Dict, Any, Tuple
 import pandas as pd
 from features import rolling_rvol
 
+def lookback_bars(opts: Dict[str, Any]) -> int:
+    # trigger_tf bars the rules read back: the breakout high, the SL swing
+    # low (10) and the MACD histogram slope (3)
+    return max(int(opts.get("breakout_lookback_bars", 10)), 10, 3)
+
 def compute_confirmations(df5: pd.DataFrame, df15: pd.DataFrame, opts: Dict[str, Any]) -> Dict[str,Any]:
     confirms = 0; reasons = []
     if df5["close"].iloc[-1] >= df5["ema20"].iloc[-1]:
@@ -58,6 +63,18 @@ def make_sl_tp(entry: float, df5: pd.DataFrame, cfg: Dict[str, Any]) -> Tuple[fl
     tps = [entry * (1 + x) for x in raw]
     return sl, tps
 
+def adjust_tps(entry: float, raw_levels, opts: Dict[str, Any], spread_bps: float=None):
+    fee = int(opts.get("taker_fee_bps",10))
+    buffer = int(opts.get("roundtrip_extra_buffer_bps",5))
+    min_net = int(opts.get("min_net_profit_bps",10))
+    cost_bps = 2*fee + (int(spread_bps) if spread_bps is not None else buffer)
+    min_pct = (cost_bps + min_net) / 10000.0
+    result = []
+    for lvl in raw_levels:
+        pct = max(float(lvl), min_pct)
+        result.append(entry*(1.0+pct))
+    return result
+
 def should_signal(df1h: pd.DataFrame, df15: pd.DataFrame, df5: pd.DataFrame, cfg: Dict[str, Any], opts: Dict[str, Any]) -> Dict[str, Any]:
     if df5.empty or df15.empty or df1h.empty:
         return {"ok": False, "why": "insufficient data"}
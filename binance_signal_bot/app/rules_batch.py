@@ -0,0 +1,126 @@
+from typing import Dict, Any, List
+import numpy as np
+import pandas as pd
+from rules import lookback_bars
+
+# trigger_tf columns the rules read, newest bar last
+FIELDS5 = ("open", "close", "high", "low", "ema20", "vwap", "macd", "macd_signal", "macd_hist", "atr", "ema200")
+RVOL_WINDOW = 20
+
+class RuleBatch:
+    # Cross-sectional should_signal: the tails of every symbol's indicator
+    # frames sit in aligned (symbols x bars) arrays, NaN-padded on the left,
+    # and bias / anti-noise / the five confirmations are evaluated as masks
+    # for the whole universe in one pass. Results match rules.should_signal.
+    def __init__(self, symbols: List[str], opts: Dict[str, Any]):
+        self.symbols = list(symbols)
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        n = len(self.symbols)
+        self.lbars = max(1, int(opts.get("breakout_lookback_bars", 10)))
+        self.k5 = lookback_bars(opts)
+        self.f5 = np.full((len(FIELDS5), n, self.k5), np.nan)
+        self.vol15 = np.full((n, RVOL_WINDOW), np.nan)
+        self.len15 = np.zeros(n, dtype=np.int64)
+        self.last15 = np.full((n, 2), np.nan)  # close, ema200
+        self.last1h = np.full((n, 3), np.nan)  # rsi, ema20, ema50
+        self.filled = np.zeros(n, dtype=bool)
+
+    def set(self, symbol: str, df1h: pd.DataFrame, df15: pd.DataFrame, df5: pd.DataFrame) -> bool:
+        # Copies the tails the rules need; False if a frame is empty (the
+        # symbol then gets "insufficient data" like should_signal)
+        i = self.index[symbol]
+        if df5.empty or df15.empty or df1h.empty:
+            self.filled[i] = False
+            return False
+        k = min(self.k5, len(df5))
+        for j, col in enumerate(FIELDS5):
+            self.f5[j, i, :] = np.nan
+            self.f5[j, i, -k:] = df5[col].to_numpy(dtype=np.float64)[-k:]
+        v = df15["volume"].to_numpy(dtype=np.float64)
+        m = min(RVOL_WINDOW, len(v))
+        self.vol15[i, :] = np.nan
+        self.vol15[i, -m:] = v[-m:]
+        self.len15[i] = len(v)
+        self.last15[i] = (df15["close"].iloc[-1], df15["ema200"].iloc[-1])
+        self.last1h[i] = (df1h["rsi"].iloc[-1], df1h["ema20"].iloc[-1], df1h["ema50"].iloc[-1])
+        self.filled[i] = True
+        return True
+
+    def masks(self, opts: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        F = dict(zip(FIELDS5, self.f5))
+        c = F["close"][:, -1]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # bias (1h RSI / EMA order, or 15m price over EMA200)
+            rsi, e20h, e50h = self.last1h.T
+            close15, ema200_15 = self.last15.T
+            low_rsi = rsi < int(opts.get("bias_rsi_min", 50))
+            if bool(opts.get("bias_allow_price_above_ema200_15m", True)):
+                bias_low = close15 >= ema200_15
+            else:
+                bias_low = np.zeros_like(low_rsi)
+            order_ok = e20h >= e50h if bool(opts.get("bias_need_ema_order", True)) else np.ones_like(low_rsi)
+            bias = np.where(low_rsi, bias_low, order_ok)
+
+            # anti-noise
+            body = np.abs(c - F["open"][:, -1])
+            atr = np.nan_to_num(F["atr"][:, -1], nan=0.0)
+            big_body = (atr > 0) & (body > float(opts.get("breakout_body_max_atr_mult", 1.8)) * atr)
+            e200 = F["ema200"][:, -1]
+            near_ema200 = (e200 > 0) & (np.abs(c - e200) / e200 * 100 < float(opts.get("ema200_5m_min_distance_pct", 0.2)))
+            anti = ~(big_body | near_ema200)
+
+            # confirmations
+            ema20_ok = c >= F["ema20"][:, -1]
+            vwap = F["vwap"]
+            vwap_ok = (c >= vwap[:, -1]) & (vwap[:, -1] - vwap[:, -2] > 0)
+            d = np.nan_to_num(np.diff(F["macd_hist"][:, -3:], axis=1), nan=0.0)
+            rising = (d[:, 1] > 0) & (d[:, 0] > 0) if int(opts.get("macd_hist_rising_bars_min", 2)) >= 2 else d[:, 1] > 0
+            macd, sig = F["macd"], F["macd_signal"]
+            cross_up = (macd[:, -1] >= sig[:, -1]) & (macd[:, -2] < sig[:, -2])
+            macd_ok = rising | (cross_up if bool(opts.get("macd_cross_up_allowed", True)) else False)
+            last_v = self.vol15[:, -1]
+            sma = self.vol15.mean(axis=1)
+            rvol_valid = (self.len15 >= RVOL_WINDOW) & (last_v != 0) & (sma != 0) & ~np.isnan(sma)
+            rvol = np.where(rvol_valid, last_v / np.where(rvol_valid, sma, 1.0), 0.0)
+            rvol_ok = rvol >= float(opts.get("rvol15m_min", 1.6))
+            hh = F["high"][:, -self.lbars:]
+            hh = np.where(np.isnan(hh), -np.inf, hh).max(axis=1)
+            breakout_ok = c >= hh
+        return {"bias": bias & self.filled, "anti": anti, "ema20": ema20_ok, "vwap": vwap_ok, "macd": macd_ok,
+                "rvol": rvol_ok, "breakout": breakout_ok, "rvol15m": rvol}
+
+    def evaluate(self, cfg: Dict[str, Any], opts: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        m = self.masks(opts)
+        conf = np.stack([m["ema20"], m["vwap"], m["macd"], m["rvol"], m["breakout"]])
+        count = conf.sum(axis=0)
+        need = cfg["trigger"]["confirmations_needed"]
+        ok = m["bias"] & m["anti"] & (count >= need)
+
+        F = dict(zip(FIELDS5, self.f5))
+        entry = F["close"][:, -1]
+        atr = np.nan_to_num(F["atr"][:, -1], nan=0.0)
+        vwap = F["vwap"][:, -1]
+        vwap = np.where(np.isnan(vwap), entry, vwap)
+        lows = F["low"][:, -10:]
+        low_recent = np.where(np.isnan(lows), np.inf, lows).min(axis=1)
+        sl = np.maximum(np.minimum(vwap - 0.5 * atr, low_recent - 0.5 * atr), 0.0)
+        raw = cfg["exits"]["tp_levels_pct"]
+
+        out: Dict[str, Dict[str, Any]] = {}
+        for i, sym in enumerate(self.symbols):
+            if not self.filled[i]:
+                out[sym] = {"ok": False, "why": "insufficient data"}
+            elif not m["bias"][i]:
+                out[sym] = {"ok": False, "why": "bias filter failed"}
+            elif not m["anti"][i]:
+                out[sym] = {"ok": False, "why": "anti-noise failed"}
+            elif not ok[i]:
+                out[sym] = {"ok": False, "why": f"only {int(count[i])} confirmations"}
+            else:
+                rv = float(m["rvol15m"][i])
+                reasons = [r for r, hit in zip(("EMA20 reclaim", "VWAP↑ & price>VWAP", "MACD impulse",
+                                                f"RVOL15m {rv:.2f}", "Local high breakout"), conf[:, i]) if hit]
+                e = float(entry[i])
+                out[sym] = {"ok": True, "reasons": reasons, "confirms": int(count[i]), "entry": e, "sl": float(sl[i]),
+                            "tps": [e * (1 + x) for x in raw], "rvol15m": rv}
+        return out
@@ -0,0 +1,89 @@
+# Fetch, indicators and rules for one symbol: the evaluation the add-on scan
+# loops and the shard workers share. No module state, so shard.py can import
+# it without the add-on's options, web app or feeds.
+import asyncio, time
+from typing import Dict, Any
+import numpy as np
+from kucoin_client import KucoinClient
+from candles import CandleCache
+from engine import IndicatorEngine
+from features import ohlcv_df, add_indicators
+from rules import should_signal
+from rules_batch import RuleBatch
+from compute import ComputePool
+from scheduler import DirtyTracker, closed_bars
+from metrics import STAGE_SECONDS, SYMBOLS_SKIPPED
+
+async def fetch_bars(ku: KucoinClient, symbol: str, tf: str, cache: CandleCache = None):
+    if cache is not None:
+        return await cache.refresh(symbol, tf)
+    return await ku.fetch_candles(symbol, tf=tf, limit=300)
+
+def make_engine(opts: Dict[str, Any], history: int) -> IndicatorEngine:
+    if not bool(opts.get("incremental_indicators", True)):
+        return None
+    # compact_state: rows in preallocated ring buffers, rules read MarketFrame views
+    return IndicatorEngine(vwap_window=history, compact=bool(opts.get("compact_state", True)),
+                           dtype=np.float32 if bool(opts.get("state_float32", False)) else np.float64)
+
+def frame_df(symbol: str, tf: str, kl, opts: Dict[str, Any], engine: IndicatorEngine = None):
+    t = time.perf_counter()
+    if engine is not None:
+        df = engine.update(symbol, tf, kl, opts)
+    else:
+        df = ohlcv_df(kl)
+        df = add_indicators(df, opts)
+    STAGE_SECONDS.observe(time.perf_counter() - t, "indicators", tf)
+    return df
+
+async def fetch_df(ku: KucoinClient, symbol: str, tf: str, opts: Dict[str, Any], cache: CandleCache = None, engine: IndicatorEngine = None):
+    kl = await fetch_bars(ku, symbol, tf, cache)
+    return frame_df(symbol, tf, kl, opts, engine if cache is not None else None)
+
+# re-checks (1 s apart) for symbols whose closed bar was not published yet
+CLOSE_RETRIES = 3
+
+async def evaluate_symbol(sym: str, ku: KucoinClient, cfg: Dict[str, Any], opts: Dict[str, Any], cache: CandleCache = None, engine: IndicatorEngine = None, pool: ComputePool = None,
+                          tracker: DirtyTracker = None, closed_before: int = None, batch: RuleBatch = None) -> Dict[str, Any]:
+    tfs = cfg["timeframes"]
+    order = (tfs["trigger_tf"], tfs["setup_tf"], tfs["bias_tf"])
+    if cache is not None and cache.derive:
+        # higher timeframes are built from the fresh trigger_tf bars
+        b5 = await fetch_bars(ku, sym, order[0], cache)
+        b15, b1h = await asyncio.gather(*(fetch_bars(ku, sym, tf, cache) for tf in order[1:]))
+    else:
+        b5, b15, b1h = await asyncio.gather(*(fetch_bars(ku, sym, tf, cache) for tf in order))
+
+    if closed_before is not None:
+        # rules see the trigger bar that just closed, not the one opening after it
+        if len(b5) == 0 or b5[-1, 0] < closed_before:
+            # no bar past the boundary yet, so the closing one may still change
+            return {"ok": False, "why": "close pending"}
+        b5 = closed_bars(b5, order[0], closed_before)
+        # setup/bias too: at a 15m or 1h boundary their last row is the bucket
+        # that opened seconds ago, and a forming row would also change the
+        # tracker fingerprint on every pass
+        b15, b1h = (closed_bars(b, tf, closed_before) for b, tf in zip((b15, b1h), order[1:]))
+    if tracker is not None and not tracker.changed(sym, (b5, b15, b1h)):
+        SYMBOLS_SKIPPED.inc("unchanged")
+        return {"ok": False, "why": "unchanged"}
+
+    if pool is not None:
+        # the loop only fetches; indicators and rules run in the process pool
+        t = time.perf_counter()
+        res = await pool.evaluate((b5, b15, b1h), cfg, opts)
+        STAGE_SECONDS.observe(time.perf_counter() - t, "compute", "")
+        return res
+
+    eng = engine if cache is not None else None
+    df5, df15, df1h = (frame_df(sym, tf, b, opts, eng) for tf, b in zip(order, (b5, b15, b1h)))
+    if batch is not None:
+        # rules run later for the whole universe in one RuleBatch pass
+        batch.set(sym, df1h, df15, df5)
+        return {"ok": False, "why": "batched"}
+    if df5.empty or df15.empty or df1h.empty:
+        return {"ok": False, "why": "insufficient data"}
+    t = time.perf_counter()
+    res = should_signal(df1h, df15, df5, cfg, opts)
+    STAGE_SECONDS.observe(time.perf_counter() - t, "rules", "")
+    return res
@@ -0,0 +1,74 @@
+import asyncio, time
+from typing import Dict, Sequence, Tuple
+import numpy as np
+from kucoin_client import KucoinClient
+from candles import TF_MS
+
+class CloseScheduler:
+    # Wakes just after each trigger_tf candle closes on the exchange clock.
+    # The local/server offset comes from /api/v3/time (half the round trip
+    # assumed each way) and is refreshed every `resync` seconds.
+    def __init__(self, ku: KucoinClient, tf: str, grace: float = 1.5, resync: float = 600.0):
+        self.ku = ku
+        self.step = TF_MS[tf]
+        self.grace = grace
+        self.resync = resync
+        self.offset_ms = 0.0
+        self._synced_at = 0.0
+        self._last_boundary = 0
+
+    async def sync(self):
+        t0 = time.time()
+        server = await self.ku.server_time()
+        t1 = time.time()
+        self.offset_ms = server - (t0 + t1) * 500.0
+        self._synced_at = t1
+
+    def now_ms(self) -> float:
+        return time.time() * 1000.0 + self.offset_ms
+
+    async def wait_close(self) -> int:
+        # Sleeps until the next close (+ grace) and returns that boundary in
+        # exchange ms, i.e. the open time of the bar that starts there
+        if time.time() - self._synced_at >= self.resync:
+            try:
+                await self.sync()
+            except Exception:
+                # keep the previous offset; retry on the next wake
+                self._synced_at = time.time() - self.resync + 60
+        now = self.now_ms()
+        boundary = (int(now) // self.step + 1) * self.step
+        if boundary <= self._last_boundary:
+            boundary = self._last_boundary + self.step
+        await asyncio.sleep(max(0.0, (boundary - now) / 1000.0 + self.grace))
+        self._last_boundary = boundary
+        return boundary
+
+def closed_bars(bars: np.ndarray, tf: str, closed_before: int) -> np.ndarray:
+    # rows whose bar ended by closed_before (open + tf <= closed_before)
+    return bars[:np.searchsorted(bars[:, 0], closed_before - TF_MS[tf], side="right")]
+
+class DirtyTracker:
+    # Per-symbol fingerprint of the inputs the rules saw last time (length and
+    # last two rows of every timeframe). A symbol is dirty when it differs.
+    def __init__(self):
+        self._seen: Dict[str, Tuple] = {}
+
+    @staticmethod
+    def fingerprint(bars: Sequence[np.ndarray]) -> Tuple:
+        return tuple((len(b), np.ascontiguousarray(b[-2:]).tobytes()) for b in bars)
+
+    def changed(self, symbol: str, bars: Sequence[np.ndarray]) -> bool:
+        fp = self.fingerprint(bars)
+        if self._seen.get(symbol) == fp:
+            return False
+        self._seen[symbol] = fp
+        return True
+
+    def forget(self, symbol: str):
+        # evaluation failed: make the next pass run it again
+        self._seen.pop(symbol, None)
+
+    def clear(self):
+        # options changed: every symbol is re-evaluated once
+        self._seen.clear()
@@ -0,0 +1,260 @@
+# Sharded scanning: the add-on process (shard_mode "coordinator") owns the
+# universe, cooldowns and Telegram; shard workers fetch candles and run the
+# rules for their slice of the universe and post results back over HTTP.
+#
+#   python shard.py --coordinator http://homeassistant:8181 --secret S --id nuc-1
+#   python shard.py --coordinator http://127.0.0.1:8181 --secret S --local 4
+#
+# --local starts N workers on this host and splits the Binance weight
+# budget between them (they share one IP). Workers on other hosts just
+# point at the same coordinator with their own --id.
+import argparse, asyncio, bisect, hashlib, os, socket, subprocess, sys, threading, time
+from typing import Dict, Any, List, Iterable, Tuple
+import httpx
+
+SECRET_HEADER = "X-Shard-Secret"
+# worker -> coordinator heartbeat; a shard missing for shard_timeout_seconds leaves the ring
+HEARTBEAT_SECONDS = 15
+
+def heartbeat_seconds(timeout: float) -> float:
+    # sent with each assignment: several beats fit in one timeout
+    return max(0.2, min(HEARTBEAT_SECONDS, timeout / 4))
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+class HashRing:
+    # Consistent hashing with virtual nodes: adding or removing a shard only
+    # moves the symbols on the arcs it gains or loses (about 1/N of them).
+    # add/remove build new lists and swap them in as one tuple, so owner()
+    # never sees keys and owners out of step.
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 64):
+        self.vnodes = vnodes
+        self._points: Tuple[List[int], List[str]] = ([], [])
+        self.nodes = set()
+        for n in nodes:
+            self.add(n)
+
+    def add(self, node: str):
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        keys, owners = self._points
+        points = sorted(list(zip(keys, owners)) + [(_hash(f"{node}#{v}"), node) for v in range(self.vnodes)])
+        self._points = ([k for k, _ in points], [o for _, o in points])
+
+    def remove(self, node: str):
+        if node not in self.nodes:
+            return
+        self.nodes.discard(node)
+        keep = [(k, o) for k, o in zip(*self._points) if o != node]
+        self._points = ([k for k, _ in keep], [o for _, o in keep])
+
+    def owner(self, key: str) -> str:
+        keys, owners = self._points
+        if not keys:
+            return None
+        return owners[bisect.bisect(keys, _hash(key)) % len(keys)]
+
+    def assign(self, keys: Iterable[str]) -> Dict[str, List[str]]:
+        out: Dict[str, List[str]] = {n: [] for n in self.nodes}
+        for k in keys:
+            o = self.owner(k)
+            if o is not None:
+                out[o].append(k)
+        return out
+
+class ShardCoordinator:
+    # Live shards (by heartbeat) and the ring built from them. The ring
+    # version bumps whenever a shard joins or times out. All methods take
+    # the same lock: heartbeats may come from several threads at once.
+    def __init__(self, timeout: float = 60.0):
+        self.timeout = timeout
+        self.ring = HashRing()
+        self.version = 0
+        self.symbols: List[str] = []
+        self._seen: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float):
+        # caller holds the lock
+        for sid, t in list(self._seen.items()):
+            if now - t > self.timeout:
+                self._seen.pop(sid, None)
+                self.ring.remove(sid)
+                self.version += 1
+
+    def heartbeat(self, shard: str, now: float = None) -> List[str]:
+        # registers the shard and returns the symbols it owns now
+        now = time.time() if now is None else now
+        with self._lock:
+            self._expire(now)
+            if shard not in self._seen:
+                self.ring.add(shard)
+                self.version += 1
+            self._seen[shard] = now
+            return [s for s in self.symbols if self.ring.owner(s) == shard]
+
+    def owns(self, shard: str, symbol: str) -> bool:
+        with self._lock:
+            return shard in self._seen and self.ring.owner(symbol) == shard
+
+    def status(self, now: float = None) -> Dict[str, Any]:
+        now = time.time() if now is None else now
+        with self._lock:
+            self._expire(now)
+            counts = self.ring.assign(self.symbols)
+            return {"version": self.version, "symbols": len(self.symbols),
+                    "shards": {sid: {"symbols": len(counts.get(sid, [])), "last_seen": round(now - t, 1)}
+                               for sid, t in sorted(self._seen.items())}}
+
+# --- worker side ---
+
+class ShardWorker:
+    def __init__(self, url: str, shard: str, secret: str, weight_limit: int = None):
+        self.url = url.rstrip("/")
+        self.shard = shard
+        self.weight_limit = weight_limit
+        self.http = httpx.AsyncClient(timeout=20, headers={SECRET_HEADER: secret})
+        self.assignment: Dict[str, Any] = None
+        self._changed = asyncio.Event()
+
+    async def heartbeat(self) -> Dict[str, Any]:
+        r = await self.http.get(f"{self.url}/api/shard/assignment", params={"shard": self.shard})
+        r.raise_for_status()
+        a = r.json()
+        if self.assignment is None or a["version"] != self.assignment["version"] or a["symbols"] != self.assignment["symbols"]:
+            self._changed.set()
+        self.assignment = a
+        return a
+
+    async def heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(float((self.assignment or {}).get("heartbeat", HEARTBEAT_SECONDS)))
+            try:
+                await self.heartbeat()
+            except httpx.HTTPError:
+                pass
+
+    async def post(self, items: List[Dict[str, Any]]):
+        if items:
+            r = await self.http.post(f"{self.url}/api/shard/results", json={"shard": self.shard, "items": items})
+            r.raise_for_status()
+
+    async def run(self):
+        # candle state (cache, indicator engine, dirty tracker) stays in this
+        # process; only results travel to the coordinator
+        import scan
+        from metrics import SYMBOL_ERRORS
+        from kucoin_client import KucoinClient, BN_PUBLIC
+        from candles import CandleCache
+        from feed import QUIET
+        from scheduler import CloseScheduler, DirtyTracker
+
+        while self.assignment is None:
+            try:
+                await self.heartbeat()
+            except httpx.HTTPError:
+                await asyncio.sleep(5)
+        cfg, opts = self.assignment["cfg"], self.assignment["opts"]
+        tfs = cfg["timeframes"]
+        ku = KucoinClient(weight_limit=self.weight_limit or int(opts.get("binance_weight_limit_1m", 6000)),
+                          base_url=opts.get("binance_rest_url") or BN_PUBLIC)
+        derive = {tfs["setup_tf"]: tfs["trigger_tf"], tfs["bias_tf"]: tfs["trigger_tf"]} if bool(opts.get("derive_higher_tfs", True)) else None
+        cache = CandleCache(ku, derive=derive)
+        engine = scan.make_engine(opts, cache.history)
+        sched = None
+        tracker = None
+        if str(opts.get("schedule", "interval")).lower() == "close":
+            sched = CloseScheduler(ku, tfs["trigger_tf"], grace=float(opts.get("close_grace_seconds", 1.5)))
+            tracker = DirtyTracker()
+        sem = asyncio.Semaphore(max(1, int(opts.get("scan_concurrency", 8))))
+        asyncio.create_task(self.heartbeat_loop())
+        owned: List[str] = []
+
+        while True:
+            closed_before = await sched.wait_close() if sched is not None else None
+            symbols = self.assignment["symbols"]
+            if self.assignment["opts"] != opts:
+                # options changed on the coordinator: same candles, new thresholds
+                opts = self.assignment["opts"]
+                if tracker is not None:
+                    tracker.clear()
+            for sym in set(owned) - set(symbols):
+                # moved to another shard
+                cache.drop(sym)
+                if engine is not None:
+                    engine.drop(sym)
+                if tracker is not None:
+                    tracker.forget(sym)
+            owned = symbols
+            self._changed.clear()
+            items, pending = [], []
+
+            async def one(sym: str):
+                async with sem:
+                    try:
+                        res = await scan.evaluate_symbol(sym, ku, cfg, opts, cache, engine, None, tracker, closed_before)
+                    except Exception as e:
+                        SYMBOL_ERRORS.inc(sym, type(e).__name__)
+                        if tracker is not None:
+                            tracker.forget(sym)
+                        return
+                    if res.get("why") == "close pending":
+                        pending.append(sym)
+                    elif res.get("why") not in QUIET:
+                        items.append({"symbol": sym, "res": res})
+
+            await asyncio.gather(*(one(s) for s in symbols))
+            for _ in range(scan.CLOSE_RETRIES):
+                if not pending:
+                    break
+                await asyncio.sleep(1)
+                retry, pending[:] = pending[:], []
+                await asyncio.gather(*(one(s) for s in retry))
+            try:
+                await self.post(items)
+            except httpx.HTTPError:
+                pass
+            if sched is None:
+                # interval mode; a new assignment starts the next pass early
+                try:
+                    await asyncio.wait_for(self._changed.wait(), 60)
+                except asyncio.TimeoutError:
+                    pass
+
+def run_local(a) -> int:
+    # N workers on this host, sharing one Binance weight budget
+    base = a.id or socket.gethostname()
+    limit = (a.weight_limit or 6000) // a.local
+    procs = []
+    for i in range(a.local):
+        procs.append(subprocess.Popen([sys.executable, os.path.abspath(__file__), "--coordinator", a.coordinator,
+                                       "--secret", a.secret, "--id", f"{base}-{i}", "--weight-limit", str(limit)]))
+    try:
+        for p in procs:
+            p.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.wait()
+    return 0
+
+def main():
+    ap = argparse.ArgumentParser(description="Scan a shard of the symbol universe for a coordinator")
+    ap.add_argument("--coordinator", required=True, help="add-on URL, e.g. http://homeassistant:8181")
+    ap.add_argument("--secret", default=os.environ.get("SHARD_SECRET", ""), help="shard_secret of the add-on")
+    ap.add_argument("--id", default=None, help="stable shard id (default: hostname)")
+    ap.add_argument("--weight-limit", type=int, default=None, help="Binance weight per minute for this process")
+    ap.add_argument("--local", type=int, default=0, help="start N workers on this host")
+    a = ap.parse_args()
+    if a.local > 0:
+        sys.exit(run_local(a))
+    worker = ShardWorker(a.coordinator, a.id or socket.gethostname(), a.secret, a.weight_limit)
+    asyncio.run(worker.run())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import json, sqlite3, threading, time
+from typing import Dict, Any, List, Optional
+import numpy as np
+
+SIGNALS_DB = "/data/signals.db"
+
+# an open signal is given up after this long (same default as backtest --horizon)
+MAX_AGE_MS = 24 * 3_600_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signals (
+    id INTEGER PRIMARY KEY,
+    symbol TEXT NOT NULL,
+    ts INTEGER NOT NULL,            -- ms, when the signal was sent
+    confirms INTEGER NOT NULL,
+    entry REAL NOT NULL, sl REAL NOT NULL,
+    tp1 REAL NOT NULL, tp2 REAL NOT NULL, tp3 REAL NOT NULL,
+    reasons TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'open',   -- open | tp1 | tp2 | tp3 | sl | expired
+    tp_hit INTEGER NOT NULL DEFAULT 0,     -- highest TP reached before the stop
+    sl_hit INTEGER NOT NULL DEFAULT 0,     -- stopped out before TP1
+    checked_until INTEGER NOT NULL,        -- open time of the last bar looked at
+    closed_ts INTEGER
+);
+CREATE INDEX IF NOT EXISTS signals_symbol ON signals(symbol, id);
+CREATE INDEX IF NOT EXISTS signals_status ON signals(status, id);
+CREATE INDEX IF NOT EXISTS signals_symbol_status ON signals(symbol, status, id);
+CREATE TABLE IF NOT EXISTS signal_stats (
+    symbol TEXT NOT NULL, confirms INTEGER NOT NULL,
+    signals INTEGER NOT NULL DEFAULT 0, closed INTEGER NOT NULL DEFAULT 0,
+    tp1 INTEGER NOT NULL DEFAULT 0, tp2 INTEGER NOT NULL DEFAULT 0, tp3 INTEGER NOT NULL DEFAULT 0,
+    sl INTEGER NOT NULL DEFAULT 0, expired INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (symbol, confirms)
+);
+"""
+
+COLUMNS = ("id", "symbol", "ts", "confirms", "entry", "sl", "tp1", "tp2", "tp3", "reasons",
+           "status", "tp_hit", "sl_hit", "checked_until", "closed_ts")
+
+class SignalStore:
+    # Every sent signal plus its outcome, in SQLite (WAL) under /data.
+    # Open signals are mirrored in memory, so update() only looks at bars
+    # newer than each signal's checked_until. Totals per (symbol, confirms)
+    # are kept in signal_stats as signals close, so aggregates never scan
+    # the history.
+    def __init__(self, path: str = SIGNALS_DB, step_ms: int = 300_000, max_age_ms: int = MAX_AGE_MS):
+        self.step_ms = step_ms
+        self.max_age_ms = max_age_ms
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._open: Dict[str, List[Dict[str, Any]]] = {}
+        for row in self._db.execute(f"SELECT {','.join(COLUMNS)} FROM signals WHERE status = 'open'"):
+            rec = dict(zip(COLUMNS, row))
+            self._open.setdefault(rec["symbol"], []).append(rec)
+
+    def open_symbols(self) -> List[str]:
+        return list(self._open)
+
+    def oldest_check(self, symbol: str) -> int:
+        return min(r["checked_until"] for r in self._open.get(symbol, [])) if symbol in self._open else 0
+
+    def record(self, symbol: str, res: Dict[str, Any], confirms: int, tps: List[float], ts_ms: float = None) -> int:
+        ts = int(time.time() * 1000 if ts_ms is None else ts_ms)
+        # the rules ran on the bar before the forming one, so outcomes start
+        # with the forming bar (the first full bar after a close-mode entry)
+        checked = ts - ts % self.step_ms - self.step_ms
+        tp = (list(tps) + [tps[-1]] * 3)[:3]
+        rec = {"symbol": symbol, "ts": ts, "confirms": int(confirms), "entry": float(res["entry"]), "sl": float(res["sl"]),
+               "tp1": float(tp[0]), "tp2": float(tp[1]), "tp3": float(tp[2]),
+               "reasons": json.dumps(res.get("reasons", []), ensure_ascii=False),
+               "status": "open", "tp_hit": 0, "sl_hit": 0, "checked_until": checked, "closed_ts": None}
+        with self._lock:
+            self._db.execute("BEGIN")
+            cur = self._db.execute(
+                "INSERT INTO signals (symbol, ts, confirms, entry, sl, tp1, tp2, tp3, reasons, checked_until) VALUES (?,?,?,?,?,?,?,?,?,?)",
+                (symbol, ts, rec["confirms"], rec["entry"], rec["sl"], rec["tp1"], rec["tp2"], rec["tp3"], rec["reasons"], checked))
+            self._db.execute("INSERT INTO signal_stats (symbol, confirms, signals) VALUES (?, ?, 1) "
+                             "ON CONFLICT(symbol, confirms) DO UPDATE SET signals = signals + 1", (symbol, rec["confirms"]))
+            self._db.execute("COMMIT")
+        rec["id"] = cur.lastrowid
+        self._open.setdefault(symbol, []).append(rec)
+        return rec["id"]
+
+    def _advance(self, rec: Dict[str, Any], t: np.ndarray, hi: np.ndarray, lo: np.ndarray) -> bool:
+        # Walk the closed bars after checked_until; True if the signal closed
+        m = t > rec["checked_until"]
+        expire_at = rec["ts"] + self.max_age_ms
+        m &= t < expire_at
+        tt, h, l = t[m], hi[m], lo[m]
+        n = len(tt)
+        hits = np.flatnonzero(l <= rec["sl"])
+        first_sl = int(hits[0]) if len(hits) else n
+        for k in (1, 2, 3):
+            if rec["tp_hit"] >= k:
+                continue
+            hits = np.flatnonzero(h[:first_sl] >= rec[f"tp{k}"])
+            # a bar touching both counts as the stop (as in backtest.simulate)
+            if len(hits):
+                rec["tp_hit"] = k
+        if n:
+            rec["checked_until"] = int(tt[first_sl] if first_sl < n else tt[-1])
+        if first_sl < n:
+            rec["sl_hit"] = int(rec["tp_hit"] == 0)
+            rec["status"] = f"tp{rec['tp_hit']}" if rec["tp_hit"] else "sl"
+        elif rec["tp_hit"] == 3:
+            rec["status"] = "tp3"
+        elif len(t) and t[-1] + self.step_ms >= expire_at:
+            rec["status"] = f"tp{rec['tp_hit']}" if rec["tp_hit"] else "expired"
+        else:
+            return False
+        rec["closed_ts"] = int(time.time() * 1000)
+        return True
+
+    def update(self, symbol: str, bars: np.ndarray, now_ms: float = None) -> int:
+        # bars: trigger_tf rows [time, open, close, high, low, volume]; the
+        # forming bar is ignored. Returns how many signals closed.
+        recs = self._open.get(symbol)
+        if not recs or len(bars) == 0:
+            return 0
+        now_ms = time.time() * 1000 if now_ms is None else now_ms
+        closed_rows = bars[bars[:, 0] + self.step_ms <= now_ms]
+        t, hi, lo = closed_rows[:, 0], closed_rows[:, 3], closed_rows[:, 4]
+        before = {id(r): (r["checked_until"], r["tp_hit"]) for r in recs}
+        done, changed = [], []
+        for r in recs:
+            if self._advance(r, t, hi, lo):
+                done.append(r)
+            elif before[id(r)] != (r["checked_until"], r["tp_hit"]):
+                changed.append(r)
+        if not done and not changed:
+            return 0
+        with self._lock:
+            self._db.execute("BEGIN")
+            for r in done + changed:
+                self._db.execute("UPDATE signals SET status=?, tp_hit=?, sl_hit=?, checked_until=?, closed_ts=? WHERE id=?",
+                                 (r["status"], r["tp_hit"], r["sl_hit"], r["checked_until"], r["closed_ts"], r["id"]))
+            for r in done:
+                k = r["tp_hit"]
+                self._db.execute(
+                    "UPDATE signal_stats SET closed = closed + 1, tp1 = tp1 + ?, tp2 = tp2 + ?, tp3 = tp3 + ?, sl = sl + ?, expired = expired + ? "
+                    "WHERE symbol = ? AND confirms = ?",
+                    (int(k >= 1), int(k >= 2), int(k >= 3), r["sl_hit"], int(r["status"] == "expired"), r["symbol"], r["confirms"]))
+            self._db.execute("COMMIT")
+        left = [r for r in recs if r["status"] == "open"]
+        if left:
+            self._open[symbol] = left
+        else:
+            del self._open[symbol]
+        return len(done)
+
+    def page(self, symbol: Optional[str] = None, status: Optional[str] = None, before_id: Optional[int] = None, limit: int = 50) -> Dict[str, Any]:
+        # Newest first, keyset pagination on id (no OFFSET scans)
+        limit = max(1, min(int(limit), 500))
+        where, args = [], []
+        if symbol:
+            where.append("symbol = ?"); args.append(symbol)
+        if status:
+            where.append("status = ?"); args.append(status)
+        if before_id:
+            where.append("id < ?"); args.append(int(before_id))
+        sql = f"SELECT {','.join(COLUMNS)} FROM signals"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id DESC LIMIT ?"
+        with self._lock:
+            rows = self._db.execute(sql, (*args, limit)).fetchall()
+        items = []
+        for row in rows:
+            rec = dict(zip(COLUMNS, row))
+            rec["reasons"] = json.loads(rec["reasons"])
+            items.append(rec)
+        return {"items": items, "next_before_id": items[-1]["id"] if len(items) == limit else None}
+
+    def stats(self, by: str = "symbol") -> List[Dict[str, Any]]:
+        # Hit rates per symbol or per confirmation count over closed signals
+        key = "confirms" if by == "confirms" else "symbol"
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {key}, SUM(signals), SUM(closed), SUM(tp1), SUM(tp2), SUM(tp3), SUM(sl), SUM(expired) "
+                f"FROM signal_stats GROUP BY {key} ORDER BY {key}").fetchall()
+        out = []
+        for k, n, closed, tp1, tp2, tp3, sl, expired in rows:
+            out.append({key: k, "signals": n, "closed": closed, "open": n - closed,
+                        "tp1_rate": tp1 / closed if closed else None, "tp2_rate": tp2 / closed if closed else None,
+                        "tp3_rate": tp3 / closed if closed else None, "sl_rate": sl / closed if closed else None,
+                        "expired": expired})
+        return out
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,93 @@
+import os, time
+from typing import Dict, Tuple
+import numpy as np
+
+STORE_DIR = "/data/candles"
+
+ROW = 6  # time, open, close, high, low, volume (fetch_candles column order)
+ROW_BYTES = ROW * 8
+
+class CandleStore:
+    # Closed candles per (symbol, timeframe) as raw little-endian float64 rows
+    # in <dir>/<SYMBOL>_<tf>.f64. Files are append-only; a warm start reads
+    # back only the rows it needs, with no parsing.
+    def __init__(self, root: str = STORE_DIR, keep_rows: int = 3000):
+        self.root = root
+        self.keep_rows = keep_rows
+        self._last: Dict[Tuple[str, str], float] = {}
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, symbol: str, tf: str) -> str:
+        return os.path.join(self.root, f"{symbol.replace('/', '')}_{tf}.f64")
+
+    def _rows(self, path: str) -> int:
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return 0
+        if size % ROW_BYTES:
+            # torn write from a crash: drop the partial row
+            with open(path, "r+b") as f:
+                f.truncate(size - size % ROW_BYTES)
+        return size // ROW_BYTES
+
+    def load(self, symbol: str, tf: str, n: int) -> np.ndarray:
+        # The last n stored rows, copied out of a memmap so only their pages
+        # are read and no file stays mapped (compact() renames over it)
+        path = self.path(symbol, tf)
+        rows = self._rows(path)
+        if rows == 0:
+            return np.empty((0, ROW))
+        mm = np.memmap(path, dtype="<f8", mode="r", shape=(rows, ROW))
+        out = np.array(mm[-n:], dtype=np.float64)
+        del mm
+        self._last[(symbol, tf)] = float(out[-1, 0])
+        return out
+
+    def last_time(self, symbol: str, tf: str) -> float:
+        key = (symbol, tf)
+        if key not in self._last:
+            path = self.path(symbol, tf)
+            rows = self._rows(path)
+            if rows == 0:
+                self._last[key] = -1.0
+            else:
+                with open(path, "rb") as f:
+                    f.seek((rows - 1) * ROW_BYTES)
+                    self._last[key] = float(np.frombuffer(f.read(ROW_BYTES), dtype="<f8")[0])
+        return self._last[key]
+
+    def append(self, symbol: str, tf: str, bars: np.ndarray, tf_ms: int, now_ms: float = None):
+        # Persist bars that are closed and newer than what is on disk
+        if len(bars) == 0:
+            return
+        now_ms = time.time() * 1000 if now_ms is None else now_ms
+        last = self.last_time(symbol, tf)
+        t = bars[:, 0]
+        new = bars[(t > last) & (t + tf_ms <= now_ms)]
+        if len(new) == 0:
+            return
+        path = self.path(symbol, tf)
+        with open(path, "ab") as f:
+            f.write(np.ascontiguousarray(new, dtype="<f8").tobytes())
+        self._last[(symbol, tf)] = float(new[-1, 0])
+        if self._rows(path) > 2 * self.keep_rows:
+            self.compact(symbol, tf)
+
+    def compact(self, symbol: str, tf: str):
+        # Keep the newest keep_rows; written aside and renamed so readers never
+        # see a half-written file
+        path = self.path(symbol, tf)
+        rows = self._rows(path)
+        if rows <= self.keep_rows:
+            return
+        with open(path, "rb") as f:
+            f.seek((rows - self.keep_rows) * ROW_BYTES)
+            data = f.read()
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def drop(self, symbol: str):
+        self._last = {k: v for k, v in self._last.items() if k[0] != symbol}
@@ -0,0 +1,81 @@
+import asyncio, heapq, time
+from typing import Dict, Any, List, Tuple
+from kucoin_client import KucoinClient
+
+# Every leveraged token Binance has listed on spot: the UP/DOWN BLVTs and the
+# older BULL/BEAR tokens. An explicit list, not a suffix match, so spot coins
+# like SYRUP or SUNDOWN are never dropped.
+_BLVT = ("BTC", "ETH", "BNB", "ADA", "LINK", "XRP", "DOT", "TRX", "EOS", "XTZ", "LTC",
+         "UNI", "SXP", "FIL", "YFI", "BCH", "AAVE", "SUSHI", "XLM", "1INCH")
+LEVERAGED_TOKENS = frozenset([b + s for b in _BLVT for s in ("UP", "DOWN")] +
+                             ["BULL", "BEAR"] + [b + s for b in ("ETH", "BNB", "EOS", "XRP") for s in ("BULL", "BEAR")])
+
+def is_leveraged_token(sym: str) -> bool:
+    return sym.split("-", 1)[0] in LEVERAGED_TOKENS
+
+async def build_symbol_universe(ku: KucoinClient, quote: str, top_n: int, min_vol24: float):
+    data = await ku.fetch_all_tickers(quote)
+    arr = data.get("data", {}).get("ticker", [])
+    rows = []
+    for t in arr:
+        sym = t.get("symbol", "")
+        if not sym.endswith(f"-{quote}") or is_leveraged_token(sym):
+            continue
+        try:
+            vol_usd = float(t.get("volValue", "0"))
+        except Exception:
+            vol_usd = 0.0
+        if vol_usd >= min_vol24:
+            rows.append((vol_usd, sym))
+    return [s for v, s in heapq.nlargest(top_n, rows)]
+
+class SymbolUniverse:
+    # Top-N by 24h quote volume, refreshed in the background once the TTL
+    # runs out so the ticker download never sits inside a scan
+    def __init__(self, ku: KucoinClient, opts: Dict[str, Any]):
+        self.ku = ku
+        self.symbols: List[str] = []
+        self.refreshed_ts = 0.0
+        self._task = None
+        # callbacks(added, removed) run after each change
+        self.listeners = []
+        self.configure(opts)
+
+    def configure(self, opts: Dict[str, Any]):
+        quote = str(opts.get("symbols_quote", "USDT")).upper()
+        top_n = int(opts.get("top_n_by_volume", 120))
+        min_vol24 = float(opts.get("min_vol_24h_usd", 5_000_000))
+        if self.symbols and (quote, top_n, min_vol24) != (self.quote, self.top_n, self.min_vol24):
+            # different selection: refresh on the next get(), keep scanning the old set meanwhile
+            self.refreshed_ts = 0.0
+        self.quote, self.top_n, self.min_vol24 = quote, top_n, min_vol24
+        self.ttl = float(opts.get("universe_refresh_minutes", 30)) * 60
+
+    async def refresh(self) -> Tuple[List[str], List[str]]:
+        new = await build_symbol_universe(self.ku, self.quote, self.top_n, self.min_vol24)
+        self.refreshed_ts = time.time()
+        if not new:
+            # keep scanning the old set if Binance returned nothing useful
+            return [], []
+        old = set(self.symbols)
+        added = [s for s in new if s not in old]
+        keep = set(new)
+        removed = [s for s in self.symbols if s not in keep]
+        self.symbols = new
+        if added or removed:
+            for cb in self.listeners:
+                cb(added, removed)
+        return added, removed
+
+    async def _refresh_quietly(self):
+        try:
+            await self.refresh()
+        except Exception:
+            self.refreshed_ts = time.time()
+
+    async def get(self) -> List[str]:
+        if not self.symbols:
+            await self.refresh()
+        elif time.time() - self.refreshed_ts >= self.ttl and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._refresh_quietly())
+        return self.symbols
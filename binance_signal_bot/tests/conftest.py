@@ -0,0 +1,22 @@
+import os, sys
+
+import pytest
+import yaml
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# the add-on runs from app/ with flat imports (see Dockerfile)
+sys.path.insert(0, os.path.join(HERE, "..", "app"))
+# tools/synthetic.py is shared with the benchmarks
+sys.path.insert(0, os.path.join(HERE, "..", "tools"))
+
+import synthetic
+
+@pytest.fixture
+def klines():
+    # synthetic.klines(n, step=300_000, seed=0, drift=0.0): random-walk bars from T0
+    return synthetic.klines
+
+@pytest.fixture(scope="session")
+def cfg():
+    with open(os.path.join(HERE, "..", "app", "config.yaml"), encoding="utf-8") as f:
+        return yaml.safe_load(f)
@@ -0,0 +1,59 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from backtest import prepare, rule_columns, simulate
+from features import ohlcv_df, add_indicators
+from rules import should_signal, adjust_tps
+
+# the last bars of the history, each evaluated the way the live scan would
+CHECKED = 160
+
+@pytest.mark.parametrize("seed,opts", [
+    (1, {"rvol15m_min": 0.8, "ema200_5m_min_distance_pct": 0.0, "bias_rsi_min": 30, "breakout_lookback_bars": 5}),
+    (2, {"rvol15m_min": 0.5, "bias_need_ema_order": False, "macd_hist_rising_bars_min": 1, "macd_cross_up_allowed": False,
+         "taker_fee_bps": 40, "min_net_profit_bps": 20}),
+    (3, {"bias_allow_price_above_ema200_15m": False, "breakout_body_max_atr_mult": 0.8, "rvol15m_min": 1.0}),
+])
+def test_rule_columns_match_should_signal(seed, opts, klines, cfg):
+    opts = dict(opts, cooldown_minutes=0)
+    bars5 = klines(1200, 300_000, seed, drift=0.0003)
+    c5, c15, c1h = prepare(bars5, cfg=cfg)
+    # VWAP over the whole history, as should_signal sees it on a prefix
+    cols = rule_columns(c5, c15, c1h, cfg, opts, vwap_window=len(bars5))
+    trades = {t["time"]: t for t in simulate(c5, cols, cfg, opts)}
+    i15 = c15.asof(c5.time + 300_000); i1h = c1h.asof(c5.time + 300_000)
+    frame = lambda rows: add_indicators(ohlcv_df(rows), opts)
+    min_conf = max(3, int(opts.get("min_confirms", 3)))
+
+    whys = Counter()
+    for i in range(len(bars5) - CHECKED, len(bars5)):
+        c15_rows = np.column_stack([c15.time, c15.open, c15.close, c15.high, c15.low, c15.volume])[:i15[i] + 1]
+        c1h_rows = np.column_stack([c1h.time, c1h.open, c1h.close, c1h.high, c1h.low, c1h.volume])[:i1h[i] + 1]
+        want = should_signal(frame(c1h_rows), frame(c15_rows), frame(bars5[:i + 1]), cfg, opts)
+        whys[want.get("why", "ok")] += 1
+        assert bool(cols["ok"][i]) == want["ok"], (i, want)
+        if want.get("why") == "bias filter failed":
+            assert not cols["bias"][i], i
+            continue
+        assert cols["bias"][i], i
+        if want.get("why") == "anti-noise failed":
+            assert not cols["anti_noise"][i], i
+            continue
+        if not want["ok"]:
+            assert want["why"] == f"only {cols['count'][i]} confirmations", i
+            continue
+        assert cols["count"][i] == want["confirms"], i
+        assert cols["rvol15m"][i] == pytest.approx(want["rvol15m"], rel=1e-9)
+        if want["confirms"] < min_conf:
+            assert int(c5.time[i]) not in trades
+            continue
+        # the row simulate() trades: entry, SL and the fee-adjusted TPs
+        t = trades.pop(int(c5.time[i]))
+        assert t["confirms"] == want["confirms"] and t["entry"] == want["entry"], i
+        assert t["sl"] == pytest.approx(want["sl"], rel=1e-9)
+        assert t["tps"] == pytest.approx(adjust_tps(want["entry"], cfg["exits"]["tp_levels_pct"], opts), rel=1e-12)
+    assert not [t for t in trades if t >= c5.time[len(bars5) - CHECKED]]
+    # the windows exercise more than one outcome
+    assert whys["ok"] >= 5 and len(whys) >= 3, whys
@@ -0,0 +1,98 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+from candles import CandleCache, HISTORY_BARS, TF_MS, resample_klines
+
+def exchange_bars(rows: np.ndarray, tf: str) -> np.ndarray:
+    # how Binance builds tf bars: epoch-aligned buckets, the last one forming
+    df = pd.DataFrame(rows, columns=["time", "open", "close", "high", "low", "volume"])
+    g = df.groupby((df["time"] // TF_MS[tf]) * TF_MS[tf], sort=True)
+    out = pd.DataFrame({"open": g["open"].first(), "close": g["close"].last(), "high": g["high"].max(),
+                        "low": g["low"].min(), "volume": g["volume"].sum()})
+    return np.column_stack([out.index.to_numpy(np.float64), out.to_numpy(np.float64)])
+
+class FakeExchange:
+    # fetch_candles over a 5m series that grows as `now` (a bar count) moves
+    def __init__(self, rows: np.ndarray):
+        self.rows = rows
+        self.now = 0
+        self.calls = []
+
+    async def fetch_candles(self, symbol, tf, limit=300, start_time=None):
+        self.calls.append(tf)
+        bars = self.rows[:self.now]
+        if tf != "5m":
+            bars = exchange_bars(bars, tf)
+        if start_time is not None:
+            bars = bars[bars[:, 0] >= start_time]
+            return bars[:limit]
+        return bars[-limit:]
+
+def test_resample_matches_exchange_bars(klines):
+    rows = klines(1000, seed=5)
+    for tf in ("15m", "1h"):
+        np.testing.assert_allclose(resample_klines(rows, "5m", tf), exchange_bars(rows, tf), rtol=1e-13)
+
+def test_resample_drops_partial_and_holed_buckets(klines):
+    rows = klines(60, seed=5)
+    # history starting mid-hour, and one missing 5m bar in the third hour
+    cut = np.delete(rows[2:], 27, axis=0)
+    out = resample_klines(cut, "5m", "1h")
+    ref = exchange_bars(rows, "1h")
+    np.testing.assert_allclose(out, ref[[1, 3, 4]], rtol=1e-13)
+
+def test_derived_cache_follows_exchange(klines):
+    rows = klines(2000, seed=5)
+    ex = FakeExchange(rows)
+    cache = CandleCache(ex, history=300, derive={"15m": "5m", "1h": "5m"})
+
+    async def cycle():
+        await cache.refresh("X-USDT", "5m")
+        for tf in ("15m", "1h"):
+            await cache.refresh("X-USDT", tf)
+
+    async def run():
+        ex.now = 1500
+        await cycle()
+        ex.calls.clear()
+        for now in range(1501, 2000, 7):
+            ex.now = now
+            await cycle()
+            for tf in ("15m", "1h"):
+                want = exchange_bars(rows[:now], tf)[-300:]
+                np.testing.assert_allclose(cache.bars("X-USDT", tf), want, rtol=1e-13, err_msg=f"{tf} at {now}")
+        # after seeding, only the 5m series comes from REST
+        assert set(ex.calls) == {"5m"}
+
+    asyncio.run(run())
+
+def test_store_warm_start_fetches_only_the_gap(tmp_path, klines):
+    from store import CandleStore
+    step = TF_MS["5m"]
+    rows = klines(400, seed=5)
+
+    class Gap:
+        def __init__(self):
+            self.calls = []
+
+        async def fetch_candles(self, symbol, tf="5m", limit=300, start_time=None):
+            self.calls.append(start_time)
+            lo = 0 if start_time is None else int(np.searchsorted(rows[:, 0], start_time))
+            return rows[lo:][:limit] if start_time is not None else rows[-limit:]
+
+    store = CandleStore(str(tmp_path), keep_rows=1000)
+    now = rows[-1, 0] + step
+    # bars up to 350 on disk, the rest of the history missing
+    store.append("AAA-USDT", "5m", rows[:350], step, now_ms=now)
+    ku = Gap()
+    cache = CandleCache(ku, store=store)
+    bars = asyncio.run(cache.refresh("AAA-USDT", "5m"))
+    assert ku.calls == [rows[349, 0]]
+    np.testing.assert_array_equal(bars, rows[-HISTORY_BARS:])
+    # an ordinary writable array, not a view of the file
+    assert type(bars) is np.ndarray and bars.flags.writeable
+    # a revised forming bar is written in place
+    assert cache.apply("AAA-USDT", "5m", [rows[-1, 0], 1, 2, 3, 0.5, 9])
+    assert cache.bars("AAA-USDT", "5m")[-1, 2] == 2
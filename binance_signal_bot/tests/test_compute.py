@@ -0,0 +1,35 @@
+import asyncio
+from multiprocessing import resource_tracker, shared_memory
+
+import compute
+from compute import ComputePool
+from features import ohlcv_df, add_indicators
+from rules import should_signal
+
+def test_attach_does_not_register(monkeypatch):
+    calls = []
+    monkeypatch.setattr(resource_tracker, "register", lambda *a: calls.append(a))
+    shm = shared_memory.SharedMemory(create=True, size=64)
+    try:
+        calls.clear()
+        compute._attach(shm.name).close()
+        assert calls == []
+    finally:
+        shm.close()
+        shm.unlink()
+
+def test_pool_round_trip(klines, cfg):
+    b = [klines(300, 300_000, 1), klines(300, 900_000, 2), klines(300, 3_600_000, 3)]
+    opts = {}
+    df5, df15, df1h = (add_indicators(ohlcv_df(x), opts) for x in b)
+    want = should_signal(df1h, df15, df5, cfg, opts)
+
+    async def go():
+        pool = ComputePool(1)
+        try:
+            await pool.start()
+            return await pool.evaluate(b, cfg, opts)
+        finally:
+            pool.close()
+    got = asyncio.run(go())
+    assert got == want
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from engine import IndicatorEngine
+from features import ohlcv_df, add_indicators
+
+WINDOW = 300
+
+def divergence(frame, ref) -> dict:
+    # worst relative error per column; MACD lines sit near 0, so they are
+    # measured against the price
+    out = {}
+    close = ref["close"].to_numpy(np.float64)
+    for col in ref.columns:
+        if col == "time":
+            continue
+        a = np.asarray(frame[col], dtype=np.float64)
+        b = ref[col].to_numpy(np.float64)
+        assert (np.isnan(a) == np.isnan(b)).all(), col
+        scale = close if col.startswith("macd") else np.maximum(np.abs(b), 1e-12)
+        ok = ~np.isnan(b)
+        out[col] = float(np.max(np.abs(a[ok] - b[ok]) / scale[ok])) if ok.any() else 0.0
+    return out
+
+# what a frame may differ from add_indicators over the same window by
+BOUNDS = {"ema": 1e-12, "vwap": 1e-12, "macd": 1e-8, "rsi": 1e-6, "atr": 1e-6}
+
+def check(frame, ref, floor: float = 0.0):
+    # OHLCV columns must be equal unless a floor is given
+    assert len(frame) == len(ref)
+    for col, err in divergence(frame, ref).items():
+        bound = next((b for k, b in BOUNDS.items() if col.startswith(k)), 0.0)
+        assert err <= max(bound, floor), (col, err)
+
+@pytest.mark.parametrize("mode", [{}, {"compact": True}])
+@pytest.mark.parametrize("opts", [{}, {"ema_slow": 250, "ema_fast": 9, "rsi_length": 7, "macd_fast": 8}])
+def test_sliding_window_matches_add_indicators(mode, opts, klines):
+    k = klines(1200, seed=3)
+    eng = IndicatorEngine(vwap_window=WINDOW, **mode)
+    for end in range(WINDOW // 3, len(k), 13):
+        w = k[max(0, end - WINDOW):end]
+        frame = eng.update("X-USDT", "5m", w, opts)
+        check(frame, add_indicators(ohlcv_df(w), opts).tail(eng.tail))
+
+@pytest.mark.parametrize("mode", [{}, {"compact": True}])
+def test_revised_last_bar(mode, klines):
+    k = klines(700, seed=3)
+    eng = IndicatorEngine(vwap_window=WINDOW, **mode)
+    eng.update("X-USDT", "5m", k[:WINDOW], {})
+    for end in range(WINDOW + 1, 700, 11):
+        w = k[end - WINDOW:end].copy()
+        eng.update("X-USDT", "5m", w, {})
+        # the forming bar moves before it closes
+        w[-1, 2] *= 1.01; w[-1, 3] = max(w[-1, 3], w[-1, 2]); w[-1, 5] += 50
+        frame = eng.update("X-USDT", "5m", w, {})
+        check(frame, add_indicators(ohlcv_df(w), {}).tail(eng.tail))
+
+def test_float32_state_stays_close(klines):
+    k = klines(900, seed=3)
+    eng = IndicatorEngine(vwap_window=WINDOW, compact=True, dtype=np.float32)
+    for end in range(WINDOW, len(k), 17):
+        w = k[end - WINDOW:end]
+        frame = eng.update("X-USDT", "5m", w, {})
+        # float32 rows round to ~6e-8; EMAs and VWAP come from float64 sums
+        check(frame, add_indicators(ohlcv_df(w), {}).tail(eng.tail), floor=1e-5)
+
+def test_compact_frame_equals_dataframe_frame(klines):
+    k = klines(800, seed=3)
+    frames, compact = IndicatorEngine(vwap_window=WINDOW), IndicatorEngine(vwap_window=WINDOW, compact=True)
+    for end in range(WINDOW, len(k), 9):
+        w = k[end - WINDOW:end]
+        a, b = frames.update("X-USDT", "15m", w, {}), compact.update("X-USDT", "15m", w, {})
+        assert set(a.columns) == set(b.columns)
+        for col in a.columns:
+            want = a[col].to_numpy() if col != "time" else a[col].to_numpy().astype("datetime64[ms]").astype(np.int64)
+            np.testing.assert_array_equal(np.asarray(b[col]), want, err_msg=col)
+
+@pytest.mark.parametrize("mode", [{}, {"compact": True}])
+def test_frame_covers_the_breakout_lookback(mode, klines):
+    k = klines(700, seed=3)
+    eng = IndicatorEngine(vwap_window=WINDOW, **mode)
+    for lb, rows in ((10, eng.tail), (100, 102), (250, 252), (500, WINDOW)):
+        # a live option change rebuilds the state from the same bars
+        opts = {"breakout_lookback_bars": lb}
+        for end in (600, 613):
+            w = k[end - WINDOW:end]
+            frame = eng.update("X-USDT", "5m", w, opts)
+            ref = add_indicators(ohlcv_df(w), opts)
+            # the rules read the whole lookback of highs, only the last rows of the rest
+            assert len(frame) == rows
+            np.testing.assert_array_equal(np.asarray(frame["high"]), ref["high"].to_numpy()[-rows:])
+            assert np.asarray(frame["high"])[-lb:].max() == ref["high"].iloc[-lb:].max()
@@ -0,0 +1,82 @@
+import asyncio, json
+
+from feed import LiveFeed
+
+def parse(frame: str):
+    # "event: x\ndata: {...}\n\n" -> (x, {...})
+    lines = [l for l in frame.splitlines() if l and not l.startswith("retry:")]
+    return lines[0][len("event: "):], json.loads(lines[1][len("data: "):])
+
+async def next_frame(sub):
+    return parse(await asyncio.wait_for(sub.__anext__(), 1.0))
+
+async def step(feed, sym, confirms):
+    # one scanner write, then one run() tick
+    feed.symbol(sym, {"ok": False, "why": f"only {confirms} confirmations"})
+    await asyncio.sleep(feed.interval * 3)
+
+def test_lagging_viewer_gets_a_snapshot_then_deltas():
+    async def go():
+        feed = LiveFeed(interval=0.01, queue_size=2)
+        runner = asyncio.create_task(feed.run())
+        fast, slow = feed.events(), feed.events()
+        assert await next_frame(fast) == ("snapshot", {"v": 0, "scan": feed.scan, "symbols": {}, "signals": []})
+        assert (await next_frame(slow))[0] == "snapshot"
+        assert feed.viewers == 2
+
+        got = []
+        for i in range(1, 5):
+            await step(feed, f"S{i}-USDT", i % 3)
+            got.append(await next_frame(fast))
+        # the reader that keeps up sees every delta in order
+        assert [(e, d["v"], list(d["symbols"])) for e, d in got] == [("delta", i, [f"S{i}-USDT"]) for i in range(1, 5)]
+
+        # the slow one filled its queue after v2: v3 arrived as a snapshot of
+        # the whole state, then deltas only
+        event, snap = await next_frame(slow)
+        assert event == "snapshot" and snap["v"] == 3
+        assert sorted(snap["symbols"]) == ["S1-USDT", "S2-USDT", "S3-USDT"]
+        assert await next_frame(slow) == ("delta", got[3][1])
+        await step(feed, "S5-USDT", 2)
+        event, delta = await next_frame(slow)
+        assert (event, delta["v"]) == ("delta", 5)
+        assert (await next_frame(fast))[1]["v"] == 5
+
+        runner.cancel()
+        await fast.aclose(); await slow.aclose()
+        assert feed.viewers == 0
+    asyncio.run(go())
+
+def test_reconnect_resumes_from_a_snapshot():
+    async def go():
+        feed = LiveFeed(interval=0.01)
+        runner = asyncio.create_task(feed.run())
+        sub = feed.events()
+        await next_frame(sub)
+        feed.scan_start(["A-USDT", "B-USDT"])
+        await step(feed, "A-USDT", 1)
+        event, delta = await next_frame(sub)
+        assert event == "delta" and delta["v"] == 1 and delta["scan"]["total"] == 2
+        # the browser drops the connection; the scan goes on meanwhile
+        await sub.aclose()
+        assert feed.viewers == 0
+        await step(feed, "B-USDT", 2)
+        feed.signal("B-USDT", 3, 1.0, 0.9, [1.1])
+        feed.scan_end(1.5)
+        await asyncio.sleep(0.05)
+
+        # EventSource reconnects: the snapshot carries what it missed
+        sub = feed.events()
+        first = await asyncio.wait_for(sub.__anext__(), 1.0)
+        assert first.startswith("retry: 3000\n")
+        event, snap = parse(first)
+        assert event == "snapshot" and snap["v"] == feed.version >= 2
+        assert snap["symbols"]["B-USDT"]["c"] == 2 and snap["scan"]["running"] is False
+        assert [s["symbol"] for s in snap["signals"]] == ["B-USDT"]
+        # and the deltas continue right after it
+        await step(feed, "A-USDT", 3)
+        event, delta = await next_frame(sub)
+        assert event == "delta" and delta["v"] == snap["v"] + 1 and delta["symbols"]["A-USDT"]["c"] == 3
+        runner.cancel()
+        await sub.aclose()
+    asyncio.run(go())
@@ -0,0 +1,97 @@
+import asyncio, time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import kucoin_client
+from kucoin_client import KucoinClient
+
+KLINE = [[0, "1", "2", "0.5", "1.5", "10", 299_999, "0", 0, "0", "0", "0"]]
+
+class Clock:
+    # wall clock for _reserve; asyncio.sleep just moves it forward
+    def __init__(self, now):
+        self.now = now
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    async def sleep(self, s):
+        self.sleeps.append(s)
+        self.now += s
+        await asyncio.sleep(0)
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock(1_700_000_040.0 + 10)   # 10 s into a minute
+    monkeypatch.setattr(kucoin_client, "time", SimpleNamespace(time=c.time, perf_counter=time.perf_counter))
+    monkeypatch.setattr(kucoin_client, "asyncio", SimpleNamespace(sleep=c.sleep))
+    return c
+
+def client(replies, **kw):
+    # replies(n, request) -> httpx.Response for the n-th request (1-based)
+    ku = KucoinClient(**kw)
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return replies(len(seen), request)
+    ku._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return ku, seen
+
+def test_used_weight_near_the_cap_waits_for_the_next_minute(clock):
+    # 100 x 0.8 = 80 allowed per minute; the server already counts 79
+    ku, seen = client(lambda n, r: httpx.Response(200, json=KLINE, headers={"X-MBX-USED-WEIGHT-1M": str(77 + 2 * n)}),
+                      weight_limit=100, weight_budget=0.8)
+
+    async def go():
+        await ku.fetch_candles("BTC-USDT", "5m")
+        assert ku.used_weight == 79 and clock.sleeps == []
+        out = await ku.fetch_candles("BTC-USDT", "5m")
+        assert out.shape == (1, 6)
+        await ku.close()
+    asyncio.run(go())
+    assert len(seen) == 2
+    # 50 s left in the minute, then a fresh budget
+    assert clock.sleeps == [pytest.approx(50.05)]
+    assert seen[0].url.params["symbol"] == "BTCUSDT"
+
+def test_429_waits_retry_after_then_succeeds(clock):
+    def replies(n, r):
+        if n == 1:
+            return httpx.Response(429, headers={"Retry-After": "7"})
+        return httpx.Response(200, json={"serverTime": 123})
+    ku, seen = client(replies)
+
+    async def go():
+        assert await ku.server_time() == 123
+        await ku.close()
+    asyncio.run(go())
+    assert len(seen) == 2 and clock.sleeps == [pytest.approx(7)]
+
+def test_429_gives_up_after_the_retry_limit(clock):
+    ku, seen = client(lambda n, r: httpx.Response(429, headers={"Retry-After": "3"}))
+
+    async def go():
+        with pytest.raises(httpx.HTTPStatusError):
+            await ku.server_time()
+        await ku.close()
+    asyncio.run(go())
+    # the first try plus two retries, each after Retry-After
+    assert len(seen) == 3 and clock.sleeps == [pytest.approx(3)] * 2
+
+def test_418_is_not_retried_and_blocks_later_requests(clock):
+    ku, seen = client(lambda n, r: httpx.Response(418, headers={"Retry-After": "120"}) if n == 1
+                      else httpx.Response(200, json={"serverTime": 1}))
+
+    async def go():
+        with pytest.raises(httpx.HTTPStatusError):
+            await ku.server_time()
+        assert len(seen) == 1 and clock.sleeps == []
+        # the ban holds back the next request until it ends
+        assert await ku.server_time() == 1
+        await ku.close()
+    asyncio.run(go())
+    assert len(seen) == 2 and clock.sleeps == [pytest.approx(120)]
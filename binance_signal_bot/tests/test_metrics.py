@@ -0,0 +1,24 @@
+import threading
+
+import metrics
+
+def test_render_while_label_sets_grow():
+    errors = metrics.Counter("test_errors_total", "Test counter.", ("symbol",))
+    stage = metrics.Histogram("test_stage_seconds", "Test histogram.", ("stage",))
+
+    def writer():
+        for i in range(20000):
+            errors.inc(f"S{i}")
+            stage.observe(0.001 * (i % 50), f"st{i}")
+
+    t = threading.Thread(target=writer)
+    t.start()
+    try:
+        while t.is_alive():
+            metrics.render()
+    finally:
+        t.join()
+    text = metrics.render()
+    assert "# TYPE test_errors_total counter" in text
+    assert 'test_errors_total{symbol="S19999"} 1.0' in text
+    assert 'test_stage_seconds_bucket{stage="st0",le="+Inf"} 1' in text
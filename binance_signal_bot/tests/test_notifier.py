@@ -0,0 +1,87 @@
+import asyncio, json, time
+
+import httpx
+
+import notifier
+from notifier import TelegramNotifier, GLOBAL_PER_SEC
+
+def mock(tg: TelegramNotifier, handler):
+    # the notifier's pooled client, routed to `handler`
+    tg._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+def recorder(sent, reply=None):
+    def handler(request):
+        sent.append((time.monotonic(), json.loads(request.content)))
+        if reply is not None:
+            return reply(len(sent))
+        return httpx.Response(200, json={"ok": True, "result": {}})
+    return handler
+
+def test_one_message_per_second_per_chat():
+    async def go():
+        sent = []
+        tg = TelegramNotifier("T", "1")
+        mock(tg, recorder(sent))
+        await asyncio.gather(tg.send("a"), tg.send("b"), tg.send("c"))
+        gaps = [b[0] - a[0] for a, b in zip(sent, sent[1:])]
+        assert len(sent) == 3 and min(gaps) >= 0.95
+        await tg.close()
+    asyncio.run(go())
+
+def test_thirty_messages_per_second_overall():
+    async def go():
+        sent = []
+        tg = TelegramNotifier("T", "1")
+        mock(tg, recorder(sent))
+        chats = [str(i) for i in range(GLOBAL_PER_SEC + 5)]
+        t0 = time.monotonic()
+        await asyncio.gather(*(tg._post("x", c) for c in chats))
+        ts = [t - t0 for t, _ in sent]
+        assert sorted(p["chat_id"] for _, p in sent) == sorted(chats)
+        # a full second's worth goes out at once, the rest waits for the window
+        assert sum(t < 0.5 for t in ts) == GLOBAL_PER_SEC
+        assert min(t for t in ts if t >= 0.5) >= 0.95
+        await tg.close()
+    asyncio.run(go())
+
+def test_429_waits_retry_after():
+    async def go():
+        sent = []
+
+        def reply(n):
+            if n == 1:
+                return httpx.Response(429, json={"ok": False, "error_code": 429, "parameters": {"retry_after": 1.5}})
+            return httpx.Response(200, json={"ok": True, "result": {}})
+
+        tg = TelegramNotifier("T", "1")
+        mock(tg, recorder(sent, reply))
+        res = await tg.send("a")
+        assert res["ok"] and len(sent) == 2
+        # longer than the per-chat interval alone would wait
+        assert sent[1][0] - sent[0][0] >= 1.45
+        await tg.close()
+    asyncio.run(go())
+
+def test_queued_messages_are_coalesced(monkeypatch):
+    monkeypatch.setattr(notifier, "COALESCE_WINDOW", 0.05)
+
+    async def go():
+        sent = []
+        tg = TelegramNotifier("T", "1", coalesce=True)
+        mock(tg, recorder(sent))
+        for t in ("a", "b", "c"):
+            tg.enqueue(t)
+        await asyncio.sleep(0.3)
+        assert [p["text"] for _, p in sent] == ["a\n\nb\n\nc"]
+        # merged text stays under Telegram's cap
+        big = "x" * (notifier.MAX_TEXT - 2)
+        tg.enqueue(big); tg.enqueue("y")
+        await asyncio.sleep(2.3)
+        assert [p["text"] for _, p in sent[1:]] == [big, "y"]
+        # switched off on the running notifier: one post per message
+        tg.coalesce = False
+        tg.enqueue("d"); tg.enqueue("e")
+        await asyncio.sleep(2.3)
+        assert [p["text"] for _, p in sent[3:]] == ["d", "e"]
+        await tg.close()
+    asyncio.run(go())
@@ -0,0 +1,32 @@
+import json
+
+from optimize import load_checkpoint, run_fingerprint
+
+def write(path, lines):
+    path.write_text("".join(json.dumps(x) + "\n" for x in lines), encoding="utf-8")
+
+def test_checkpoint_fingerprint(tmp_path):
+    data = tmp_path / "BTCUSDT-5m.csv"
+    data.write_text("1,2,3,4,5,6\n")
+    cfg = tmp_path / "config.yaml"
+    cfg.write_text("timeframes: {}\n")
+    groups = {"BTCUSDT": [str(data)]}
+    fp = run_fingerprint(groups, str(cfg), {}, 288)
+    assert fp == run_fingerprint(groups, str(cfg), {}, 288)
+    for other in (run_fingerprint(groups, str(cfg), {"rsi_length": 7}, 288),
+                  run_fingerprint(groups, str(cfg), {}, 100)):
+        assert other["fingerprint"] != fp["fingerprint"]
+
+    ck = tmp_path / "sweep.jsonl"
+    assert load_checkpoint(str(ck), fp["fingerprint"]) == {}
+    write(ck, [fp, {"id": "a", "signals": 1}])
+    with open(ck, "a", encoding="utf-8") as f:
+        f.write('{"id": "b", "sig')       # torn last line
+    assert list(load_checkpoint(str(ck), fp["fingerprint"])) == ["a"]
+
+    # same file, changed data or config: the checkpoint is refused
+    data.write_text("1,2,3,4,5,6\n7,8,9,10,11,12\n")
+    assert load_checkpoint(str(ck), run_fingerprint(groups, str(cfg), {}, 288)["fingerprint"]) is None
+    # checkpoints from before the header existed are refused too
+    write(ck, [{"id": "a", "signals": 1}])
+    assert load_checkpoint(str(ck), fp["fingerprint"]) is None
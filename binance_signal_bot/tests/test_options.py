@@ -0,0 +1,30 @@
+import json
+
+from options import OptionsStore
+
+def test_restart_required_clears_on_revert(tmp_path):
+    addon, user = tmp_path / "options.json", tmp_path / "user_config.json"
+    addon.write_text(json.dumps({"data_source": "rest", "min_confirms": 3}))
+    store = OptionsStore(str(addon), str(user), check_every=0)
+    assert store.restart_required() == []
+
+    store.update_user({"data_source": "ws", "min_confirms": 4})
+    assert store.get()["data_source"] == "ws"
+    # min_confirms applies live, only data_source needs a restart
+    assert store.restart_required() == ["data_source"]
+
+    store.update_user({"data_source": "rest"})
+    assert store.restart_required() == []
+    assert store.version == 3
+
+def test_snapshot_is_not_mutated(tmp_path):
+    addon, user = tmp_path / "options.json", tmp_path / "user_config.json"
+    addon.write_text(json.dumps({"top_n_by_volume": 120}))
+    store = OptionsStore(str(addon), str(user), check_every=0)
+    before = store.get()
+    store.update_user({"top_n_by_volume": 50})
+    assert before == {"top_n_by_volume": 120}
+    assert store.get() == {"top_n_by_volume": 50}
+    # an unchanged file is not swapped in again
+    assert store.refresh() is False
+    assert store.get() is store.get()
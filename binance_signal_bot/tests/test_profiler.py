@@ -0,0 +1,38 @@
+import asyncio, json
+
+from profiler import FlightRecorder
+
+def record_cycle(rec: FlightRecorder, walls):
+    rec.cycle_start(len(walls))
+    for sym, wall in walls.items():
+        span = rec.begin(0.001)
+        rec.on_stage(wall / 2, ("rules", ""))
+        rec.end(sym, span, wall, "ok")
+    return rec.cycle_end(sum(walls.values()))
+
+def test_over_budget_cycle_dumps_without_touching_the_buffer(tmp_path):
+    rec = FlightRecorder(keep=2, budget=1.0, out_dir=str(tmp_path))
+    assert record_cycle(rec, {"A-USDT": 0.2, "B-USDT": 0.3}) is None
+    reason = record_cycle(rec, {"A-USDT": 0.9, "B-USDT": 0.4, "C-USDT": 0.1})
+    assert reason and "budget" in reason
+
+    path = asyncio.run(rec.dump(reason))
+    assert rec.last_dump == path
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    assert data["reason"] == reason
+    assert data["cycles"][-1]["slowest"] == ["A-USDT", "B-USDT", "C-USDT"]
+    assert data["cycles"][-1]["symbols"]["A-USDT"]["rules"] == 450.0
+    # the recorder's own cycles stay as recorded
+    assert all("slowest" not in c for c in rec.cycles)
+
+    # keep=2: the oldest cycle leaves the buffer
+    record_cycle(rec, {"D-USDT": 0.1})
+    assert [list(c["symbols"]) for c in rec.snapshot()["cycles"]] == [["A-USDT", "B-USDT", "C-USDT"], ["D-USDT"]]
+
+def test_dump_failure_returns_none(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    rec = FlightRecorder(out_dir=str(blocker / "flight"))
+    assert asyncio.run(rec.dump("manual")) is None
+    assert rec.last_dump is None
@@ -0,0 +1,48 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from features import ohlcv_df, add_indicators
+from rules import should_signal
+from rules_batch import RuleBatch
+
+def frames(klines, seed: int, opts):
+    out = []
+    for j, step in enumerate((3_600_000, 900_000, 300_000)):
+        k = klines(300, step, seed * 3 + j, drift=0.0003)
+        # a last bar with low or high volume, for the RVOL branch
+        k[-1, 5] *= np.random.default_rng(seed * 3 + j).choice([0.5, 3.0])
+        out.append(add_indicators(ohlcv_df(k), opts))
+    return tuple(out)
+
+@pytest.mark.parametrize("opts", [
+    {},
+    {"rvol15m_min": 0.8, "ema200_5m_min_distance_pct": 0.0, "bias_rsi_min": 30, "breakout_lookback_bars": 5},
+    {"rvol15m_min": 0.5, "bias_need_ema_order": False, "macd_hist_rising_bars_min": 1, "macd_cross_up_allowed": False},
+])
+def test_batch_matches_should_signal(opts, klines, cfg):
+    symbols = [f"S{i:03d}-USDT" for i in range(120)]
+    data = {s: frames(klines, i, opts) for i, s in enumerate(symbols)}
+    # one symbol without data
+    data[symbols[0]] = (data[symbols[0]][0], data[symbols[0]][1].iloc[0:0], data[symbols[0]][2])
+
+    batch = RuleBatch(symbols, opts)
+    for s, (df1h, df15, df5) in data.items():
+        batch.set(s, df1h, df15, df5)
+    got = batch.evaluate(cfg, opts)
+    whys = Counter()
+    for s, (df1h, df15, df5) in data.items():
+        want = should_signal(df1h, df15, df5, cfg, opts)
+        have = got[s]
+        assert have["ok"] == want["ok"], s
+        whys[want.get("why", "ok")] += 1
+        if not want["ok"]:
+            assert have["why"] == want["why"], s
+            continue
+        assert have["confirms"] == want["confirms"] and have["reasons"] == want["reasons"], s
+        for k in ("entry", "sl", "rvol15m"):
+            assert have[k] == pytest.approx(want[k], rel=1e-12), (s, k)
+        assert have["tps"] == pytest.approx(want["tps"], rel=1e-12)
+    # the data exercises more than one branch
+    assert whys["ok"] and len(whys) >= 4, whys
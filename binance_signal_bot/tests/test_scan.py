@@ -0,0 +1,34 @@
+import asyncio
+
+from scan import evaluate_symbol
+from scheduler import DirtyTracker
+from synthetic import T0
+
+class FakeKu:
+    def __init__(self, bars):
+        self.bars = bars
+
+    async def fetch_candles(self, symbol, tf="5m", limit=300, start_time=None):
+        return self.bars[tf].copy()
+
+class Capture:
+    def set(self, sym, df1h, df15, df5):
+        self.frames = (df1h, df15, df5)
+
+def test_close_on_a_15m_boundary_drops_the_opening_buckets(klines, cfg):
+    # 5m close at 25h15m: a 15m bucket opens at B and the 1h bucket opened at 25h
+    B = T0 + 303 * 300_000
+    bars = {"5m": klines(304, 300_000, 1), "15m": klines(102, 900_000, 2), "1h": klines(26, 3_600_000, 3)}
+    assert bars["5m"][-1, 0] == bars["15m"][-1, 0] == B
+    ku, cap, tracker = FakeKu(bars), Capture(), DirtyTracker()
+
+    res = asyncio.run(evaluate_symbol("AAA-USDT", ku, cfg, {}, tracker=tracker, closed_before=B, batch=cap))
+    assert res["why"] == "batched"
+    last = [df["time"].iloc[-1].value // 1_000_000 for df in cap.frames]
+    assert last == [T0 + 24 * 3_600_000, B - 900_000, B - 300_000]
+
+    # the forming 15m/1h rows keep moving; the closed inputs did not
+    for tf in ("15m", "1h"):
+        bars[tf][-1, 2:6] *= 1.01
+    res = asyncio.run(evaluate_symbol("AAA-USDT", ku, cfg, {}, tracker=tracker, closed_before=B, batch=cap))
+    assert res["why"] == "unchanged"
@@ -0,0 +1,197 @@
+import threading
+from collections import Counter
+
+from shard import HashRing, ShardCoordinator
+
+SYMBOLS = [f"S{i:04d}-USDT" for i in range(2000)]
+
+def test_ring_balance():
+    ring = HashRing([f"shard-{i}" for i in range(4)])
+    counts = Counter(ring.owner(s) for s in SYMBOLS)
+    assert set(counts) == ring.nodes
+    # 64 virtual nodes keep every shard within ~±35% of a fair share
+    fair = len(SYMBOLS) / 4
+    for n in counts.values():
+        assert 0.65 * fair < n < 1.35 * fair
+
+def test_ring_add_moves_only_to_new_node():
+    ring = HashRing([f"shard-{i}" for i in range(4)])
+    before = {s: ring.owner(s) for s in SYMBOLS}
+    ring.add("shard-4")
+    after = {s: ring.owner(s) for s in SYMBOLS}
+    moved = [s for s in SYMBOLS if before[s] != after[s]]
+    # every moved symbol went to the new shard, and about 1/5 of them moved
+    assert all(after[s] == "shard-4" for s in moved)
+    assert 0.1 * len(SYMBOLS) < len(moved) < 0.3 * len(SYMBOLS)
+
+def test_ring_remove_moves_only_its_symbols():
+    ring = HashRing([f"shard-{i}" for i in range(4)])
+    before = {s: ring.owner(s) for s in SYMBOLS}
+    ring.remove("shard-2")
+    for s in SYMBOLS:
+        if before[s] != "shard-2":
+            assert ring.owner(s) == before[s]
+        else:
+            assert ring.owner(s) != "shard-2"
+
+def test_ring_add_remove_roundtrip_and_empty():
+    assert HashRing().owner("BTC-USDT") is None
+    ring = HashRing(["a", "b"])
+    before = {s: ring.owner(s) for s in SYMBOLS}
+    ring.add("c")
+    ring.remove("c")
+    assert {s: ring.owner(s) for s in SYMBOLS} == before
+
+def test_coordinator_expiry_and_reassignment():
+    coord = ShardCoordinator(timeout=60)
+    coord.symbols = SYMBOLS[:200]
+    a = coord.heartbeat("a", now=1000)
+    assert a == coord.symbols
+    b = coord.heartbeat("b", now=1010)
+    a = coord.heartbeat("a", now=1020)
+    assert set(a) | set(b) == set(coord.symbols) and not set(a) & set(b)
+    v = coord.version
+    assert all(coord.owns("b", s) for s in b)
+
+    # b stops heartbeating: after the timeout its symbols go back to a
+    a = coord.heartbeat("a", now=1075)
+    assert coord.version == v + 1
+    assert a == coord.symbols
+    assert not any(coord.owns("b", s) for s in b)
+    assert list(coord.status(now=1075)["shards"]) == ["a"]
+
+    # b rejoins and gets the same slice back
+    assert coord.heartbeat("b", now=1080) == b
+
+def test_coordinator_concurrent_heartbeats():
+    coord = ShardCoordinator(timeout=5)
+    coord.symbols = SYMBOLS[:100]
+    errors = []
+
+    def beat(i):
+        try:
+            for k in range(200):
+                # stale timestamps make every call expire somebody
+                coord.heartbeat(f"s{(i + k) % 6}", now=(k % 3) * 10)
+                coord.owns(f"s{i}", SYMBOLS[k % 100])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=beat, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    keys, owners = coord.ring._points
+    assert len(keys) == len(owners) == 64 * len(coord.ring.nodes)
+
+# --- several worker processes against a fake coordinator ---
+
+import argparse, os, signal, socket, subprocess, sys, time
+
+import pytest
+import uvicorn
+from fastapi import FastAPI, Request
+
+import shard
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+
+def serve(app) -> str:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error"))
+    threading.Thread(target=server.run, daemon=True).start()
+    for _ in range(100):
+        if server.started:
+            return f"http://127.0.0.1:{port}"
+        time.sleep(0.05)
+    raise RuntimeError("server did not start")
+
+def fake_coordinator(symbols, cfg, binance_url: str, secret: str, timeout: float):
+    # the /api/shard endpoints of main.py over a real ShardCoordinator; it
+    # hands out symbols once two shards have joined, so the split is stable
+    coord = shard.ShardCoordinator(timeout=timeout)
+    opts = {"binance_rest_url": binance_url, "derive_higher_tfs": False, "schedule": "interval"}
+    posts = []
+    app = FastAPI()
+
+    @app.get("/api/shard/assignment")
+    async def assignment(request: Request):
+        assert request.headers.get(shard.SECRET_HEADER) == secret
+        sid = request.query_params["shard"]
+        mine = coord.heartbeat(sid)
+        if not coord.symbols and len(coord.status()["shards"]) >= 2:
+            coord.symbols = list(symbols)
+        return {"version": coord.version, "symbols": mine, "cfg": cfg, "opts": opts,
+                "heartbeat": shard.heartbeat_seconds(coord.timeout)}
+
+    @app.post("/api/shard/results")
+    async def results(request: Request):
+        data = await request.json()
+        posts.append((data["shard"], {i["symbol"] for i in data["items"]}))
+        return {"ok": True}
+
+    return app, coord, posts
+
+def worker_pids(base: str):
+    out = {}
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                args = f.read().decode().split("\0")
+        except OSError:
+            continue
+        if "--id" in args and args[args.index("--id") + 1].startswith(base + "-"):
+            out[args[args.index("--id") + 1]] = int(pid)
+    return out
+
+def wait_for(cond, seconds: float = 60):
+    end = time.time() + seconds
+    while time.time() < end:
+        if cond():
+            return True
+        time.sleep(0.1)
+    return False
+
+def test_worker_imports_no_addon_state():
+    # what ShardWorker.run imports must not pull in main (options, web app, feeds)
+    code = "import sys, shard, scan, metrics; assert not {'main', 'options', 'feed', 'fastapi'} & set(sys.modules)"
+    subprocess.run([sys.executable, "-c", code], cwd=APP, check=True)
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="finds the worker processes in /proc")
+def test_local_workers_split_and_reassign(cfg):
+    from fake_binance import Market, build_app, symbol_names
+    names = symbol_names(12)
+    symbols = [f"{s[:-4]}-USDT" for s in names]
+    binance = serve(build_app(Market(names)))
+    app, coord, posts = fake_coordinator(symbols, cfg, binance, "s3cret", timeout=2.0)
+    url = serve(app)
+    base = f"test{os.getpid()}"
+    a = argparse.Namespace(coordinator=url, secret="s3cret", id=base, local=2, weight_limit=6000)
+    runner = threading.Thread(target=shard.run_local, args=(a,), daemon=True)
+    runner.start()
+    try:
+        # every symbol is scanned by exactly one of the two workers
+        assert wait_for(lambda: len({s for s, _ in posts}) == 2), posts
+        first = {}
+        for sid, syms in posts:
+            first.setdefault(sid, syms)
+        owners = coord.ring.assign(symbols)
+        assert first == {sid: set(owners[sid]) for sid in owners}
+        assert set.union(*first.values()) == set(symbols)
+        assert not set.intersection(*first.values())
+
+        # one worker dies: after the timeout the other one takes all symbols
+        pids = worker_pids(base)
+        assert sorted(pids) == [f"{base}-0", f"{base}-1"]
+        os.kill(pids[f"{base}-1"], signal.SIGKILL)
+        n = len(posts)
+        assert wait_for(lambda: any(sid == f"{base}-0" and syms == set(symbols) for sid, syms in posts[n:])), posts[n:]
+        assert f"{base}-1" not in coord.status()["shards"]
+    finally:
+        for pid in worker_pids(base).values():
+            os.kill(pid, signal.SIGKILL)
+        runner.join(10)
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from signals_db import SignalStore
+from synthetic import T0
+
+STEP = 300_000
+SIGNAL = {"entry": 100.0, "sl": 98.0, "reasons": ["test"]}
+TPS = [101.0, 102.0, 103.0]
+# sent a few seconds after the close of the T0 + STEP bar the rules ran on
+TS = T0 + 2 * STEP + 5_000
+
+def bars(*hl, start=T0 + STEP):
+    # rows [time, open, close, high, low, volume] with the given (high, low)
+    return np.array([[start + i * STEP, 100, 100, h, l, 1] for i, (h, l) in enumerate(hl)], dtype=np.float64)
+
+@pytest.fixture
+def store(tmp_path):
+    s = SignalStore(str(tmp_path / "signals.db"), step_ms=STEP, max_age_ms=4 * STEP)
+    yield s
+    s.close()
+
+def test_first_full_bar_after_entry_counts_then_the_stop(store):
+    sid = store.record("AAA-USDT", SIGNAL, 2, TPS, ts_ms=TS)
+    # the computed-on bar is skipped; TP1 on the next bar, the stop after it
+    b = bars((150, 50), (101.5, 99), (100.5, 97))
+    assert store.update("AAA-USDT", b[:2], now_ms=T0 + 3 * STEP) == 0
+    assert store.open_symbols() == ["AAA-USDT"]
+    assert store.update("AAA-USDT", b, now_ms=T0 + 4 * STEP) == 1
+    rec = store.page()["items"][0]
+    assert rec["id"] == sid
+    assert (rec["status"], rec["tp_hit"], rec["sl_hit"], rec["checked_until"]) == ("tp1", 1, 0, T0 + 3 * STEP)
+    assert store.open_symbols() == []
+
+def test_bar_touching_both_levels_is_the_stop(store):
+    store.record("AAA-USDT", SIGNAL, 2, TPS, ts_ms=TS)
+    assert store.update("AAA-USDT", bars((150, 50), (101.5, 97.5)), now_ms=T0 + 3 * STEP) == 1
+    rec = store.page()["items"][0]
+    assert (rec["status"], rec["tp_hit"], rec["sl_hit"]) == ("sl", 0, 1)
+
+def test_open_signal_expires(store):
+    store.record("AAA-USDT", SIGNAL, 2, TPS, ts_ms=TS)
+    flat = bars(*[(100.5, 99.5)] * 6)
+    # expires 4 bars after TS: still open with the T0 + 4 * STEP bar closed
+    assert store.update("AAA-USDT", flat, now_ms=T0 + 5 * STEP) == 0
+    assert store.update("AAA-USDT", flat, now_ms=T0 + 7 * STEP) == 1
+    rec = store.page()["items"][0]
+    assert (rec["status"], rec["tp_hit"], rec["sl_hit"]) == ("expired", 0, 0)
+
+def test_open_signals_survive_a_restart(tmp_path):
+    path = str(tmp_path / "signals.db")
+    s = SignalStore(path, step_ms=STEP)
+    s.record("AAA-USDT", SIGNAL, 2, TPS, ts_ms=TS)
+    s.close()
+    s = SignalStore(path, step_ms=STEP)
+    assert s.open_symbols() == ["AAA-USDT"] and s.oldest_check("AAA-USDT") == T0 + STEP
+    s.close()
+
+def test_page_walks_newest_first_with_the_cursor(store):
+    ids = [store.record(sym, SIGNAL, 2, TPS, ts_ms=TS + i) for i, sym in enumerate(["AAA-USDT", "BBB-USDT"] * 3)]
+    seen, before = [], None
+    while True:
+        p = store.page(before_id=before, limit=4)
+        seen += [r["id"] for r in p["items"]]
+        before = p["next_before_id"]
+        if before is None:
+            break
+    assert seen == ids[::-1]
+    p = store.page(symbol="BBB-USDT", limit=2)
+    assert [r["id"] for r in p["items"]] == [ids[5], ids[3]] and p["next_before_id"] == ids[3]
+    p = store.page(symbol="BBB-USDT", before_id=p["next_before_id"], limit=2)
+    assert [r["id"] for r in p["items"]] == [ids[1]] and p["next_before_id"] is None
+    assert p["items"][0]["reasons"] == ["test"]
+    store.update("AAA-USDT", bars((150, 50), (100.5, 97)), now_ms=T0 + 3 * STEP)
+    assert [r["symbol"] for r in store.page(status="sl")["items"]] == ["AAA-USDT"] * 3
+    assert len(store.page(status="open")["items"]) == 3
+
+def test_stats_per_symbol_and_confirms(store):
+    store.record("AAA-USDT", SIGNAL, 2, TPS, ts_ms=TS)
+    store.record("AAA-USDT", SIGNAL, 3, TPS, ts_ms=TS)
+    store.record("BBB-USDT", SIGNAL, 3, TPS, ts_ms=TS)
+    store.record("CCC-USDT", SIGNAL, 3, TPS, ts_ms=TS)
+    # AAA: both reach TP2 and stop; BBB stops out; CCC stays open
+    store.update("AAA-USDT", bars((150, 50), (102.5, 99), (100, 97)), now_ms=T0 + 4 * STEP)
+    store.update("BBB-USDT", bars((150, 50), (100, 97)), now_ms=T0 + 3 * STEP)
+    by_sym = {r["symbol"]: r for r in store.stats()}
+    assert by_sym["AAA-USDT"] == {"symbol": "AAA-USDT", "signals": 2, "closed": 2, "open": 0, "tp1_rate": 1.0,
+                                  "tp2_rate": 1.0, "tp3_rate": 0.0, "sl_rate": 0.0, "expired": 0}
+    assert by_sym["BBB-USDT"]["sl_rate"] == 1.0 and by_sym["BBB-USDT"]["tp1_rate"] == 0.0
+    assert by_sym["CCC-USDT"]["open"] == 1 and by_sym["CCC-USDT"]["tp1_rate"] is None
+    by_conf = {r["confirms"]: r for r in store.stats(by="confirms")}
+    assert (by_conf[2]["signals"], by_conf[2]["closed"]) == (1, 1)
+    assert (by_conf[3]["signals"], by_conf[3]["closed"], by_conf[3]["open"]) == (3, 2, 1)
+    assert by_conf[3]["tp1_rate"] == by_conf[3]["sl_rate"] == 0.5
@@ -0,0 +1,119 @@
+import asyncio, json
+
+import websockets
+
+from binance_stream import BinanceStream, MAX_STREAMS
+
+class FakeCache:
+    def __init__(self):
+        self.live = set()
+        self.rows = {}
+
+    async def refresh(self, symbol, tf, backfill=False):
+        return None
+
+    def apply(self, symbol, tf, row):
+        self.rows.setdefault((symbol, tf), []).append(row)
+        return True
+
+def kline(sym, tf, t, close, x=False):
+    return json.dumps({"data": {"e": "kline", "s": sym.replace("-", ""),
+                                "k": {"t": t, "i": tf, "o": 1, "c": close, "h": 1, "l": 1, "v": 1, "x": x}}})
+
+def symbols(n):
+    return [f"S{i:04d}-USDT" for i in range(n)]
+
+def test_slow_on_close_does_not_block_the_reader():
+    async def go():
+        cache = FakeCache()
+        started, release, seen = asyncio.Event(), asyncio.Event(), []
+
+        async def on_close(sym):
+            seen.append([r[2] for r in cache.rows[(sym, "5m")]])
+            started.set()
+            await release.wait()
+
+        st = BinanceStream(None, cache, ["AAA-USDT", "BBB-USDT"], ["5m"], "5m", on_close)
+        closer = asyncio.create_task(st._closer())
+        await st.handle(kline("AAA-USDT", "5m", 0, 10, x=True))
+        await started.wait()
+        # on_close is still running: the reader keeps going
+        await st.handle(kline("AAA-USDT", "5m", 300_000, 11))
+        await st.handle(kline("BBB-USDT", "5m", 0, 20))
+        await st.handle(json.dumps({"data": {"s": "BBBUSDT", "b": "1", "a": "2"}}))
+        assert st.level1["BBB-USDT"] == {"bestBid": "1", "bestAsk": "2"}
+        assert cache.rows[("BBB-USDT", "5m")] == [[0, 1, 20, 1, 1, 1]]
+        # the next AAA bar waits until the closed one has been evaluated
+        assert [r[2] for r in cache.rows[("AAA-USDT", "5m")]] == [10]
+        release.set()
+        await asyncio.sleep(0.01)
+        assert seen == [[10]]
+        assert [r[2] for r in cache.rows[("AAA-USDT", "5m")]] == [10, 11]
+        assert not st._pending
+        closer.cancel()
+    asyncio.run(go())
+
+def test_close_during_evaluation_is_queued_again():
+    async def go():
+        cache = FakeCache()
+        release, calls = asyncio.Event(), []
+
+        async def on_close(sym):
+            calls.append(cache.rows[(sym, "5m")][-1][0])
+            await release.wait()
+
+        st = BinanceStream(None, cache, ["AAA-USDT"], ["5m"], "5m", on_close)
+        closer = asyncio.create_task(st._closer())
+        await st.handle(kline("AAA-USDT", "5m", 0, 10, x=True))
+        await asyncio.sleep(0)
+        await st.handle(kline("AAA-USDT", "5m", 300_000, 11, x=True))
+        release.set()
+        await asyncio.sleep(0.01)
+        assert calls == [0, 300_000]
+        closer.cancel()
+    asyncio.run(go())
+
+def test_streams_are_split_over_connections():
+    async def go():
+        subs = []
+
+        async def handler(ws):
+            mine = []
+            subs.append(mine)
+            async for raw in ws:
+                req = json.loads(raw)
+                if req["method"] == "SUBSCRIBE":
+                    mine.extend(req["params"])
+                else:
+                    for p in req["params"]:
+                        mine.remove(p)
+                await ws.send(json.dumps({"result": None, "id": req["id"]}))
+
+        async with websockets.serve(handler, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            # 500 symbols x (3 klines + bookTicker) = 2000 streams
+            st = BinanceStream(None, FakeCache(), symbols(500), ["5m", "15m", "1h"], "5m", None,
+                               ws_url=f"ws://127.0.0.1:{port}")
+            task = asyncio.create_task(st.run())
+            for _ in range(200):
+                await asyncio.sleep(0.05)
+                if st.connected and sum(map(len, subs)) == 2000:
+                    break
+            assert len(subs) == 2
+            assert all(len(s) <= MAX_STREAMS for s in subs)
+            assert sorted(sum(subs, [])) == sorted(st.streams())
+            # a bigger universe opens a third connection, a removal unsubscribes in place
+            await st.set_symbols(symbols(700)[1:])
+            for _ in range(200):
+                await asyncio.sleep(0.05)
+                if st.connected and sum(map(len, subs)) == 699 * 4:
+                    break
+            assert len(subs) == 3
+            assert all(len(s) <= MAX_STREAMS for s in subs)
+            assert sorted(sum(subs, [])) == sorted(st.streams())
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    asyncio.run(go())
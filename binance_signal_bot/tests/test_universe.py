@@ -0,0 +1,33 @@
+import asyncio
+
+from universe import build_symbol_universe, is_leveraged_token, SymbolUniverse
+
+class FakeTickers:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def fetch_all_tickers(self, quote):
+        return {"data": {"ticker": [{"symbol": s, "volValue": str(v)} for s, v in self.rows]}}
+
+def test_leveraged_tokens_only_from_the_list():
+    for s in ("BTCUP-USDT", "ETHDOWN-USDT", "1INCHUP-USDT", "BULL-USDT", "XRPBEAR-USDT"):
+        assert is_leveraged_token(s)
+    # real spot coins that happen to end in the same letters
+    for s in ("SYRUP-USDT", "JUP-USDT", "SUNDOWN-USDT", "BTC-USDT", "PUMPBULL-USDT"):
+        assert not is_leveraged_token(s)
+
+def test_universe_keeps_syrup_and_drops_blvts():
+    ku = FakeTickers([("BTC-USDT", 9e9), ("BTCUP-USDT", 8e9), ("SYRUP-USDT", 2e7), ("ETHBEAR-USDT", 1e8),
+                      ("SOL-BTC", 1e9), ("DUST-USDT", 10)])
+    got = asyncio.run(build_symbol_universe(ku, "USDT", 10, 5e6))
+    assert got == ["BTC-USDT", "SYRUP-USDT"]
+
+def test_refresh_reports_added_and_removed():
+    ku = FakeTickers([("A-USDT", 3e7), ("B-USDT", 2e7)])
+    u = SymbolUniverse(ku, {"top_n_by_volume": 2})
+    seen = []
+    u.listeners.append(lambda a, r: seen.append((a, r)))
+    asyncio.run(u.refresh())
+    ku.rows = [("A-USDT", 3e7), ("C-USDT", 4e7)]
+    asyncio.run(u.refresh())
+    assert seen == [(["A-USDT", "B-USDT"], []), (["C-USDT"], ["B-USDT"])]
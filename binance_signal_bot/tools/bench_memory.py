@@ -0,0 +1,125 @@
+# Memory footprint of the per-symbol market state, DataFrame vs compact.
+#
+#   python tools/bench_memory.py                         # 100/500 symbols, all modes
+#   python tools/bench_memory.py --sizes 1000 --modes before,compact32
+#
+# Every (mode, size) runs in its own process. It seeds IndicatorEngine state
+# for 5m/15m/1h of N synthetic symbols (HISTORY_BARS each, as CandleCache
+# keeps), then runs scan cycles: one new 5m bar per symbol, frames for the
+# three timeframes and should_signal. Reported: resident memory per tracked
+# symbol after seeding, peak traced allocations during a scan (tracemalloc),
+# gen-0 GC collections per scan and scan time.
+#   before     no indicator state: add_indicators over the whole window per
+#              frame (incremental_indicators: false, the original path)
+#   frames     deque-of-tuples state, a pandas DataFrame per frame (compact_state: false)
+#   compact    ring buffers + MarketFrame views, float64
+#   compact32  the same with state_float32
+import argparse, gc, json, os, subprocess, sys, time, tracemalloc
+import numpy as np
+import yaml
+from synthetic import klines
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(HERE, "..", "app")
+sys.path.insert(0, APP)
+
+TFS = (("5m", 300_000), ("15m", 900_000), ("1h", 3_600_000))
+MODES = ("before", "frames", "compact", "compact32")
+
+def rss_bytes() -> int:
+    # current resident set (not the peak): what the state really holds
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def run(mode: str, n: int, cycles: int) -> dict:
+    from candles import HISTORY_BARS
+    from engine import IndicatorEngine
+    from features import ohlcv_df, add_indicators
+    from rules import should_signal
+
+    with open(os.path.join(APP, "config.yaml"), encoding="utf-8") as f:
+        cfg = yaml.safe_load(f)
+    opts = {}
+    symbols = [f"S{i:04d}-USDT" for i in range(n)]
+    # the raw klines (what CandleCache holds) exist in every mode
+    raw = {(s, tf): klines(HISTORY_BARS + cycles + 1, step, i * 7 + j, vol=0.003) for i, s in enumerate(symbols)
+           for j, (tf, step) in enumerate(TFS)}
+    gc.collect()
+    base = rss_bytes()
+
+    if mode == "before":
+        engine = None
+    elif mode == "frames":
+        engine = IndicatorEngine(vwap_window=HISTORY_BARS)
+    else:
+        engine = IndicatorEngine(vwap_window=HISTORY_BARS, compact=True,
+                                 dtype=np.float32 if mode == "compact32" else np.float64)
+    for (s, tf), k in raw.items():
+        if engine is not None:
+            engine.update(s, tf, k[:HISTORY_BARS], opts)
+    gc.collect()
+    state = rss_bytes() - base
+
+    def scan(c: int):
+        for s in symbols:
+            frames = []
+            for tf, _ in TFS:
+                k = raw[(s, tf)]
+                # 5m gets a new bar each cycle, the others a revised forming bar
+                end = HISTORY_BARS + c + 1 if tf == "5m" else HISTORY_BARS
+                w = k[end - HISTORY_BARS:end]
+                frames.append(engine.update(s, tf, w, opts) if engine is not None else add_indicators(ohlcv_df(w), opts))
+            should_signal(frames[2], frames[1], frames[0], cfg, opts)
+
+    times, gens = [], []
+    for c in range(cycles):
+        gc.collect()
+        g0 = gc.get_stats()[0]["collections"]
+        t = time.perf_counter()
+        scan(c)
+        times.append(time.perf_counter() - t)
+        gens.append(gc.get_stats()[0]["collections"] - g0)
+    # one more cycle under tracemalloc (it slows Python down, so it is not timed)
+    tracemalloc.start()
+    scan(cycles)
+    alloc = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"mode": mode, "symbols": n, "state_mb": state / 2**20, "kb_per_symbol": state / n / 1024,
+            "peak_alloc_mb": alloc / 2**20, "gc0_per_scan": float(np.median(gens)),
+            "ms_per_scan": float(np.median(times)) * 1000}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="100,500")
+    ap.add_argument("--modes", default=",".join(MODES))
+    ap.add_argument("--cycles", type=int, default=5)
+    ap.add_argument("--save", default=None)
+    ap.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    a = ap.parse_args()
+
+    if a.child is not None:
+        mode, n = a.child.split(":")
+        print(json.dumps(run(mode, int(n), a.cycles)))
+        return
+
+    results = []
+    for n in (int(x) for x in a.sizes.split(",") if x):
+        for mode in (m for m in a.modes.split(",") if m):
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", f"{mode}:{n}",
+                                  "--cycles", str(a.cycles)], capture_output=True, text=True, check=True)
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print(f"{'mode':>10} {'symbols':>8} {'state MB':>9} {'KB/symbol':>10} {'peak alloc MB':>14} {'gc0/scan':>9} {'ms/scan':>8}")
+    for r in results:
+        print(f"{r['mode']:>10} {r['symbols']:>8} {r['state_mb']:>9.1f} {r['kb_per_symbol']:>10.1f} "
+              f"{r['peak_alloc_mb']:>14.1f} {r['gc0_per_scan']:>9.0f} {r['ms_per_scan']:>8.0f}")
+    if a.save:
+        with open(a.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
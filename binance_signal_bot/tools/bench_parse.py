@@ -0,0 +1,72 @@
+# Micro-benchmark: kline payload -> OHLCV DataFrame, row-wise (previous
+# fetch_candles + ohlcv_df) vs the columnar parse_klines + ohlcv_df path.
+#
+#   python tools/bench_parse.py --rows 300 --repeat 2000
+import argparse, json, os, sys, time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from kucoin_client import parse_klines
+from features import ohlcv_df
+
+def synthetic_payload(n: int, seed: int = 1) -> str:
+    rng = np.random.default_rng(seed)
+    t0 = 1_700_000_000_000 - 1_700_000_000_000 % 300_000
+    c = 100 * np.exp(np.cumsum(rng.normal(0, 0.003, n)))
+    o = np.r_[c[0], c[:-1]]
+    h = np.maximum(o, c) * 1.001; l = np.minimum(o, c) * 0.999
+    v = rng.random(n) * 1000
+    rows = [[t0 + i * 300_000, f"{o[i]:.8f}", f"{h[i]:.8f}", f"{l[i]:.8f}", f"{c[i]:.8f}", f"{v[i]:.8f}",
+             t0 + (i + 1) * 300_000 - 1, f"{v[i] * c[i]:.8f}", 100, "1.0", "1.0", "0"] for i in range(n)]
+    return json.dumps(rows)
+
+def legacy_fetch_rows(data):
+    out = []
+    for k in data:
+        open_time = k[0]
+        open_p = k[1]; high = k[2]; low = k[3]; close = k[4]; vol = k[5]
+        out.append([open_time, open_p, close, high, low, vol])
+    return out
+
+def legacy_ohlcv_df(klines):
+    if not klines:
+        return pd.DataFrame(columns=["time","open","high","low","close","volume"])
+    rows = []
+    for k in klines:
+        t = int(float(k[0]))
+        rows.append({"time": pd.to_datetime(t, unit="ms"),
+                     "open": float(k[1]), "close": float(k[2]),
+                     "high": float(k[3]), "low": float(k[4]),
+                     "volume": float(k[5])})
+    return pd.DataFrame(rows).sort_values("time").reset_index(drop=True)
+
+def bench(fn, repeat: int) -> float:
+    fn()
+    t = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t) / repeat
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=300)
+    ap.add_argument("--repeat", type=int, default=500)
+    a = ap.parse_args()
+    data = json.loads(synthetic_payload(a.rows))
+
+    old = legacy_ohlcv_df(legacy_fetch_rows(data))
+    new = ohlcv_df(parse_klines(data))
+    assert (old["time"].values == new["time"].values).all()
+    for col in ("open","high","low","close","volume"):
+        assert np.array_equal(old[col].values, new[col].values), col
+
+    t_old = bench(lambda: legacy_ohlcv_df(legacy_fetch_rows(data)), a.repeat)
+    t_new = bench(lambda: ohlcv_df(parse_klines(data)), a.repeat)
+    print(f"rows={a.rows} repeat={a.repeat}")
+    print(f"row-wise : {t_old * 1e3:8.3f} ms/parse")
+    print(f"columnar : {t_new * 1e3:8.3f} ms/parse")
+    print(f"speedup  : {t_old / t_new:8.1f}x")
+
+if __name__ == "__main__":
+    main()
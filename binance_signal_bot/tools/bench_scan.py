@@ -0,0 +1,148 @@
+# Scan throughput benchmark against tools/fake_binance.py.
+#
+#   python tools/bench_scan.py                              # 5/50/200/500 symbols
+#   python tools/bench_scan.py --sizes 50,200 --latency-ms 30 --mode engine
+#   python tools/bench_scan.py --save base.json             # record a baseline
+#   python tools/bench_scan.py --compare base.json          # exit 1 on regression
+#
+# Every size runs in its own process (so peak RSS is per size) through the
+# real KucoinClient -> fetch_df -> should_signal path of scan.py.
+import argparse, asyncio, json, os, resource, subprocess, sys, time
+import httpx
+import numpy as np
+import yaml
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(HERE, "..", "app")
+sys.path.insert(0, APP)
+
+def start_server(port: int, symbols: int, latency_ms: float, jitter_ms: float) -> subprocess.Popen:
+    proc = subprocess.Popen([sys.executable, os.path.join(HERE, "fake_binance.py"), "--port", str(port),
+                             "--symbols", str(symbols), "--latency-ms", str(latency_ms), "--jitter-ms", str(jitter_ms)])
+    url = f"http://127.0.0.1:{port}/api/v3/ping"
+    for _ in range(100):
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("fake Binance server did not come up")
+
+async def run_size(url: str, n: int, cycles: int, warmup: int, concurrency: int, mode: str) -> dict:
+    import scan
+    from universe import build_symbol_universe
+    from kucoin_client import KucoinClient
+    from candles import CandleCache
+    from engine import IndicatorEngine
+
+    with open(os.path.join(APP, "config.yaml"), encoding="utf-8") as f:
+        cfg = yaml.safe_load(f)
+    opts = {}
+    # no client-side weight throttling: we measure the pipeline, not the budget
+    ku = KucoinClient(weight_limit=10**9, base_url=url)
+    symbols = await build_symbol_universe(ku, "USDT", n, 0)
+    cache = CandleCache(ku) if mode in ("cache", "engine", "compact") else None
+    engine = None
+    if mode in ("engine", "compact"):
+        engine = IndicatorEngine(vwap_window=cache.history, compact=mode == "compact")
+
+    lat, errors = [], 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(sym: str):
+        nonlocal errors
+        async with sem:
+            t = time.perf_counter()
+            try:
+                await scan.evaluate_symbol(sym, ku, cfg, opts, cache, engine)
+            except Exception:
+                errors += 1
+            lat.append(time.perf_counter() - t)
+
+    walls, cpus = [], []
+    for c in range(warmup + cycles):
+        if c == warmup:
+            lat.clear(); errors = 0
+        t, cpu = time.perf_counter(), time.process_time()
+        await asyncio.gather(*(one(s) for s in symbols))
+        if c >= warmup:
+            walls.append(time.perf_counter() - t); cpus.append(time.process_time() - cpu)
+    await ku.close()
+    lat_ms = np.array(lat) * 1000
+    return {"symbols": len(symbols), "mode": mode, "cycles": cycles,
+            "cycles_per_sec": cycles / sum(walls),
+            "p50_ms": float(np.percentile(lat_ms, 50)), "p99_ms": float(np.percentile(lat_ms, 99)),
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "cpu_s_per_cycle": sum(cpus) / cycles, "errors": errors}
+
+def compare(results: list, baseline_path: str, tolerance: float) -> bool:
+    base = {(r["symbols"], r["mode"]): r for r in json.load(open(baseline_path, encoding="utf-8"))}
+    ok = True
+    for r in results:
+        b = base.get((r["symbols"], r["mode"]))
+        if not b:
+            continue
+        if r["cycles_per_sec"] < b["cycles_per_sec"] * (1 - tolerance):
+            print(f"REGRESSION {r['symbols']} symbols: {r['cycles_per_sec']:.2f} cycles/s vs {b['cycles_per_sec']:.2f}")
+            ok = False
+        if r["p99_ms"] > b["p99_ms"] * (1 + tolerance):
+            print(f"REGRESSION {r['symbols']} symbols: p99 {r['p99_ms']:.1f} ms vs {b['p99_ms']:.1f} ms")
+            ok = False
+    return ok
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="5,50,200,500")
+    ap.add_argument("--cycles", type=int, default=3)
+    ap.add_argument("--warmup", type=int, default=1)
+    ap.add_argument("--concurrency", type=int, default=8, help="same meaning as scan_concurrency")
+    ap.add_argument("--mode", choices=("rest", "cache", "engine", "compact"), default="rest",
+                    help="rest: full fetch + add_indicators per cycle; cache/engine/compact: the cached paths")
+    ap.add_argument("--port", type=int, default=8900)
+    ap.add_argument("--url", default=None, help="use an already running server instead of starting one")
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--save", default=None)
+    ap.add_argument("--compare", default=None)
+    ap.add_argument("--tolerance", type=float, default=0.2)
+    ap.add_argument("--child", type=int, default=None, help=argparse.SUPPRESS)
+    a = ap.parse_args()
+
+    if a.child is not None:
+        res = asyncio.run(run_size(a.url, a.child, a.cycles, a.warmup, a.concurrency, a.mode))
+        print(json.dumps(res))
+        return
+
+    sizes = [int(x) for x in a.sizes.split(",") if x]
+    proc = None
+    url = a.url
+    if url is None:
+        proc = start_server(a.port, max(sizes), a.latency_ms, a.jitter_ms)
+        url = f"http://127.0.0.1:{a.port}"
+    results = []
+    try:
+        for n in sizes:
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", str(n), "--url", url,
+                                  "--cycles", str(a.cycles), "--warmup", str(a.warmup),
+                                  "--concurrency", str(a.concurrency), "--mode", a.mode],
+                                 capture_output=True, text=True, check=True)
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    finally:
+        if proc is not None:
+            proc.terminate(); proc.wait()
+
+    print(f"mode={a.mode} concurrency={a.concurrency} cycles={a.cycles} latency={a.latency_ms}ms")
+    print(f"{'symbols':>8} {'cycles/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'RSS MB':>8} {'CPU s/cyc':>10} {'errors':>7}")
+    for r in results:
+        print(f"{r['symbols']:>8} {r['cycles_per_sec']:>9.3f} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+              f"{r['peak_rss_mb']:>8.1f} {r['cpu_s_per_cycle']:>10.3f} {r['errors']:>7}")
+    if a.save:
+        with open(a.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if a.compare and not compare(results, a.compare, a.tolerance):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
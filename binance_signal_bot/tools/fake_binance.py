@@ -0,0 +1,175 @@
+# Local stand-in for the Binance REST endpoints the bot uses.
+#
+#   python tools/fake_binance.py --symbols 500 --latency-ms 40 --jitter-ms 20
+#   python tools/fake_binance.py --data recorded/ --rate-limit-every 200
+#
+# Serves /api/v3/ticker/24hr, /api/v3/klines and /api/v3/ticker/bookTicker
+# from a deterministic random walk per symbol, or from recorded klines
+# (<dir>/<SYMBOL>_<interval>.json, the raw /api/v3/klines response).
+# Point the add-on at it with binance_rest_url: http://127.0.0.1:8900
+import argparse, asyncio, json, os, random, time, zlib
+from typing import Dict, List, Optional
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+INTERVAL_MS = {"1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+               "1h": 3_600_000, "2h": 7_200_000, "4h": 14_400_000}
+WEIGHTS = {"/api/v3/ticker/24hr": 80, "/api/v3/klines": 2, "/api/v3/ticker/bookTicker": 2}
+
+def symbol_names(n: int) -> List[str]:
+    majors = ["BTC", "ETH", "SOL", "BNB", "XRP"]
+    return [f"{b}USDT" for b in majors[:n]] + [f"S{i:03d}USDT" for i in range(max(0, n - len(majors)))]
+
+class Market:
+    # Synthetic bars are built from a deterministic 1m path per symbol, so
+    # overlapping startTime/limit windows and different intervals all agree.
+    def __init__(self, symbols: List[str], data_dir: Optional[str] = None):
+        self.symbols = symbols
+        self._rank = {s: i for i, s in enumerate(symbols)}
+        self.data_dir = data_dir
+        self._recorded: Dict[str, list] = {}
+
+    def _seed(self, symbol: str) -> int:
+        return zlib.crc32(symbol.encode())
+
+    def _base_price(self, symbol: str) -> float:
+        return 0.05 + (self._seed(symbol) % 100_000) / 10.0
+
+    def _recorded_rows(self, symbol: str, interval: str):
+        if not self.data_dir:
+            return None
+        key = f"{symbol}_{interval}"
+        if key not in self._recorded:
+            path = os.path.join(self.data_dir, key + ".json")
+            self._recorded[key] = json.load(open(path, encoding="utf-8")) if os.path.exists(path) else None
+        return self._recorded[key]
+
+    def klines(self, symbol: str, interval: str, limit: int, start: Optional[int], end: Optional[int]) -> list:
+        rows = self._recorded_rows(symbol, interval)
+        if rows is not None:
+            if start is not None:
+                rows = [r for r in rows if r[0] >= start]
+            if end is not None:
+                rows = [r for r in rows if r[0] <= end]
+            return rows[:limit] if start is not None else rows[-limit:]
+
+        step = INTERVAL_MS[interval]
+        now = int(time.time() * 1000)
+        last_open = now - now % step
+        if end is not None:
+            last_open = min(last_open, end - end % step)
+        first = last_open - (limit - 1) * step
+        if start is not None:
+            first = start + (-start) % step
+            last_open = min(last_open, first + (limit - 1) * step)
+        if last_open < first:
+            return []
+        opens = np.arange(first, last_open + 1, step, dtype=np.int64)
+        # every interval aggregates the same 1m path, a pure function of
+        # (symbol, minute), so 5m bars resample exactly into 15m/1h bars
+        base = self._base_price(symbol)
+        seed = self._seed(symbol)
+        per = step // 60_000
+        m = (opens[:, None] // 60_000 + np.arange(per)[None, :])
+
+        def noise(k):
+            return ((k * 2654435761 + seed) % 1_000_003) / 1_000_003.0
+
+        def price(k):
+            return base * (1 + np.sin(k / 185.0 + seed % 7) * 0.02 + np.sin(k / 2005.0) * 0.05 + (noise(k) - 0.5) * 0.002)
+
+        u = noise(m)
+        c1 = price(m); o1 = price(m - 1)
+        open_ = o1[:, 0]
+        close = c1[:, -1]
+        high = (np.maximum(o1, c1) * (1 + u * 0.001)).max(axis=1)
+        low = (np.minimum(o1, c1) * (1 - (1 - u) * 0.001)).min(axis=1)
+        vol = (20 + u * 200).sum(axis=1)
+        out = []
+        for i in range(len(opens)):
+            t = int(opens[i])
+            out.append([t, f"{open_[i]:.8f}", f"{high[i]:.8f}", f"{low[i]:.8f}", f"{close[i]:.8f}", f"{vol[i]:.8f}",
+                        t + step - 1, f"{vol[i] * close[i]:.8f}", 100, f"{vol[i] / 2:.8f}", f"{vol[i] * close[i] / 2:.8f}", "0"])
+        return out
+
+    def ticker(self, symbol: str) -> dict:
+        base = self._base_price(symbol)
+        rank = self._rank.get(symbol)
+        qv = 1e9 / (1 + rank) if rank is not None else 0.0
+        return {"symbol": symbol, "openPrice": f"{base:.8f}", "highPrice": f"{base * 1.02:.8f}",
+                "lowPrice": f"{base * 0.98:.8f}", "lastPrice": f"{base:.8f}", "volume": f"{qv / base:.8f}",
+                "quoteVolume": f"{qv:.8f}", "openTime": 0, "closeTime": 0, "firstId": 0, "lastId": 0, "count": 0}
+
+def build_app(market: Market, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+              rate_limit_every: int = 0, retry_after: int = 1, weight_limit: int = 0) -> FastAPI:
+    app = FastAPI()
+    state = {"n": 0, "minute": 0, "weight": 0}
+
+    @app.middleware("http")
+    async def binance_behaviour(request: Request, call_next):
+        delay = latency_ms + (random.random() * jitter_ms if jitter_ms else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000.0)
+        state["n"] += 1
+        minute = int(time.time() // 60)
+        if minute != state["minute"]:
+            state["minute"] = minute; state["weight"] = 0
+        state["weight"] += WEIGHTS.get(request.url.path, 1)
+        headers = {"X-MBX-USED-WEIGHT-1M": str(state["weight"])}
+        if (rate_limit_every and state["n"] % rate_limit_every == 0) or (weight_limit and state["weight"] > weight_limit):
+            return JSONResponse({"code": -1003, "msg": "Too many requests."}, status_code=429,
+                                headers={**headers, "Retry-After": str(retry_after)})
+        resp = await call_next(request)
+        resp.headers.update(headers)
+        return resp
+
+    @app.get("/api/v3/ping")
+    def ping():
+        return {}
+
+    @app.get("/api/v3/time")
+    def server_time():
+        return {"serverTime": int(time.time() * 1000)}
+
+    @app.get("/api/v3/ticker/24hr")
+    def ticker_24hr(symbol: Optional[str] = None, type: str = "FULL"):
+        if symbol:
+            return market.ticker(symbol)
+        return [market.ticker(s) for s in market.symbols]
+
+    @app.get("/api/v3/klines")
+    def klines(symbol: str, interval: str, limit: int = 500, startTime: Optional[int] = None, endTime: Optional[int] = None):
+        if interval not in INTERVAL_MS:
+            return JSONResponse({"code": -1120, "msg": "Invalid interval."}, status_code=400)
+        if symbol not in market._rank and market._recorded_rows(symbol, interval) is None:
+            return JSONResponse({"code": -1121, "msg": "Invalid symbol."}, status_code=400)
+        return market.klines(symbol, interval, max(1, min(int(limit), 1000)), startTime, endTime)
+
+    @app.get("/api/v3/ticker/bookTicker")
+    def book_ticker(symbol: str):
+        px = market._base_price(symbol)
+        return {"symbol": symbol, "bidPrice": f"{px * 0.9999:.8f}", "bidQty": "10.0",
+                "askPrice": f"{px * 1.0001:.8f}", "askQty": "10.0"}
+
+    return app
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8900)
+    ap.add_argument("--symbols", type=int, default=500, help="number of synthetic USDT pairs")
+    ap.add_argument("--data", default=None, help="directory with recorded <SYMBOL>_<interval>.json klines")
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--rate-limit-every", type=int, default=0, help="answer every Nth request with 429")
+    ap.add_argument("--retry-after", type=int, default=1)
+    ap.add_argument("--weight-limit", type=int, default=0, help="429 once this much weight is used in a minute")
+    a = ap.parse_args()
+    app = build_app(Market(symbol_names(a.symbols), a.data), a.latency_ms, a.jitter_ms,
+                    a.rate_limit_every, a.retry_after, a.weight_limit)
+    uvicorn.run(app, host=a.host, port=a.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+# Deterministic random-walk klines for the tests and benchmarks, in the
+# fetch_candles column order: [time, open, close, high, low, volume].
+import numpy as np
+
+# on a 1h boundary, so resampled 15m/1h buckets line up with the exchange's
+T0 = 1_699_999_200_000
+
+def klines(n: int, step: int = 300_000, seed: int = 0, drift: float = 0.0, vol: float = 0.004, t0: int = T0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    c = 100 * np.exp(np.cumsum(rng.normal(drift, vol, n)))
+    o = np.r_[c[0], c[:-1]]
+    h = np.maximum(o, c) * (1 + rng.random(n) * 0.002)
+    l = np.minimum(o, c) * (1 - rng.random(n) * 0.002)
+    v = rng.random(n) * 1000 + 1
+    return np.column_stack([t0 + np.arange(n, dtype=np.float64) * step, o, c, h, l, v])
@@ -0,0 +1,77 @@
+# Local stand-in for the Binance combined stream.
+#
+#   python tools/ws_replay.py record frames.jsonl btcusdt@kline_5m btcusdt@bookTicker
+#   python tools/ws_replay.py serve frames.jsonl --port 9443 --speed 10
+#
+# Point the add-on at it with data_source: ws and binance_ws_url: ws://127.0.0.1:9443
+import argparse, asyncio, json, time
+import websockets
+
+BN_WS = "wss://stream.binance.com:9443"
+
+async def record(path: str, streams, seconds: float):
+    url = f"{BN_WS}/stream?streams={'/'.join(streams)}"
+    t0 = time.time()
+    async with websockets.connect(url) as ws:
+        with open(path, "a", encoding="utf-8") as f:
+            while time.time() - t0 < seconds:
+                raw = await ws.recv()
+                f.write(json.dumps({"ts": time.time(), "frame": raw}, ensure_ascii=False) + "\n")
+
+def load_frames(path: str):
+    out = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                d = json.loads(line)
+                out.append((float(d.get("ts", 0)), d["frame"]))
+    return out
+
+async def serve(path: str, host: str, port: int, speed: float, loop_forever: bool):
+    frames = load_frames(path)
+
+    async def handler(ws):
+        # acknowledge SUBSCRIBE requests the way Binance does, then replay
+        async def acks():
+            async for raw in ws:
+                try:
+                    req = json.loads(raw)
+                    await ws.send(json.dumps({"result": None, "id": req.get("id")}))
+                except Exception:
+                    pass
+        ack_task = asyncio.create_task(acks())
+        try:
+            while True:
+                prev = None
+                for ts, frame in frames:
+                    if prev is not None and speed > 0:
+                        await asyncio.sleep(max(0.0, (ts - prev) / speed))
+                    prev = ts
+                    await ws.send(frame)
+                if not loop_forever:
+                    break
+            await ws.wait_closed()
+        finally:
+            ack_task.cancel()
+
+    async with websockets.serve(handler, host, port):
+        await asyncio.Future()
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("record"); r.add_argument("path"); r.add_argument("streams", nargs="+")
+    r.add_argument("--seconds", type=float, default=600)
+    s = sub.add_parser("serve"); s.add_argument("path")
+    s.add_argument("--host", default="127.0.0.1"); s.add_argument("--port", type=int, default=9443)
+    s.add_argument("--speed", type=float, default=1.0, help="replay speed factor, 0 = as fast as possible")
+    s.add_argument("--loop", action="store_true")
+    a = ap.parse_args()
+    if a.cmd == "record":
+        asyncio.run(record(a.path, a.streams, a.seconds))
+    else:
+        asyncio.run(serve(a.path, a.host, a.port, a.speed, a.loop))
+
+if __name__ == "__main__":
+    main()